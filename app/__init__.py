@@ -1,14 +1,21 @@
-from flask import Flask, current_app, request, redirect
+from flask import Flask, current_app, request
 import os
 from .const import *
 import json
 from .config import load_config
 from .log import setup_logger
 from .crash import handle_crash_report
-from .database import init_test_data, reset_db
+from .database import init_test_data, reset_db, rebuild_stats, close_dbconn
+from .migrate import migrate, get_status
+from .pool import init_pool
+from .security import init_security
+from .metrics import init_metrics
+from .slowlog import init_slow_query_log, read_slow_queries
 import sqlite3
-import importlib
-from .auth import check_login
+import click
+from .auth import build_permission_table, check_permission, LOGIN
+from .session import init_session, load_secret_key
+from .startup import StartupTimer, register_blueprints
 
 def init_files():
     '''
@@ -35,23 +42,17 @@ def init_files():
         
 def init_databse():
     '''
-    初始化数据库。
+    初始化数据库：执行待执行的迁移（app/migrations）。
+    数据库已是最新版本时只查询一次版本号。
     '''
     # 连接数据库
     conn = sqlite3.connect(current_app.config['database']["file"])
-    cursor = conn.cursor()
 
-    # 执行SQL脚本初始化数据库
-    schema_path = os.path.join(os.path.dirname(__file__), 'schema.sql')
-    with open(schema_path, 'r', encoding=DEFAULT_ENCODING) as f:
-        schema = f.read()
-
-    # 执行SQL脚本
-    cursor.executescript(schema)
-    conn.commit()
-
-    # 关闭数据库连接
-    conn.close()
+    try:
+        migrate(conn, logger=current_app.logger)
+    finally:
+        # 关闭数据库连接
+        conn.close()
 
 
 def create_app():
@@ -64,59 +65,170 @@ def create_app():
     Returns:
         Flask: 配置好的Flask应用实例。
     '''
+    # 记录各阶段的耗时
+    timer = StartupTimer()
+
     # 初始化必要的文件和目录
-    init_files()
+    with timer.phase("init_files"):
+        init_files()
 
     # 创建flask应用实例
-    app = Flask(__name__, template_folder="templates")
+    with timer.phase("create_flask"):
+        app = Flask(__name__, template_folder="templates")
+    app.extensions["startup"] = timer
 
     # 加载配置
-    result = load_config(app)
+    with timer.phase("load_config"):
+        result = load_config(app)
     if result: # 若加载失败，则返回非None
         code, message = result
         handle_crash_report(code, message)
         raise RuntimeError(f"({code}){message}")
     
+    # 设置日志记录器，需在迁移之前，迁移的日志才会写入日志文件
+    with timer.phase("setup_logger"):
+        setup_logger(app)
+
     # 初始化数据库
-    with app.app_context():
+    with timer.phase("init_databse"), app.app_context():
         init_databse()
 
-    # 设置日志记录器
-    setup_logger(app)
+    with timer.phase("extensions"):
+        # 初始化性能指标，需在连接池和其他 before_request 之前
+        init_metrics(app)
+
+        # 慢查询日志（database.slow_query.enabled 为 true 时启用）
+        init_slow_query_log(app)
+
+        # 初始化数据库连接池，请求结束时自动归还连接
+        init_pool(app)
+        app.teardown_appcontext(close_dbconn)
+
+        # 初始化登录限流
+        init_security(app)
+
+        # 设置session 的secret_key，保存在user目录中，重启和多进程时保持不变
+        app.config['SECRET_KEY'] = load_secret_key(SECRET_KEY_PATH)
+        init_session(app, app.config.get("session", {}))
 
     # 注册CLI命令
     @app.cli.command("init-test-data")
-    def init_test_data_cli():
+    @click.option("--dishes", default=0, help="生成的菜品数")
+    @click.option("--orders", default=0, help="生成的历史订单数")
+    @click.option("--days", default=90, help="订单分布的营业日数")
+    @click.option("--end", type=click.DateTime(["%Y-%m-%d"]), help="最后一个营业日，默认为昨天")
+    @click.option("--seed", default=0, help="随机种子")
+    def init_test_data_cli(dishes, orders, days, end, seed):
         init_test_data()
+        if not dishes and not orders:
+            return
+
+        import time
+        from .datagen import generate
+        from .database import get_dbconn
+        start = time.perf_counter()
+        try:
+            result = generate(get_dbconn(), orders, dishes, days, end.date() if end else None, seed)
+        except ValueError as e:
+            print(e)
+            raise SystemExit(1)
+        print(
+            f"Generated {result['dishes']} dishes, {result['orders']} orders ({result['items']} items) "
+            f"over {result['days']} days in {time.perf_counter() - start:.1f}s."
+        )
     
     @app.cli.command("reset-db")
     def reset_db_cli():
         reset_db()
 
-    # 注册蓝图
-    blueprints = [
-        "basic",
-        "auth",
-        "user",
-        "stats"
-    ]
-
-    # 设置session 的secret_key
-    app.config['SECRET_KEY'] = os.urandom(24)  # 生成随机密钥
-
-    # before_request 检查登录
+    @app.cli.command("schema-status")
+    def schema_status_cli():
+        conn = sqlite3.connect(app.config['database']["file"])
+        try:
+            status = get_status(conn)
+        finally:
+            conn.close()
+        print(f"Schema version {status['version']} (latest {status['latest']}).")
+        for migration in status["applied"]:
+            print(f"  [applied] {migration.version:04d}_{migration.name}")
+        for migration in status["pending"]:
+            print(f"  [pending] {migration.version:04d}_{migration.name}")
+
+    @app.cli.command("rebuild-stats")
+    def rebuild_stats_cli():
+        days = rebuild_stats()
+        print(f"Rebuilt statistics for {days} days.")
+
+    @app.cli.command("export-orders")
+    @click.option("--output", default=EXPORT_PATH, help="导出目录")
+    def export_orders_cli(output):
+        from .analytics import export_orders
+        from .database import DatabaseConnection
+        with DatabaseConnection() as db:
+            paths = export_orders(db, output)
+        print(f"Exported {len(paths)} monthly partitions to {output}.")
+
+    @app.cli.command("analyze-orders")
+    @click.option("--input", "input_dir", default=EXPORT_PATH, help="export-orders 的导出目录")
+    @click.option("--top", default=10, help="菜品和组合的返回数量")
+    def analyze_orders_cli(input_dir, top):
+        from .analytics import top_dishes, hourly_heatmap, basket_pairs
+        print(json.dumps({
+            "top_dishes": top_dishes(input_dir, top),
+            "hourly_heatmap": hourly_heatmap(input_dir),
+            "basket_pairs": basket_pairs(input_dir, top),
+        }, ensure_ascii=False, indent=4))
+
+    @app.cli.command("import-menu")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--dry-run", is_flag=True, help="只校验，不写入")
+    def import_menu_cli(path, dry_run):
+        from .menu_import import import_menu
+        from .database import DatabaseConnection
+        with DatabaseConnection() as db:
+            result = import_menu(db, path, dry_run)
+        for line_num, message in result["errors"]:
+            print(f"{path}:{line_num}: {message}")
+        if result["errors"]:
+            print(f"{len(result['errors'])} invalid rows, nothing imported.")
+            raise SystemExit(1)
+        if dry_run:
+            print("No errors.")
+        else:
+            print(f"Created {result['created']} dishes, updated {result['updated']} dishes.")
+
+    @app.cli.command("slow-queries")
+    @click.option("--top", default=20, help="显示的SQL数量（按总耗时排序）")
+    @click.option("--clear", is_flag=True, help="显示后清空慢查询日志")
+    def slow_queries_cli(top, clear):
+        path = app.config["database"].get("slow_query", {}).get("file", SLOW_QUERY_LOG_PATH)
+        queries = read_slow_queries(path)
+        if not queries:
+            print(f"No slow queries in {path}.")
+        for query in queries[:top]:
+            print(f"[{query['count']}x avg {query['avg_ms']}ms max {query['max_ms']}ms last {query['last_time']}]")
+            print(f"  {query['sql']}")
+            for line in query["plan"] or ["(no query plan)"]:
+                print(f"    {line}")
+        if clear and os.path.exists(path):
+            os.remove(path)
+
+    # 按配置 blueprints 注册蓝图，lazy 的蓝图在处理第一个请求之前注册
+    lazy = register_blueprints(app, timer)
+
+    # 注册完蓝图后，生成各endpoint的访问权限表（延迟注册蓝图时更新）
+    permissions = build_permission_table(app)
+    app.extensions["permissions"] = permissions
+
+    # before_request 检查权限，路由匹配后按endpoint查表
     @app.before_request
     def before_request():
+        return check_permission(permissions.get(request.endpoint, LOGIN))
 
-        if not check_login(request.path):
-            return redirect("/login")
-        
-
-    for blueprint_name in blueprints:
-        blueprint_module = importlib.import_module(f".{blueprint_name}", __name__)
-        app.register_blueprint(blueprint_module.bp)
-        app.logger.info(f"Blueprint {blueprint_name} registered.")
-
+    timer.finish()
+    app.logger.info(f"Application created in {timer.summary()}.")
+    if lazy:
+        app.logger.info(f"Blueprints {', '.join(lazy)} will be registered before the first request.")
 
     return app
 
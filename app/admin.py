@@ -0,0 +1,51 @@
+from flask import Blueprint, current_app, jsonify, Response
+from .auth import admin_only
+
+bp = Blueprint('admin', __name__, url_prefix="/api/admin")
+
+@bp.route("/metrics")
+@admin_only
+def get_metrics():
+    '''
+    性能指标，Prometheus 文本格式（仅管理员）
+    '''
+    metrics = current_app.extensions.get("metrics")
+    if not metrics:
+        return jsonify(
+            {
+                "type": "disabled_error",
+                "message": "metrics is disabled"
+            }
+        )
+
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@bp.route("/metrics/reset", methods=["POST"])
+@admin_only
+def reset_metrics():
+    '''
+    清空性能指标（仅管理员）
+    '''
+    metrics = current_app.extensions.get("metrics")
+    if metrics:
+        metrics.reset()
+
+    return jsonify(
+        {
+            "type": "success",
+            "message": "metrics reset"
+        }
+    )
+
+@bp.route("/startup")
+@admin_only
+def get_startup():
+    '''
+    当前进程启动（create_app）各阶段的耗时（仅管理员）
+    '''
+    return jsonify(
+        {
+            "type": "success",
+            "data": current_app.extensions["startup"].stats()
+        }
+    )
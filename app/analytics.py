@@ -0,0 +1,284 @@
+'''
+订单历史的列式导出与分析。
+
+export_orders 将 orders 和 order_items 按月导出为 NumPy .npz 文件（每个月一个分区），
+分析函数逐个读取分区，用数组运算汇总，内存占用只与单个分区的大小有关。
+'''
+import glob
+import os
+import numpy as np
+from .database import DatabaseConnection, ORDER_STATUSES
+
+# 每次从数据库读取的行数
+FETCH_SIZE = 10000
+
+# 分区文件名
+PARTITION_PATTERN = "orders-*.npz"
+
+def _fetch_columns(db: DatabaseConnection, sql: str, params: tuple, dtypes: list[str]) -> list:
+    '''
+    分批读取查询结果，按列转换为数组
+    Arguments:
+        db: 数据库连接
+        sql: SQL语句
+        params: 参数
+        dtypes: 每一列的数组类型
+    Returns:
+        list: 每一列一个数组
+    '''
+    cursor = db.connection.cursor()
+    # 不使用sqlite3.Row，直接返回元组
+    cursor.row_factory = None
+    cursor.execute(sql, params)
+
+    chunks = [[] for _ in dtypes]
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        for index, column in enumerate(zip(*rows)):
+            chunks[index].append(np.array(column, dtype=dtypes[index]))
+
+    return [
+        np.concatenate(chunk) if chunk else np.empty(0, dtype=dtype)
+        for chunk, dtype in zip(chunks, dtypes)
+    ]
+
+def _order_months(db: DatabaseConnection) -> list[str]:
+    '''
+    获取orders表中所有的营业月（不依赖每日统计，统计过期时也不会漏掉月份）。
+    每个月只在(order_date, order_num)索引上查找一次，不扫描整个表
+    Arguments:
+        db: 数据库连接
+    Returns:
+        list: ['YYYY-MM', ...]
+    '''
+    months = []
+    start = ""
+    while True:
+        row = db.fetch_one("SELECT MIN(order_date) AS order_date FROM orders WHERE order_date >= ?", (start,))
+        if row is None or row["order_date"] is None:
+            return months
+        month = row["order_date"][:7]
+        months.append(month)
+        # 下一个月的第一天之后（YYYY-MM-32 大于当月的所有日期）
+        start = f"{month}-32"
+
+def export_orders(db: DatabaseConnection, output_dir: str) -> list[str]:
+    '''
+    将订单和明细按月导出为列式的.npz文件。
+    orders-YYYY-MM.npz 中包含：
+        订单列：order_id, day（1970-01-01起的天数）, hour, table_num, guests, created_by, status（ORDER_STATUSES的下标）, total_price
+        明细列：item_order_id, dish_id, quantity, unit_price, is_completed, is_added
+        菜品名称：dish_names_id, dish_names
+    Arguments:
+        db: 数据库连接
+        output_dir: 输出目录
+    Returns:
+        list: 导出的文件路径
+    '''
+    os.makedirs(output_dir, exist_ok=True)
+
+    months = _order_months(db)
+
+    status_case = " ".join(f"WHEN '{status}' THEN {index}" for index, status in enumerate(ORDER_STATUSES))
+
+    paths = []
+    for month in months:
+        # 按营业日范围查询，使用(order_date, order_num)索引
+        params = (f"{month}-01", f"{month}-31")
+
+        (order_id, day, hour, table_num, guests, created_by, status, total_price) = _fetch_columns(db, f'''
+            SELECT
+                id,
+                CAST(julianday(order_date) - 2440587.5 AS INTEGER),
+                CAST(substr(time, 12, 2) AS INTEGER),
+                table_num,
+                guests,
+                COALESCE(created_by, 0),
+                CASE status {status_case} END,
+                total_price
+            FROM orders
+            WHERE order_date BETWEEN ? AND ?
+            ORDER BY id
+        ''', params, ["int64", "int32", "int8", "int32", "int16", "int32", "int8", "int64"])
+
+        (item_order_id, dish_id, quantity, unit_price, is_completed, is_added) = _fetch_columns(db, '''
+            SELECT
+                order_items.order_id,
+                order_items.dish_id,
+                order_items.quantity,
+                order_items.unit_price,
+                order_items.is_completed,
+                order_items.added_time IS NOT NULL
+            FROM order_items
+            JOIN orders ON orders.id = order_items.order_id
+            WHERE orders.order_date BETWEEN ? AND ?
+            ORDER BY order_items.order_id, order_items.id
+        ''', params, ["int64", "int32", "int32", "int64", "int8", "int8"])
+
+        # 菜品名称（以下单时的名称为准）
+        names = db.fetch_all('''
+            SELECT order_items.dish_id AS dish_id, MAX(order_items.name) AS name
+            FROM order_items
+            JOIN orders ON orders.id = order_items.order_id
+            WHERE orders.order_date BETWEEN ? AND ?
+            GROUP BY order_items.dish_id
+        ''', params)
+
+        path = os.path.join(output_dir, f"orders-{month}.npz")
+        np.savez_compressed(
+            path,
+            order_id=order_id, day=day, hour=hour, table_num=table_num, guests=guests,
+            created_by=created_by, status=status, total_price=total_price,
+            item_order_id=item_order_id, dish_id=dish_id, quantity=quantity,
+            unit_price=unit_price, is_completed=is_completed, is_added=is_added,
+            dish_names_id=np.array([row["dish_id"] for row in names], dtype="int32"),
+            dish_names=np.array([row["name"] for row in names], dtype="U"),
+        )
+        paths.append(path)
+
+    return paths
+
+def iter_partitions(input_dir: str):
+    '''
+    逐个读取导出的分区
+    Arguments:
+        input_dir: 导出目录
+    Returns:
+        generator: 每个分区一个 NpzFile
+    '''
+    for path in sorted(glob.glob(os.path.join(input_dir, PARTITION_PATTERN))):
+        with np.load(path) as partition:
+            yield partition
+
+def _active_items(partition) -> tuple:
+    '''
+    获取分区中未取消订单的明细
+    Returns:
+        tuple: (order_id, dish_id, quantity, unit_price)
+    '''
+    canceled = ORDER_STATUSES.index("canceled")
+    canceled_ids = partition["order_id"][partition["status"] == canceled]
+    mask = ~np.isin(partition["item_order_id"], canceled_ids)
+
+    return (
+        partition["item_order_id"][mask],
+        partition["dish_id"][mask],
+        partition["quantity"][mask],
+        partition["unit_price"][mask],
+    )
+
+def top_dishes(input_dir: str, limit: int = 10) -> list[dict]:
+    '''
+    销量最高的菜品（不含已取消订单）
+    Arguments:
+        input_dir: 导出目录
+        limit: 返回数量
+    Returns:
+        list: [{'dish_id', 'name', 'quantity', 'sales'}, ...]
+    '''
+    quantity_total = np.zeros(0, dtype="int64")
+    sales_total = np.zeros(0, dtype="int64")
+    names = {}
+
+    for partition in iter_partitions(input_dir):
+        _, dish_id, quantity, unit_price = _active_items(partition)
+        if dish_id.size == 0:
+            continue
+
+        size = max(quantity_total.size, int(dish_id.max()) + 1)
+        quantity_total = np.pad(quantity_total, (0, size - quantity_total.size))
+        sales_total = np.pad(sales_total, (0, size - sales_total.size))
+
+        quantity_total += np.bincount(dish_id, weights=quantity, minlength=size).astype("int64")
+        sales_total += np.bincount(dish_id, weights=quantity * unit_price, minlength=size).astype("int64")
+        names.update(zip(partition["dish_names_id"].tolist(), partition["dish_names"].tolist()))
+
+    top = np.argsort(-quantity_total, kind="stable")[:limit]
+    return [
+        {
+            "dish_id": int(dish_id),
+            "name": names.get(int(dish_id), ""),
+            "quantity": int(quantity_total[dish_id]),
+            "sales": int(sales_total[dish_id]),
+        }
+        for dish_id in top if quantity_total[dish_id] > 0
+    ]
+
+def hourly_heatmap(input_dir: str) -> list[list[int]]:
+    '''
+    订单数热力图（不含已取消订单）
+    Arguments:
+        input_dir: 导出目录
+    Returns:
+        list: 7x24 的矩阵，行为星期（0为周一），列为小时
+    '''
+    heatmap = np.zeros(7 * 24, dtype="int64")
+    canceled = ORDER_STATUSES.index("canceled")
+
+    for partition in iter_partitions(input_dir):
+        mask = partition["status"] != canceled
+        # 1970-01-01 是周四
+        weekday = (partition["day"][mask].astype("int64") + 3) % 7
+        heatmap += np.bincount(weekday * 24 + partition["hour"][mask], minlength=7 * 24)
+
+    return heatmap.reshape(7, 24).tolist()
+
+def basket_pairs(input_dir: str, limit: int = 10) -> list[dict]:
+    '''
+    经常一起点的菜品组合（同一订单中同时出现的次数，不含已取消订单）
+    Arguments:
+        input_dir: 导出目录
+        limit: 返回数量
+    Returns:
+        list: [{'dish_ids': [a, b], 'names': [名称a, 名称b], 'orders': 次数}, ...]
+    '''
+    pair_codes = np.zeros(0, dtype="int64")
+    pair_counts = np.zeros(0, dtype="int64")
+    names = {}
+
+    for partition in iter_partitions(input_dir):
+        order_id, dish_id, _, _ = _active_items(partition)
+        if dish_id.size == 0:
+            continue
+
+        # 每个订单中的菜品去重，并按（订单，菜品）排序
+        _, order_index = np.unique(order_id, return_inverse=True)
+        width = int(dish_id.max()) + 1
+        lines = np.unique(order_index.astype("int64") * width + dish_id)
+        line_order, line_dish = lines // width, lines % width
+
+        # 同一订单中相隔offset行的两个菜品组成一个组合（a < b），只枚举实际存在的组合，
+        # 内存占用与组合数成正比。订单中的菜品数不超过offset时，之后的offset都不会再有组合
+        codes = []
+        for offset in range(1, lines.size):
+            same = line_order[offset:] == line_order[:-offset]
+            if not same.any():
+                break
+            codes.append(line_dish[:-offset][same] << 32 | line_dish[offset:][same])
+        if not codes:
+            continue
+        codes, counts = np.unique(np.concatenate(codes), return_counts=True)
+
+        # 与之前分区的结果合并
+        pair_codes, inverse = np.unique(np.concatenate([pair_codes, codes]), return_inverse=True)
+        pair_counts = np.bincount(
+            inverse,
+            weights=np.concatenate([pair_counts, counts]),
+            minlength=pair_codes.size
+        ).astype("int64")
+
+        names.update(zip(partition["dish_names_id"].tolist(), partition["dish_names"].tolist()))
+
+    top = np.argsort(-pair_counts, kind="stable")[:limit]
+    result = []
+    for index in top:
+        dish_a, dish_b = int(pair_codes[index] >> 32), int(pair_codes[index] & 0xFFFFFFFF)
+        result.append({
+            "dish_ids": [dish_a, dish_b],
+            "names": [names.get(dish_a, ""), names.get(dish_b, "")],
+            "orders": int(pair_counts[index]),
+        })
+
+    return result
@@ -1,10 +1,28 @@
-from flask import Blueprint, current_app, request, jsonify, session
+from flask import Blueprint, current_app, request, jsonify, session, redirect
 from .database import get_dbconn
 from .const import *
+import math
+import time
 
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+# 访问权限
+PUBLIC = "public"   # 无需登录
+LOGIN = "login"     # 需要登录（默认）
+ADMIN = "admin"     # 仅管理员
+
+def public(view):
+    '''装饰器：视图无需登录即可访问'''
+    view.permission = PUBLIC
+    return view
+
+def admin_only(view):
+    '''装饰器：视图仅管理员可访问'''
+    view.permission = ADMIN
+    return view
+
 @bp.route('/login', methods=['POST']) # type: ignore
+@public
 def login():
 
     # 获取数据
@@ -29,14 +47,34 @@ def login():
                 "message": "user is login"
             }
         )
+    # 登录限流，在计算密码哈希之前检查
+    login_stats = current_app.extensions["login_stats"]
+    wait = current_app.extensions["login_throttle"].acquire(username, request.remote_addr or "")
+    if wait:
+        login_stats.record("throttled")
+        current_app.logger.warning(f"Login throttled: {username} from {request.remote_addr}")
+        response = jsonify(
+            {
+                "type": "throttle_error",
+                "message": "too many login attempts"
+            }
+        )
+        response.status_code = 429
+        response.headers["Retry-After"] = str(math.ceil(wait))
+        return response
+
     # 数据库检验
     db = get_dbconn()
+    start = time.perf_counter()
     user = db.users.auth(username, password)
-
-    db.close()
+    seconds = time.perf_counter() - start
+    login_stats.record("success" if user else "failed", seconds)
+    metrics = current_app.extensions.get("metrics")
+    if metrics:
+        metrics.password_seconds.observe(seconds)
 
     # 判断是否存在
-    print("用户：",user)
+    current_app.logger.debug(f"Login {'succeeded' if user else 'failed'}: {username}")
     if user:
         
         # 存在，判断是否被封禁
@@ -46,6 +84,7 @@ def login():
             session['id'] = user['id']
             session['username'] = user['username']
             session["is_admin"] = user['is_admin']
+            current_app.extensions["login_throttle"].succeeded(username)
             
             return jsonify(
                 {
@@ -86,19 +125,58 @@ def logout():
             }
         )
     
-def check_login(url):
-    # 判断是否在白名单中
-    for item in UNLOGIN_WHITELIST:
-        if item in url:
-            return True
-    
-    # 判断是否登录
-    if 'id' in session:
-        return True
-    else:
-        return False
+@bp.route('/stats') # type: ignore
+@admin_only
+def get_login_stats():
+    '''
+    登录次数与密码验证耗时（仅管理员）
+    '''
+    return jsonify(
+        {
+            "type": "success",
+            "data": current_app.extensions["login_stats"].stats()
+        }
+    )
 
+def build_permission_table(app) -> dict[str, str]:
+    '''
+    根据视图函数上的标记，生成 endpoint -> 权限 的对照表。应在注册完所有蓝图后调用。
+    Arguments:
+        app: Flask应用
+    Returns:
+        dict: endpoint -> PUBLIC / LOGIN / ADMIN
+    '''
+    table = {}
+    for endpoint, view in app.view_functions.items():
+        # 静态文件（包括蓝图的静态文件）
+        if endpoint == "static" or endpoint.endswith(".static"):
+            table[endpoint] = PUBLIC
+        else:
+            table[endpoint] = getattr(view, "permission", LOGIN)
+    return table
 
-    
+def check_permission(permission: str):
+    '''
+    检查当前session是否满足权限要求，只读取session，不查询数据库
+    Arguments:
+        permission: PUBLIC / LOGIN / ADMIN
+    Returns:
+        None: 允许访问
+        Response: 拒绝访问时的响应
+    '''
+    if permission == PUBLIC:
+        return None
+
+    # 未登录，跳转到登录页
+    if 'id' not in session:
+        return redirect("/login")
 
+    if permission == ADMIN and not session.get("is_admin"):
+        return jsonify(
+            {
+                "type": "permission_error",
+                "message": "admin only"
+            }
+        )
 
+    return None
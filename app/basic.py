@@ -1,4 +1,5 @@
 from flask import Blueprint, render_template, current_app, session, redirect
+from .auth import public
 
 bp = Blueprint('index', __name__)
 
@@ -8,6 +9,7 @@ def index():
                            title=current_app.config["title"])
 
 @bp.route('/login')
+@public
 def login():
     # 判断是否登录
     if 'id' in session:
@@ -0,0 +1,83 @@
+import threading
+
+
+class MenuCache:
+    '''
+    进程内的菜单缓存。
+    缓存的数据带有版本号（menu_version表，由menu表的触发器维护），
+    版本号与数据库不一致时重新加载，因此多个进程之间也能发现缓存过期。
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = None
+        self.data = None
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version: int, loader):
+        '''
+        获取缓存数据，版本号不一致或缓存为空时调用loader重新加载
+        Arguments:
+            version: 数据库中当前的菜单版本号
+            loader: 加载数据的函数，无参数
+        Returns:
+            缓存的数据
+        '''
+        with self._lock:
+            if self.data is not None and self.version == version:
+                self.hits += 1
+                return self.data
+            self.misses += 1
+
+        data = loader()
+
+        with self._lock:
+            self.version = version
+            self.data = data
+
+        return data
+
+    def invalidate(self):
+        '''
+        清空缓存，在菜单被修改后调用
+        Arguments:
+            None
+        Returns:
+            None
+        '''
+        with self._lock:
+            self.version = None
+            self.data = None
+
+    def stats(self) -> dict:
+        '''
+        获取缓存统计信息
+        Returns:
+            dict: {'version', 'hits', 'misses'}
+        '''
+        with self._lock:
+            return {
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# 每个数据库文件对应一个缓存
+_menu_caches: dict[str, MenuCache] = {}
+_menu_caches_lock = threading.Lock()
+
+def get_menu_cache(database_file: str) -> MenuCache:
+    '''
+    获取数据库文件对应的菜单缓存
+    Arguments:
+        database_file: 数据库文件路径
+    Returns:
+        MenuCache: 菜单缓存
+    '''
+    with _menu_caches_lock:
+        if database_file not in _menu_caches:
+            _menu_caches[database_file] = MenuCache()
+        return _menu_caches[database_file]
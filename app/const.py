@@ -10,12 +10,13 @@ DEFAULT_ENCODING = "utf-8"
 
 # Log
 LOG_PATH = os.path.join("user", "logs")
+SLOW_QUERY_LOG_PATH = os.path.join(LOG_PATH, "slow_queries.jsonl")
 
 # CrashReport
 CRASH_REPORT_PATH = os.path.join("user", "crash_report")
 
-UNLOGIN_WHITELIST = [
-    "/login",
-    "/api/auth/login",
-    "/static/"
-]
\ No newline at end of file
+# Session
+SECRET_KEY_PATH = os.path.join("user", "secret_key")
+
+# Export
+EXPORT_PATH = os.path.join("user", "export")
@@ -1,18 +1,78 @@
 import sqlite3
-from werkzeug.security import check_password_hash, generate_password_hash
+from werkzeug.security import check_password_hash
 from flask import g, current_app
 import json
 import os
+import threading
+import time
+from contextlib import contextmanager
+from itertools import chain
+from datetime import datetime
+from .cache import get_menu_cache
+from .search import DishSearchIndex
+from .events import get_event_hub
+from .security import hash_password, needs_rehash
+
+# 存储配置中允许设置的PRAGMA
+PROFILE_PRAGMAS = [
+    "journal_mode",
+    "synchronous",
+    "cache_size",
+    "mmap_size",
+    "busy_timeout",
+    "temp_store",
+]
+
+# 订单状态
+ORDER_STATUSES = ['pending', 'cooking', 'done', 'canceled', 'paid']
+
+# 进程内的写锁，串行化所有写事务，读操作不受影响
+WRITE_LOCK = threading.RLock()
+
+def apply_profile(connection: sqlite3.Connection, profile: dict):
+    '''
+    将存储配置（PRAGMA）应用到数据库连接。
+    可能抛出的异常：
+        ValueError: 配置中的值不是整数或字母组成的字符串
+    Arguments:
+        connection: 数据库连接
+        profile: 存储配置，如 {"journal_mode": "WAL", "synchronous": "NORMAL"}
+    Returns:
+        None
+    '''
+    for key in PROFILE_PRAGMAS:
+        if key not in profile:
+            continue
+
+        value = profile[key]
+        # PRAGMA 不支持参数绑定，只允许整数或单词
+        if not isinstance(value, int) and not str(value).isalpha():
+            raise ValueError(f"Invalid value for PRAGMA {key}: {value}")
+        
+        connection.execute(f"PRAGMA {key} = {value};")
+
 class DatabaseConnection:
     '''
     控制数据库连接
     '''
-    def __init__(self):
+    def __init__(self, database_file: str = None, profile: dict = None): # type: ignore
+        # 数据库文件，为None时使用配置中的路径
+        self.database_file = database_file
+        # 存储配置，为None时使用配置中的database.profile
+        self.profile = profile
         self.connection: sqlite3.Connection = None # type: ignore
+        # 写事务嵌套层数
+        self._transaction_depth = 0
+        # 性能指标（app.extensions["metrics"]），未启用时为None
+        self.metrics = None
+        # 慢查询日志（app.extensions["slow_query_log"]），未启用时为None
+        self.slow_log = None
         
         self.users = None
         self.orders = None
         self.dishes = None
+        self.stats = None
+        self.sessions = None
 
     def connect(self):
         '''
@@ -29,7 +89,13 @@ class DatabaseConnection:
             return self.connection
         
         # 连接数据库
-        self.connection = sqlite3.connect(current_app.config['database']["file"])
+        if not self.database_file:
+            self.database_file = current_app.config['database']["file"]
+        if self.profile is None:
+            self.profile = current_app.config['database'].get("profile", {})
+        
+        # 连接可能被连接池交给不同的线程使用（同一时间只有一个线程使用）
+        self.connection = sqlite3.connect(self.database_file, check_same_thread=False)
 
         # 启用行工厂
         self.connection.row_factory = sqlite3.Row # type: ignore
@@ -37,12 +103,20 @@ class DatabaseConnection:
         # 启用外键约束
         self.connection.execute("PRAGMA foreign_keys = ON;") # type: ignore
 
+        # 应用存储配置（WAL、同步级别、缓存等）
+        apply_profile(self.connection, self.profile)
+
+        self.metrics = current_app.extensions.get("metrics")
+        self.slow_log = current_app.extensions.get("slow_query_log")
+
         # 初始化DAO实例
         self.users = UsersDAO(self)
         self.orders = OrderDAO(self)
         self.dishes = DishDAO(self)
+        self.stats = StatsDAO(self)
+        self.sessions = SessionDAO(self)
 
-        current_app.logger.info(f"Connected to database: {current_app.config['database']['file']}")
+        current_app.logger.debug(f"Connected to database: {self.database_file}")
 
         return self.connection
     
@@ -58,7 +132,7 @@ class DatabaseConnection:
         if self.connection:
             self.connection.close()
             self.connection = None #type: ignore
-            current_app.logger.info("Database connection closed.")
+            current_app.logger.debug("Database connection closed.")
         else:
             current_app.logger.warning("Can't close database because it's not connected.")
     
@@ -90,6 +164,57 @@ class DatabaseConnection:
         else:
             current_app.logger.warning("Can't rollback database because it's not connected.")
 
+    def reset(self):
+        '''
+        重置连接状态，供连接池复用前调用。
+        回滚未提交的事务，并恢复行工厂和外键约束。
+        Argruments:
+            None
+        Returns:
+            None
+        '''
+        if self.connection.in_transaction:
+            self.connection.rollback()
+        self._transaction_depth = 0
+        
+        self.connection.row_factory = sqlite3.Row # type: ignore
+        self.connection.execute("PRAGMA foreign_keys = ON;")
+
+    @contextmanager
+    def transaction(self):
+        '''
+        写事务。持有进程内的写锁，保证同一时间只有一个写事务，读操作可并行。
+        正常退出时提交，发生异常时回滚。可以嵌套，只有最外层会提交。
+        Argruments:
+            None
+        Returns:
+            DatabaseConnection: 当前连接
+        '''
+        with WRITE_LOCK:
+            # 嵌套事务，直接交给最外层处理
+            if self._transaction_depth > 0:
+                self._transaction_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._transaction_depth -= 1
+                return
+            
+            # 立即获取写锁，避免多个进程之间的死锁
+            if not self.connection.in_transaction:
+                self.connection.execute("BEGIN IMMEDIATE")
+
+            self._transaction_depth = 1
+            try:
+                yield self
+            except Exception:
+                self.connection.rollback()
+                raise
+            else:
+                self.connection.commit()
+            finally:
+                self._transaction_depth = 0
+
     def execute(self, sql: str, params: tuple = ()):
         '''
         执行SQL语句。
@@ -101,7 +226,51 @@ class DatabaseConnection:
         '''
         if self.connection:
             cursor = self.connection.cursor()
-            return cursor.execute(sql, params)
+            if not self.metrics and not self.slow_log:
+                return cursor.execute(sql, params)
+
+            start = time.perf_counter()
+            cursor.execute(sql, params)
+            seconds = time.perf_counter() - start
+
+            if self.metrics:
+                self.metrics.observe_sql(sql, seconds)
+            if self.slow_log and seconds >= self.slow_log.threshold:
+                self.slow_log.record(self.connection, sql, params, seconds)
+            return cursor
+        else:
+            current_app.logger.warning("Can't execute SQL because it's not connected.")
+
+    def executemany(self, sql: str, params_list):
+        '''
+        使用多组参数执行同一条SQL语句（批量插入、更新），需要在写事务中调用。
+        Argruments:
+            sql: SQL语句
+            params_list: 参数列表（可以是生成器）
+        Returns:
+            sqlite3.Cursor: 游标，rowcount为受影响的总行数
+        '''
+        if self.connection:
+            cursor = self.connection.cursor()
+            if not self.metrics and not self.slow_log:
+                return cursor.executemany(sql, params_list)
+
+            # 慢查询日志用第一组参数获取执行计划；参数可能是生成器，取出后再放回
+            params_list = iter(params_list)
+            first = next(params_list, None)
+            if first is not None:
+                params_list = chain([first], params_list)
+
+            # 整批计时
+            start = time.perf_counter()
+            cursor.executemany(sql, params_list)
+            seconds = time.perf_counter() - start
+
+            if self.metrics:
+                self.metrics.observe_sql(sql, seconds)
+            if self.slow_log and seconds >= self.slow_log.threshold:
+                self.slow_log.record(self.connection, sql, first or (), seconds)
+            return cursor
         else:
             current_app.logger.warning("Can't execute SQL because it's not connected.")
 
@@ -116,6 +285,8 @@ class DatabaseConnection:
         '''
         cursor = self.execute(sql, params)
         row = cursor.fetchone() 
+        if self.metrics:
+            self.metrics.observe_rows(sql, 1 if row else 0)
         return dict(row) if row else None
     
     def fetch_all(self, sql: str, params: tuple = ()):
@@ -129,6 +300,8 @@ class DatabaseConnection:
         '''
         cursor = self.execute(sql, params)
         rows = cursor.fetchall()
+        if self.metrics:
+            self.metrics.observe_rows(sql, len(rows))
         return [dict(row) for row in rows]
     
     def insert(self, sql: str, params: tuple = ()):
@@ -169,16 +342,26 @@ def get_dbconn():
 
     '''
     if 'db' not in g:
-        g.db = DatabaseConnection()
-        g.db.connect()
+        pool = current_app.extensions.get("db_pool")
+        start = time.perf_counter()
+        if pool:
+            # 从连接池中取出连接，请求结束时由close_dbconn归还
+            g.db = pool.acquire()
+        else:
+            g.db = DatabaseConnection()
+            g.db.connect()
+        
+        metrics = current_app.extensions.get("metrics")
+        if metrics:
+            metrics.checkout_seconds.observe(time.perf_counter() - start)
     else:
         current_app.logger.debug("Using existing database connection in this request.")
         
     return g.db
 
-def close_dbconn  (e=None):
+def close_dbconn(e=None):
     '''
-    关闭当前请求的数据库连接。
+    关闭当前请求的数据库连接。若连接来自连接池，则归还到连接池。
     Arguments:
         e: 异常
     Returns:
@@ -187,7 +370,13 @@ def close_dbconn  (e=None):
 
     db = g.pop('db', None)
 
-    if db is not None:
+    if db is None:
+        return
+    
+    pool = current_app.extensions.get("db_pool")
+    if pool:
+        pool.release(db)
+    else:
         db.close()
         
 class BaseDAO:
@@ -248,16 +437,16 @@ class UsersDAO:
         Returns:
             int: 新账户的ID
         '''
-        # 生成密码哈希
-        password_hash = generate_password_hash(password)
+        # 生成密码哈希（参数见配置 auth.password_hash）
+        password_hash = hash_password(password)
 
         sql = '''
         INSERT INTO users (username, password, is_admin, enabled)
         VALUES (?, ?, ?, ?)
         '''
         params = (username, password_hash, int(is_admin), int(enabled))
-        user_id = self.conn.insert(sql, params)
-        self.conn.commit()
+        with self.conn.transaction():
+            user_id = self.conn.insert(sql, params)
         return user_id
     
     def auth(self, username: str, password: str):
@@ -279,10 +468,22 @@ class UsersDAO:
         params = (username,)
         
         user = self.conn.fetch_one(sql, params)
-        current_app.logger.debug(f"查询用户：{user}")
+        current_app.logger.debug(f"查询用户：{username}，{'存在' if user else '不存在'}")
         
         # 验证密码
         if user and check_password_hash(user['password'], password):
+            # 哈希参数已修改，用新参数重新生成哈希
+            if needs_rehash(user['password']):
+                with self.conn.transaction():
+                    self.conn.execute(
+                        "UPDATE users SET password = ? WHERE id = ?",
+                        (hash_password(password), user['id'])
+                    )
+                current_app.logger.info(f"Password hash of user {user['id']} upgraded.")
+                login_stats = current_app.extensions.get("login_stats")
+                if login_stats:
+                    login_stats.record("rehashed")
+
             # 移除密码字段后返回
             del user['password']
             return user
@@ -333,65 +534,741 @@ class OrderDAO:
     def __init__(self, conn: DatabaseConnection=None): # type:ignore
         self.conn = conn
     
+    def _publish(self):
+        '''写事务提交后，唤醒同一进程中等待的后厨大屏推送（修改内容从order_changes读取）'''
+        get_event_hub(self.conn.database_file).notify()
+    
+    def _log_change(self, change_type: str, order_id: int, item_id: int = None): # type: ignore
+        '''在写事务中记录订单或明细的修改，用于增量同步（get_changes）'''
+        self.conn.execute(
+            "INSERT INTO order_changes (change_type, order_id, item_id) VALUES (?, ?, ?)",
+            (change_type, order_id, item_id)
+        )
+    
     def create(self, 
         table_num: int,
-        items: list[tuple[int, int]]
+        items: list[tuple],
+        guests: int = 0,
+        user_id: int = None # type: ignore
     ):
         '''
         创建一个新订单。
         Arguments:
             table_num: 桌号
-            items: 订单中的菜单项ID列表。每个元素为一个元组，包含菜单项ID和数量。
+            items: 订单中的菜单项列表。每个元素为一个元组，包含菜单项ID、数量和可选的配置字典。
+            guests: 就餐人数
+            user_id: 下单的店员ID
         Returns:
             int: 新订单的ID
         '''
+        now = datetime.now()
+        order_date = now.strftime('%Y-%m-%d')
 
-        # 获取当前最新订单的订单号，计算出下一个订单号    
-        ## 查询今天已有多少单
-        result = self.conn.fetch_one("SELECT count(*) as count FROM orders WHERE DATE(time) = DATE('now')")
-        
-        # 如果今天没有订单，则从1开始
-        if result is None:
-            next_order_num = 1
-        else:
-            next_order_num = result["count"] + 1
+        with self.conn.transaction():
+            # 分配今日订单号，与插入订单在同一个事务中
+            next_order_num = self.next_order_num(order_date)
+
+            # 插入订单到orders数据库，总价在插入明细后更新
+            sql = '''
+            INSERT INTO orders (order_num, order_date, time, table_num, guests, created_by, total_price, status)
+            VALUES (?, ?, ?, ?, ?, ?, 0, 'pending')
+            '''
+            order_time = now.strftime('%Y-%m-%d %H:%M:%S')
+            params = (next_order_num, order_date, order_time, table_num, guests, user_id)
+            order_id = self.conn.insert(sql, params)
+            # 先记录订单，推送时订单事件在明细事件之前
+            self._log_change("order_created", order_id)
+
+            # 插入订单明细
+            total_price, lines = self._insert_items(order_id, items)
+            self.conn.execute("UPDATE orders SET total_price = ? WHERE id = ?", (total_price, order_id))
+
+            # 更新营业统计
+            order = {"order_date": order_date, "time": order_time, "table_num": table_num, "created_by": user_id}
+            self.conn.stats.add_orders(order, 1, total_price, guests) # type: ignore
+            self.conn.stats.add_lines(order_date, lines, 1) # type: ignore
         
-        # 查询menu表，将含有菜品id的items转换为数据库格式的json
-        ## 获取items参数中的所有菜单项ID
-        items_id = [item[0] for item in items]
+        self._publish()
+        return order_id
+    
+    def add_items(self, order_id: int, items: list[tuple], user_id: int) -> int:
+        '''
+        加菜。新加的菜会记录加菜时间和店员。
+        Arguments:
+            order_id: 订单ID
+            items: 菜单项列表，格式同create
+            user_id: 加菜的店员ID
+        Returns:
+            int: 加菜后的订单总价
+        '''
+        added_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        with self.conn.transaction():
+            added_price, lines = self._insert_items(order_id, items, added_time, user_id)
+            self.conn.execute(
+                "UPDATE orders SET total_price = total_price + ? WHERE id = ?",
+                (added_price, order_id)
+            )
+            result = self.conn.fetch_one(
+                "SELECT order_date, time, table_num, created_by, status, total_price FROM orders WHERE id = ?", (order_id,)
+            )
+            self._log_change("total_changed", order_id)
 
-        ## 查询menu表，获取所有菜单项的信息
+            # 更新营业统计（已取消的订单不计入）
+            if result["status"] != 'canceled': # type: ignore
+                self.conn.stats.add_orders(result, 0, added_price, 0) # type: ignore
+                self.conn.stats.add_lines(result["order_date"], lines, 1) # type: ignore
+            if result["status"] == 'paid': # type: ignore
+                self.conn.stats.add_payment(result, 0, added_price) # type: ignore
+
+        self._publish()
+        return result["total_price"] # type: ignore
+    
+    def _insert_items(self, 
+        order_id: int, 
+        items: list[tuple], 
+        added_time: str = None, # type: ignore
+        added_by: int = None # type: ignore
+    ) -> tuple[int, list[dict]]:
+        '''
+        插入订单明细，需要在写事务中调用。
+        Arguments:
+            order_id: 订单ID
+            items: 菜单项列表，格式同create
+            added_time: 加菜时间
+            added_by: 加菜的店员ID
+        Returns:
+            tuple[int, list[dict]]: 插入明细的总价，以及插入的明细
+                （包含id, dish_id, name, category, quantity, unit_price）
+        '''
+        # 查询menu表，获取所有菜单项的名称和价格
+        items_id = [item[0] for item in items]
         placeholders = ','.join(['?'] * len(items_id))
-        dishs = self.conn.fetch_all(f"SELECT id, name, price FROM menu WHERE id IN ({placeholders})", tuple(items_id))
+        dishs = self.conn.fetch_all(f"SELECT id, name, price, category FROM menu WHERE id IN ({placeholders})", tuple(items_id))
         
         ## 转换为字典方便查询
         dish_dict = {dish["id"]: dish for dish in dishs}
 
-        ## 创建items_json，并计算总价格
-        item_json_list = []
         total_price : int = 0
+        lines = []
         for item in items:
-            item_json_list .append({
-                "id": item[0] , # 菜单项ID
-                "name": dish_dict[item[0]]["name"], # 菜单项名称
-                "price": dish_dict[item[0]]["price"], # 菜单项价格
-                "quantity": item[1], # 数量
+            dish_id, quantity = item[0], item[1]
+            options = item[2] if len(item) > 2 else None
+            dish = dish_dict[dish_id]
+
+            item_id = self.conn.insert('''
+                INSERT INTO order_items 
+                (order_id, dish_id, name, quantity, unit_price, options_json, added_time, added_by)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                order_id, dish_id, dish["name"], quantity, dish["price"],
+                json.dumps(options, ensure_ascii=False) if options else None,
+                added_time, added_by
+            ))
+            lines.append({
+                "id": item_id,
+                "dish_id": dish_id,
+                "name": dish["name"],
+                "category": dish["category"],
+                "quantity": quantity,
+                "unit_price": dish["price"],
             })
-            total_price += dish_dict[item[0]]["price"] * item[1]
+            self._log_change("item_added", order_id, item_id)
+            total_price += dish["price"] * quantity
         
-        ## 转换为json字符串
-        items_json = json.dumps(item_json_list, ensure_ascii=False)
+        return total_price, lines
+    
+    def get_by_id(self, order_id: int) -> dict:
+        '''
+        获取订单及其明细
+        Arguments:
+            order_id: 订单ID
+        Returns:
+            dict: 订单信息，包含items明细列表；不存在返回None
+        '''
+        order = self.conn.fetch_one("SELECT * FROM orders WHERE id = ?", (order_id,))
+        if order:
+            order["items"] = self.get_items(order_id)
+        return order # type: ignore
+    
+    def get_items(self, order_id: int) -> list[dict]:
+        '''
+        获取订单明细
+        Arguments:
+            order_id: 订单ID
+        Returns:
+            list: 明细列表
+        '''
+        items = self.conn.fetch_all(
+            "SELECT * FROM order_items WHERE order_id = ? ORDER BY id", (order_id,)
+        )
 
+        for item in items:
+            item["options"] = json.loads(item["options_json"]) if item["options_json"] else {}
+            del item["options_json"]
+        
+        return items
+    
+    def complete_item(self, item_id: int) -> bool:
+        '''
+        出菜，将明细标记为已完成
+        Arguments:
+            item_id: 明细ID
+        Returns:
+            bool: 是否标记成功
+        '''
+        with self.conn.transaction():
+            cursor = self.conn.execute(
+                "UPDATE order_items SET is_completed = 1 WHERE id = ? AND is_completed = 0", (item_id,)
+            )
+            if cursor.rowcount == 0: # type: ignore
+                return False
+            
+            item = self.conn.fetch_one("SELECT order_id FROM order_items WHERE id = ?", (item_id,))
+            self._log_change("item_completed", item["order_id"], item_id) # type: ignore
+        
+        self._publish()
+        return True
+    
+    def set_status(self, order_id: int, status: str) -> bool:
+        '''
+        修改订单状态
+        可能抛出的异常：
+            ValueError: 状态不在ORDER_STATUSES中
+        Arguments:
+            order_id: 订单ID
+            status: 新状态
+        Returns:
+            bool: 是否修改成功
+        '''
+        if status not in ORDER_STATUSES:
+            raise ValueError(f"Invalid order status: {status}")
+        
+        with self.conn.transaction():
+            order = self.conn.fetch_one(
+                "SELECT order_date, time, table_num, created_by, status, guests, total_price FROM orders WHERE id = ?",
+                (order_id,)
+            )
+            if not order or order["status"] == status:
+                return False
+            
+            self.conn.execute("UPDATE orders SET status = ? WHERE id = ?", (status, order_id))
+            self._log_change("status_changed", order_id)
 
-        # 插入订单到orders数据库
-        sql = '''
-        INSERT INTO orders (order_num, table_num, items_json, total_price, status)
-        VALUES (?, ?, ?, ?, 'pending')
+            # 更新营业统计
+            old_status = order["status"]
+            order_date = order["order_date"]
+
+            ## 取消订单或恢复已取消的订单
+            if (old_status == 'canceled') != (status == 'canceled'):
+                sign = -1 if status == 'canceled' else 1
+                lines = self.conn.fetch_all(
+                    "SELECT dish_id, name, quantity, unit_price FROM order_items WHERE order_id = ?", (order_id,)
+                )
+                self.conn.stats.add_orders(order, sign, order["total_price"] * sign, order["guests"] * sign) # type: ignore
+                self.conn.stats.add_lines(order_date, lines, sign) # type: ignore
+            
+            ## 结账或撤销结账
+            if (old_status == 'paid') != (status == 'paid'):
+                sign = 1 if status == 'paid' else -1
+                self.conn.stats.add_payment(order, sign, order["total_price"] * sign) # type: ignore
+        
+        self._publish()
+        return True
+    
+    def get_open(self) -> list[dict]:
+        '''
+        获取所有未完成（待处理、制作中）的订单及其明细（用于后厨大屏）
+        Returns:
+            list: 订单列表，每个订单包含items明细列表
+        '''
+        orders = self.conn.fetch_all('''
+            SELECT * FROM orders WHERE status IN ('pending', 'cooking') ORDER BY id
+        ''')
+        items = self.conn.fetch_all('''
+            SELECT order_items.* FROM order_items
+            JOIN orders ON orders.id = order_items.order_id
+            WHERE orders.status IN ('pending', 'cooking')
+            ORDER BY order_items.id
+        ''')
+
+        order_dict = {order["id"]: order for order in orders}
+        for order in orders:
+            order["items"] = []
+        for item in items:
+            # 两次查询之间新建的订单不在orders中，其明细会通过事件推送或增量同步得到
+            if item["order_id"] not in order_dict:
+                continue
+            item["options"] = json.loads(item["options_json"]) if item["options_json"] else {}
+            del item["options_json"]
+            order_dict[item["order_id"]]["items"].append(item)
+        
+        return orders
+    
+    def get_last_seq(self) -> int:
+        '''
+        获取最新的修改序号
+        Returns:
+            int: 修改序号，没有修改记录时为0
+        '''
+        result = self.conn.fetch_one("SELECT COALESCE(MAX(seq), 0) AS seq FROM order_changes")
+        return result["seq"] # type: ignore
+
+    def get_changes(self, since: int, limit: int = 500) -> dict:
         '''
-        params = (next_order_num, table_num, items_json, total_price)
+        增量同步：获取修改序号since之后修改过的订单和明细。
+        order_changes表的主键就是修改序号，查询为范围扫描。
+        Arguments:
+            since: 上次同步得到的修改序号，0表示从头开始
+            limit: 最多读取的修改记录数
+        Returns:
+            dict: {
+                'seq': 本次同步到的修改序号（下次作为since传入）,
+                'has_more': 是否还有未读取的修改,
+                'changes': 修改记录列表，按修改序号排序 [{'seq', 'change_type', 'order_id', 'item_id'}, ...],
+                'orders': 修改过的订单列表（不含明细）,
+                'items': 修改过的明细列表
+            }
+        '''
+        changes = self.conn.fetch_all(
+            "SELECT seq, change_type, order_id, item_id FROM order_changes WHERE seq > ? ORDER BY seq LIMIT ?",
+            (since, limit + 1)
+        )
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        # 同一个订单或明细可能修改了多次，只返回一次当前状态
+        order_ids = sorted({change["order_id"] for change in changes if change["item_id"] is None})
+        item_ids = sorted({change["item_id"] for change in changes if change["item_id"] is not None})
+
+        orders = []
+        if order_ids:
+            placeholders = ','.join(['?'] * len(order_ids))
+            orders = self.conn.fetch_all(f"SELECT * FROM orders WHERE id IN ({placeholders})", tuple(order_ids))
         
-        return self.conn.insert(sql, params)
+        items = []
+        if item_ids:
+            placeholders = ','.join(['?'] * len(item_ids))
+            items = self.conn.fetch_all(f"SELECT * FROM order_items WHERE id IN ({placeholders})", tuple(item_ids))
+            for item in items:
+                item["options"] = json.loads(item["options_json"]) if item["options_json"] else {}
+                del item["options_json"]
+
+        return {
+            "seq": changes[-1]["seq"] if changes else since,
+            "has_more": has_more,
+            "changes": changes,
+            "orders": orders,
+            "items": items,
+        }
+    
+    def get_uncompleted_dishes(self) -> list[dict]:
+        '''
+        统计每个菜品还未出菜的数量（用于后厨）
+        Returns:
+            list: [{'dish_id': 1, 'name': '宫保鸡丁', 'quantity': 3}, ...]
+        '''
+        return self.conn.fetch_all('''
+            SELECT order_items.dish_id, order_items.name, SUM(order_items.quantity) AS quantity
+            FROM order_items
+            JOIN orders ON orders.id = order_items.order_id
+            WHERE order_items.is_completed = 0 AND orders.status IN ('pending', 'cooking')
+            GROUP BY order_items.dish_id
+            ORDER BY quantity DESC
+        ''')
+    
+    def next_order_num(self, order_date: str) -> int:
+        '''
+        分配指定日期的下一个订单号。每日订单号从1开始递增。
+        通过order_counters表的主键更新，不需要扫描orders表。
+        需要在写事务中调用，保证并发下订单号不重复、不跳号。
+        Arguments:
+            order_date: 日期，格式为YYYY-MM-DD
+        Returns:
+            int: 订单号
+        '''
+        self.conn.execute('''
+            INSERT INTO order_counters (order_date, last_num) VALUES (?, 1)
+            ON CONFLICT(order_date) DO UPDATE SET last_num = last_num + 1
+        ''', (order_date,))
+
+        result = self.conn.fetch_one(
+            "SELECT last_num FROM order_counters WHERE order_date = ?", (order_date,)
+        )
+        return result["last_num"] # type: ignore
+    
+class StatsDAO:
+    '''
+    营业统计汇总的数据库操作
+    对应表: daily_stats, daily_dish_stats, daily_category_stats, hourly_stats
+    由OrderDAO在下单、加菜、结账、取消的同一个写事务中增量更新。
+    '''
+    # 报表的时间粒度，对应按营业日分组的表达式
+    BUCKETS = {
+        "hour": "order_date || ' ' || printf('%02d:00', hour)",
+        "day": "order_date",
+        "week": "date(order_date, 'weekday 0', '-6 days')", # 每周的周一
+        "month": "substr(order_date, 1, 7)",
+    }
+
+    # 报表的拆分维度
+    SPLITS = ["table", "waiter", "category"]
+
+    # 订单统计表的主键（同_order_keys）
+    ORDER_STATS_KEYS = {
+        "daily_stats": ["order_date"],
+        "hourly_stats": ["order_date", "hour"],
+        "daily_table_stats": ["order_date", "table_num"],
+        "daily_waiter_stats": ["order_date", "user_id"],
+    }
+
+    def __init__(self, conn: DatabaseConnection=None): # type:ignore
+        self.conn = conn
+    
+    def _order_keys(self, order: dict) -> list[tuple[str, dict]]:
+        '''
+        订单所属的各个统计表及其主键
+        Arguments:
+            order: 订单，包含order_date, time, table_num, created_by
+        Returns:
+            list: [(表名, {主键列: 值}), ...]
+        '''
+        order_date = order["order_date"]
+        return [
+            ("daily_stats", {"order_date": order_date}),
+            ("hourly_stats", {"order_date": order_date, "hour": int(order["time"][11:13])}),
+            ("daily_table_stats", {"order_date": order_date, "table_num": order["table_num"]}),
+            # 没有店员时为0
+            ("daily_waiter_stats", {"order_date": order_date, "user_id": order["created_by"] or 0}),
+        ]
+
+    def _add(self, order: dict, values: dict):
+        '''将values累加到订单所属的各个统计表，需要在写事务中调用'''
+        for table, keys in self._order_keys(order):
+            columns = [*keys, *values]
+            placeholders = ', '.join(['?'] * len(columns))
+            updates = ', '.join(f'{column} = {column} + excluded.{column}' for column in values)
+
+            self.conn.execute(f'''
+                INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})
+                ON CONFLICT({', '.join(keys)}) DO UPDATE SET {updates}
+            ''', (*keys.values(), *values.values()))
+
+    def add_orders(self, order: dict, count: int, sales: int, guests: int):
+        '''
+        增加（或减少）订单所在日期、小时、桌号、店员的订单数、下单金额和就餐人数，需要在写事务中调用。
+        Arguments:
+            order: 订单，包含order_date, time, table_num, created_by
+            count: 订单数变化
+            sales: 下单金额变化，单位：分
+            guests: 就餐人数变化
+        Returns:
+            None
+        '''
+        self._add(order, {"order_count": count, "total_sales": sales, "covers": guests})
     
+    def add_payment(self, order: dict, count: int, revenue: int):
+        '''
+        增加（或减少）订单所在日期、小时、桌号、店员的结账订单数和营业额，需要在写事务中调用。
+        Arguments:
+            order: 订单，包含order_date, time, table_num, created_by
+            count: 结账订单数变化
+            revenue: 营业额变化，单位：分
+        Returns:
+            None
+        '''
+        self._add(order, {"paid_count": count, "revenue": revenue})
+    
+    def add_lines(self, order_date: str, lines: list[dict], sign: int):
+        '''
+        将订单明细计入（或移出）指定日期的菜品和分类统计，需要在写事务中调用。
+        Arguments:
+            order_date: 营业日
+            lines: 明细列表，包含dish_id, name, quantity, unit_price，可选category
+            sign: 1表示计入，-1表示移出
+        Returns:
+            None
+        '''
+        for line in lines:
+            quantity = line["quantity"] * sign
+            sales = line["unit_price"] * line["quantity"] * sign
+
+            # 移出时明细中没有分类，使用计入时记录的分类
+            category = line.get("category")
+            if category is None:
+                row = self.conn.fetch_one(
+                    "SELECT category FROM daily_dish_stats WHERE order_date = ? AND dish_id = ?",
+                    (order_date, line["dish_id"])
+                )
+                category = row["category"] if row else ""
+
+            self.conn.execute('''
+                INSERT INTO daily_dish_stats (order_date, dish_id, name, category, quantity, sales)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(order_date, dish_id) DO UPDATE SET
+                    quantity = quantity + excluded.quantity,
+                    sales = sales + excluded.sales
+            ''', (order_date, line["dish_id"], line["name"], category, quantity, sales))
+
+            self.conn.execute('''
+                INSERT INTO daily_category_stats (order_date, category, quantity, sales)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(order_date, category) DO UPDATE SET
+                    quantity = quantity + excluded.quantity,
+                    sales = sales + excluded.sales
+            ''', (order_date, category, quantity, sales))
+    
+    def add_totals(self, orders: dict, dishes: dict):
+        '''
+        批量累加已汇总的统计（如批量生成的历史订单），需要在写事务中调用。
+        Arguments:
+            orders: {(表名, 营业日[, 小时/桌号/店员ID]): [订单数, 下单金额, 就餐人数, 结账订单数, 营业额]}
+                表名为daily_stats, hourly_stats, daily_table_stats, daily_waiter_stats
+            dishes: {(营业日, 菜品ID, 名称, 分类): [数量, 销售额]}
+        Returns:
+            None
+        '''
+        values = ["order_count", "total_sales", "covers", "paid_count", "revenue"]
+        updates = ', '.join(f'{column} = {column} + excluded.{column}' for column in values)
+
+        tables: dict[str, list[tuple]] = {}
+        for (table, *keys), totals in orders.items():
+            tables.setdefault(table, []).append((*keys, *totals))
+
+        for table, rows in tables.items():
+            keys = self.ORDER_STATS_KEYS[table]
+            columns = [*keys, *values]
+            self.conn.executemany(f'''
+                INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})
+                ON CONFLICT({', '.join(keys)}) DO UPDATE SET {updates}
+            ''', rows)
+
+        categories: dict[tuple, list[int]] = {}
+        for (order_date, _, _, category), (quantity, sales) in dishes.items():
+            totals = categories.setdefault((order_date, category), [0, 0])
+            totals[0] += quantity
+            totals[1] += sales
+
+        self.conn.executemany('''
+            INSERT INTO daily_dish_stats (order_date, dish_id, name, category, quantity, sales)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(order_date, dish_id) DO UPDATE SET
+                quantity = quantity + excluded.quantity,
+                sales = sales + excluded.sales
+        ''', [(*key, *totals) for key, totals in dishes.items()])
+
+        self.conn.executemany('''
+            INSERT INTO daily_category_stats (order_date, category, quantity, sales)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(order_date, category) DO UPDATE SET
+                quantity = quantity + excluded.quantity,
+                sales = sales + excluded.sales
+        ''', [(*key, *totals) for key, totals in categories.items()])
+
+    def get_day(self, order_date: str) -> dict:
+        '''
+        获取指定日期的营业统计（主键查询）
+        Arguments:
+            order_date: 营业日
+        Returns:
+            dict: {'order_date', 'order_count', 'total_sales', 'covers', 'paid_count', 'revenue'}
+        '''
+        stats = self.conn.fetch_one("SELECT * FROM daily_stats WHERE order_date = ?", (order_date,))
+        if stats:
+            return stats
+        
+        return {
+            "order_date": order_date,
+            "order_count": 0,
+            "total_sales": 0,
+            "covers": 0,
+            "paid_count": 0,
+            "revenue": 0,
+        }
+    
+    def get_dishes(self, order_date: str) -> list[dict]:
+        '''
+        获取指定日期每个菜品的销量
+        Arguments:
+            order_date: 营业日
+        Returns:
+            list: [{'dish_id', 'name', 'category', 'quantity', 'sales'}, ...]，按销量降序
+        '''
+        return self.conn.fetch_all('''
+            SELECT dish_id, name, category, quantity, sales FROM daily_dish_stats
+            WHERE order_date = ? AND quantity > 0
+            ORDER BY quantity DESC
+        ''', (order_date,))
+    
+    def get_categories(self, order_date: str) -> list[dict]:
+        '''
+        获取指定日期每个分类的销量
+        Arguments:
+            order_date: 营业日
+        Returns:
+            list: [{'category', 'quantity', 'sales'}, ...]，按销售额降序
+        '''
+        return self.conn.fetch_all('''
+            SELECT category, quantity, sales FROM daily_category_stats
+            WHERE order_date = ? AND quantity > 0
+            ORDER BY sales DESC
+        ''', (order_date,))
+    
+    def report(self, start: str, end: str, bucket: str = "day", split: str = None) -> list[dict]: # type: ignore
+        '''
+        营业报表：按时间粒度（及拆分维度）汇总一段日期内的营业数据。
+        只读取预先汇总好的统计表，按营业日（主键前缀）范围查询。
+        可能抛出的异常：
+            ValueError: bucket或split不支持
+        Arguments:
+            start: 开始日期（含），格式为YYYY-MM-DD
+            end: 结束日期（含），格式为YYYY-MM-DD
+            bucket: 时间粒度，hour, day, week, month
+            split: 拆分维度，None, table, waiter, category
+        Returns:
+            list: 每个时间段（及维度）一行，包含bucket, order_count, total_sales, avg_ticket,
+                  covers, paid_count, revenue；按分类拆分时为bucket, category, quantity, sales
+        '''
+        if bucket not in self.BUCKETS:
+            raise ValueError(f"Unsupported bucket: {bucket}")
+        if split is not None and split not in self.SPLITS:
+            raise ValueError(f"Unsupported split: {split}")
+        
+        bucket_sql = self.BUCKETS[bucket]
+
+        # 按分类拆分：读取每日分类统计，没有小时粒度
+        if split == "category":
+            if bucket == "hour":
+                raise ValueError("Category split does not support hour bucket")
+            
+            return self.conn.fetch_all(f'''
+                SELECT {bucket_sql} AS bucket, category, SUM(quantity) AS quantity, SUM(sales) AS sales
+                FROM daily_category_stats
+                WHERE order_date BETWEEN ? AND ?
+                GROUP BY 1, 2
+                ORDER BY 1, sales DESC
+            ''', (start, end))
+        
+        # 按小时只能读取hourly_stats，不支持拆分
+        if bucket == "hour":
+            if split is not None:
+                raise ValueError(f"{split.capitalize()} split does not support hour bucket")
+            
+            rows = self.conn.fetch_all(f'''
+                SELECT 
+                    {bucket_sql} AS bucket,
+                    order_count, total_sales, covers, paid_count, revenue
+                FROM hourly_stats
+                WHERE order_date BETWEEN ? AND ?
+                ORDER BY order_date, hour
+            ''', (start, end))
+        else:
+            table, split_column = {
+                None: ("daily_stats", ""),
+                "table": ("daily_table_stats", ", table_num"),
+                "waiter": ("daily_waiter_stats", ", user_id"),
+            }[split]
+
+            rows = self.conn.fetch_all(f'''
+                SELECT 
+                    {bucket_sql} AS bucket{split_column},
+                    SUM(order_count) AS order_count,
+                    SUM(total_sales) AS total_sales,
+                    SUM(covers) AS covers,
+                    SUM(paid_count) AS paid_count,
+                    SUM(revenue) AS revenue
+                FROM {table}
+                WHERE order_date BETWEEN ? AND ?
+                GROUP BY 1{split_column}
+                ORDER BY 1{split_column}
+            ''', (start, end))
+
+        # 客单价 = 下单金额 / 订单数
+        for row in rows:
+            row["avg_ticket"] = round(row["total_sales"] / row["order_count"]) if row["order_count"] else 0
+        
+        return rows
+    
+    def rebuild(self) -> int:
+        '''
+        根据所有历史订单重新计算营业统计
+        Returns:
+            int: 重新计算的天数
+        '''
+        with self.conn.transaction():
+            return rebuild_stats_tables(self.conn)
+
+class SessionDAO:
+    '''
+    服务端session的数据库操作
+    对应表: sessions
+    '''
+    def __init__(self, conn: DatabaseConnection=None): # type:ignore
+        self.conn = conn
+
+    def get(self, session_id: str, now: float) -> tuple[dict, float] | None:
+        '''
+        获取未过期的session
+        Arguments:
+            session_id: session ID
+            now: 当前时间（Unix时间戳）
+        Returns:
+            tuple: (session数据, 过期时间)
+            None: 不存在或已过期
+        '''
+        result = self.conn.fetch_one(
+            "SELECT data, expires FROM sessions WHERE id = ? AND expires > ?",
+            (session_id, now)
+        )
+        if not result:
+            return None
+        return json.loads(result["data"]), result["expires"]
+
+    def save(self, session_id: str, data: dict, expires: float):
+        '''
+        保存session
+        Arguments:
+            session_id: session ID
+            data: session数据
+            expires: 过期时间（Unix时间戳）
+        Returns:
+            None
+        '''
+        with self.conn.transaction():
+            self.conn.execute('''
+            INSERT INTO sessions (id, data, expires) VALUES (?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET data = excluded.data, expires = excluded.expires
+            ''', (session_id, json.dumps(data, ensure_ascii=False), expires))
+
+    def touch(self, session_id: str, expires: float):
+        '''
+        顺延session的过期时间
+        Arguments:
+            session_id: session ID
+            expires: 新的过期时间（Unix时间戳）
+        Returns:
+            None
+        '''
+        with self.conn.transaction():
+            self.conn.execute("UPDATE sessions SET expires = ? WHERE id = ?", (expires, session_id))
+
+    def delete(self, session_id: str):
+        '''删除session'''
+        with self.conn.transaction():
+            self.conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def delete_expired(self, now: float) -> int:
+        '''
+        删除所有过期的session
+        Arguments:
+            now: 当前时间（Unix时间戳）
+        Returns:
+            int: 删除的数量
+        '''
+        with self.conn.transaction():
+            cursor = self.conn.execute("DELETE FROM sessions WHERE expires <= ?", (now,))
+        return cursor.rowcount
+
 class DishDAO:
     '''
     菜品数据访问对象
@@ -410,7 +1287,134 @@ class DishDAO:
         '''获取数据库连接'''
         return self.conn
     
+    # ==================== 菜单缓存 ====================
+
+    def _get_cache(self):
+        '''获取当前数据库对应的菜单缓存'''
+        return get_menu_cache(self.conn.database_file)
+
+    def _load_snapshot(self) -> dict:
+        '''
+        从数据库加载完整菜单，并预先计算各种分组
+        Returns:
+            dict: {
+                'all': 所有菜品,
+                'available': 可用菜品,
+                'by_category': {分类: 可用菜品列表},
+                'categories': 可用菜品的分类列表,
+                'menu': get_menu_by_category的结果,
+                'search': 可用菜品的搜索索引
+            }
+        '''
+        dishes = self.conn.fetch_all('SELECT * FROM menu ORDER BY category, id')
+
+        # 解析JSON字段
+        for dish in dishes:
+            if dish.get('options_json'):
+                dish['options'] = json.loads(dish['options_json'])
+            else:
+                dish['options'] = {}
+            del dish['options_json']
+        
+        available = [dish for dish in dishes if dish['is_available']]
+
+        by_category = {}
+        menu = {}
+        for dish in available:
+            category = dish['category']
+            if category not in by_category:
+                by_category[category] = []
+                menu[category] = []
+            by_category[category].append(dish)
+
+            # 转换为前端友好的格式
+            menu[category].append({
+                'id': dish['id'],
+                'name': dish['name'],
+                'price': dish['price'] / 100,  # 转成元
+                'description': dish['description'],
+                'image': dish['image_url'],
+                'options': dish['options']
+            })
+        
+        return {
+            'all': dishes,
+            'available': available,
+            'by_category': by_category,
+            'categories': sorted(by_category),
+            'menu': menu,
+            'search': DishSearchIndex(available),
+        }
+
+    def _get_snapshot(self) -> dict:
+        '''
+        获取菜单缓存，版本号与数据库不一致时重新加载
+        Returns:
+            dict: 见_load_snapshot
+        '''
+        # 先读版本号再读数据，保证缓存的数据不会比版本号旧
+        return self._get_cache().get(self.get_menu_version(), self._load_snapshot)
+
+    def _invalidate(self):
+        '''菜单被修改后，清空菜单缓存'''
+        self._get_cache().invalidate()
+
+    def get_menu_version(self) -> int:
+        '''
+        获取当前菜单版本号，菜单每次修改都会改变
+        Returns:
+            int: 版本号
+        '''
+        return self.conn.fetch_one('SELECT version FROM menu_version WHERE id = 1')['version'] # type: ignore
+    
     # ==================== 基础增删改查 ====================
+
+    # 插入菜品的SQL，create与create_batch共用
+    INSERT_SQL = '''
+    INSERT INTO menu 
+    (name, price, category, description, image_url, is_available, options_json)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    # 可以修改的字段
+    UPDATE_FIELDS = ['name', 'price', 'category', 'description', 
+                     'image_url', 'is_available', 'options_json']
+
+    @staticmethod
+    def _insert_params(name: str, 
+                       price: int, 
+                       category: str, 
+                       description: str = "",
+                       image_url: str = "",
+                       is_available: bool = True,
+                       options_json: dict = None) -> tuple:
+        '''生成INSERT_SQL的参数，参数同create'''
+        # 处理options_json
+        if options_json is None:
+            options_json = {}
+        options_str = json.dumps(options_json, ensure_ascii=False)
+
+        return (name, price, category, description, image_url, 
+                int(is_available), options_str)
+
+    def _update_fields(self, kwargs: dict) -> dict:
+        '''
+        整理要修改的字段：options转为options_json，is_available转为整数，忽略不存在的字段
+        Args:
+            kwargs: 要更新的字段
+        Returns:
+            dict: 字段 -> 值
+        '''
+        # 特殊处理options_json
+        if 'options' in kwargs:
+            kwargs['options_json'] = json.dumps(kwargs.pop('options'), ensure_ascii=False)
+
+        fields = {}
+        for key, value in kwargs.items():
+            # 只更新menu表中存在的字段
+            if key in self.UPDATE_FIELDS:
+                fields[key] = int(value) if key == 'is_available' else value
+        return fields
     
     def create(self, 
                name: str, 
@@ -435,20 +1439,13 @@ class DishDAO:
         '''
         db = self.conn
         
-        # 处理options_json
-        if options_json is None:
-            options_json = {}
-        options_str = json.dumps(options_json, ensure_ascii=False)
+        params = self._insert_params(name, price, category, description, image_url, is_available, options_json)
         
-        sql = '''
-        INSERT INTO menu 
-        (name, price, category, description, image_url, is_available, options_json)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        '''
-        params = (name, price, category, description, image_url, 
-                  int(is_available), options_str)
+        with db.transaction():
+            dish_id = db.insert(self.INSERT_SQL, params)
         
-        return db.insert(sql, params)
+        self._invalidate()
+        return dish_id
     
     def get_by_id(self, dish_id: int) -> dict:
         '''
@@ -484,31 +1481,16 @@ class DishDAO:
         db = self.conn
         
         # 构建动态SQL
-        fields = []
-        values = []
-        
-        # 特殊处理options_json
-        if 'options' in kwargs:
-            kwargs['options_json'] = json.dumps(kwargs.pop('options'), ensure_ascii=False)
-        
-        for key, value in kwargs.items():
-            # 只更新menu表中存在的字段
-            if key in ['name', 'price', 'category', 'description', 
-                      'image_url', 'is_available', 'options_json']:
-                fields.append(f'{key} = ?')
-                if key == 'is_available':
-                    values.append(int(value))
-                else:
-                    values.append(value)
-        
+        fields = self._update_fields(kwargs)
         if not fields:
             return False
         
-        values.append(dish_id)
-        sql = f'UPDATE menu SET {", ".join(fields)} WHERE id = ?'
+        sql = f'UPDATE menu SET {", ".join(f"{key} = ?" for key in fields)} WHERE id = ?'
         
-        db.execute(sql, tuple(values))
-        db.commit()
+        with db.transaction():
+            db.execute(sql, (*fields.values(), dish_id))
+        
+        self._invalidate()
         return True
     
     def delete(self, dish_id: int) -> bool:
@@ -520,8 +1502,10 @@ class DishDAO:
             bool: 是否删除成功
         '''
         db = self.conn
-        db.execute('DELETE FROM menu WHERE id = ?', (dish_id,))
-        db.commit()
+        with db.transaction():
+            db.execute('DELETE FROM menu WHERE id = ?', (dish_id,))
+        
+        self._invalidate()
         return True
     
     def set_availability(self, dish_id: int, is_available: bool) -> bool:
@@ -539,75 +1523,40 @@ class DishDAO:
     
     def get_all(self, include_unavailable: bool = False) -> list[dict]:
         '''
-        获取所有菜品
+        获取所有菜品（读取菜单缓存）
         Args:
             include_unavailable: 是否包含不可用的菜品
         Returns:
             list: 菜品列表
         '''
-        db = self.conn
-        
-        if include_unavailable:
-            dishes = db.fetch_all('SELECT * FROM menu ORDER BY category, id')
-        else:
-            dishes = db.fetch_all('''
-                SELECT * FROM menu 
-                WHERE is_available = 1 
-                ORDER BY category, id
-            ''')
-        
-        # 解析JSON字段
-        for dish in dishes:
-            if dish.get('options_json'):
-                dish['options'] = json.loads(dish['options_json'])
-            else:
-                dish['options'] = {}
-            del dish['options_json']
+        snapshot = self._get_snapshot()
+        dishes = snapshot['all'] if include_unavailable else snapshot['available']
         
-        return dishes
+        return [dict(dish) for dish in dishes]
     
     def get_by_category(self, category: str) -> list[dict]:
         '''
-        获取指定分类的菜品
+        获取指定分类的菜品（读取菜单缓存）
         Args:
             category: 分类名称
         Returns:
             list: 菜品列表
         '''
-        db = self.conn
+        dishes = self._get_snapshot()['by_category'].get(category, [])
         
-        dishes = db.fetch_all('''
-            SELECT * FROM menu 
-            WHERE category = ? AND is_available = 1
-            ORDER BY id
-        ''', (category,))
-        
-        for dish in dishes:
-            if dish.get('options_json'):
-                dish['options'] = json.loads(dish['options_json'])
-            del dish['options_json']
-        
-        return dishes
+        return [dict(dish) for dish in dishes]
     
     def get_categories(self) -> list[str]:
         '''
-        获取所有分类
+        获取所有分类（读取菜单缓存）
         Returns:
             list: 分类名称列表
         '''
-        db = self.conn
-        
-        rows = db.fetch_all('''
-            SELECT DISTINCT category FROM menu 
-            WHERE is_available = 1
-            ORDER BY category
-        ''')
-        
-        return [row['category'] for row in rows]
+        return list(self._get_snapshot()['categories'])
     
     def get_menu_by_category(self) :
         '''
-        获取按分类组织的菜单（用于前端展示）
+        获取按分类组织的菜单（用于前端展示，读取菜单缓存）
         Returns:
             dict: {
                 '热菜': [...],
@@ -615,59 +1564,78 @@ class DishDAO:
                 ...
             }
         '''
-        dishes = self.get_all(include_unavailable=False)
+        menu = self._get_snapshot()['menu']
         
-        menu = {}
-        for dish in dishes:
-            category = dish['category']
-            if category not in menu:
-                menu[category] = []
-            
-            # 转换为前端友好的格式
-            menu[category].append({
-                'id': dish['id'],
-                'name': dish['name'],
-                'price': dish['price'] / 100,  # 转成元
-                'description': dish['description'],
-                'image': dish['image_url'],
-                'options': dish.get('options', {})
-            })
-        
-        return menu
+        return {category: [dict(dish) for dish in dishes] for category, dishes in menu.items()}
     
-    def search(self, keyword: str) -> list[dict]:
+    def search(self, keyword: str, limit: int = None) -> list[dict]: # type: ignore
         '''
-        搜索菜品（按名称模糊搜索）
+        搜索可用菜品（读取菜单缓存中的搜索索引）
+        按名称、拼音、拼音首字母（如 gbjd -> 宫保鸡丁）、分类、描述匹配，按匹配位置排序
         Args:
             keyword: 关键词
+            limit: 最多返回的数量，None为不限制
         Returns:
             list: 匹配的菜品列表
         '''
-        db = self.conn
-        
-        dishes = db.fetch_all('''
-            SELECT * FROM menu 
-            WHERE name LIKE ? AND is_available = 1
-            ORDER BY category, id
-        ''', (f'%{keyword}%',))
+        dishes = self._get_snapshot()['search'].search(keyword, limit)
         
-        return dishes
+        return [dict(dish) for dish in dishes]
     
     # ==================== 批量操作 ====================
     
     def create_batch(self, dishes: list[dict]) -> list[int]:
         '''
-        批量创建菜品
+        批量创建菜品，在一个写事务中用executemany插入
         Args:
             dishes: 菜品列表，每个元素是create方法的参数
         Returns:
-            list: 创建的菜品ID列表
+            list: 创建的菜品ID列表，顺序与dishes相同
         '''
-        ids = []
-        for dish in dishes:
-            dish_id = self.create(**dish)
-            ids.append(dish_id)
-        return ids
+        if not dishes:
+            return []
+        
+        db = self._get_db()
+        params_list = [self._insert_params(**dish) for dish in dishes]
+        with db.transaction():
+            # 写事务持有写锁，期间插入的ID都大于插入前的最大ID
+            last_id = db.fetch_one('SELECT COALESCE(MAX(id), 0) AS id FROM menu')['id'] # type: ignore
+            db.executemany(self.INSERT_SQL, params_list)
+            rows = db.fetch_all('SELECT id FROM menu WHERE id > ? ORDER BY id', (last_id,))
+        
+        self._invalidate()
+        return [row['id'] for row in rows]
+    
+    def update_batch(self, changes: list[dict]) -> int:
+        '''
+        批量修改菜品（如整体调价），在一个写事务中完成。
+        修改的字段相同的菜品合并为一次executemany。
+        Args:
+            changes: 修改列表，每个元素包含id和要更新的字段，如 {'id': 1, 'price': 3000}
+        Returns:
+            int: 实际修改的数量
+        '''
+        # 按修改的字段分组
+        groups: dict[tuple, list[tuple]] = {}
+        for change in changes:
+            change = dict(change)
+            dish_id = change.pop('id')
+            fields = self._update_fields(change)
+            if fields:
+                groups.setdefault(tuple(fields), []).append((*fields.values(), dish_id))
+        
+        if not groups:
+            return 0
+        
+        db = self._get_db()
+        count = 0
+        with db.transaction():
+            for fields, params_list in groups.items():
+                sql = f'UPDATE menu SET {", ".join(f"{key} = ?" for key in fields)} WHERE id = ?'
+                count += db.executemany(sql, params_list).rowcount # type: ignore
+        
+        self._invalidate()
+        return count
     
     def delete_batch(self, dish_ids: list[int]) -> int:
         '''
@@ -682,10 +1650,31 @@ class DishDAO:
         
         db = self._get_db()
         placeholders = ','.join(['?'] * len(dish_ids))
-        db.execute(f'DELETE FROM menu WHERE id IN ({placeholders})', tuple(dish_ids))
-        db.commit()
+        with db.transaction():
+            cursor = db.execute(f'DELETE FROM menu WHERE id IN ({placeholders})', tuple(dish_ids))
+        
+        self._invalidate()
         
-        return len(dish_ids)
+        return cursor.rowcount # type: ignore
+    
+    def get_missing_ids(self, dish_ids: list[int]) -> set[int]:
+        '''
+        获取不存在的菜品ID（批量修改前校验用，在写事务中调用时结果在事务结束前不会变化）
+        Args:
+            dish_ids: 菜品ID列表
+        Returns:
+            set: 不存在的菜品ID
+        '''
+        missing = set(dish_ids)
+        ids = list(missing)
+        db = self._get_db()
+        # 分批查询，不超过SQLite的参数个数限制
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ','.join(['?'] * len(chunk))
+            rows = db.fetch_all(f'SELECT id FROM menu WHERE id IN ({placeholders})', tuple(chunk))
+            missing.difference_update(row['id'] for row in rows)
+        return missing
     
     # ==================== 统计方法 ====================
     
@@ -731,15 +1720,212 @@ class DishDAO:
             }
         return {'min': 0, 'max': 0, 'avg': 0}
     
+def rebuild_stats_tables(connection) -> int:
+    '''
+    根据所有历史订单重新计算营业统计，需要在写事务中调用（StatsDAO.rebuild、旧版订单表转换后的迁移）
+    Arguments:
+        connection: sqlite3.Connection 或 DatabaseConnection
+    Returns:
+        int: 重新计算的天数
+    '''
+    connection.execute("DELETE FROM daily_stats")
+    connection.execute("DELETE FROM daily_dish_stats")
+    connection.execute("DELETE FROM daily_category_stats")
+    connection.execute("DELETE FROM hourly_stats")
+    connection.execute("DELETE FROM daily_table_stats")
+    connection.execute("DELETE FROM daily_waiter_stats")
+
+    # 按营业日及各个维度分组汇总
+    for table, group_column in [
+        ("daily_stats", None),
+        ("hourly_stats", ("hour", "CAST(substr(time, 12, 2) AS INTEGER)")),
+        ("daily_table_stats", ("table_num", "table_num")),
+        ("daily_waiter_stats", ("user_id", "COALESCE(created_by, 0)")),
+    ]:
+        key_columns = "order_date" + (f", {group_column[0]}" if group_column else "")
+        key_select = "order_date" + (f", {group_column[1]}" if group_column else "")
+
+        connection.execute(f'''
+            INSERT INTO {table} ({key_columns}, order_count, total_sales, covers, paid_count, revenue)
+            SELECT
+                {key_select},
+                SUM(status != 'canceled'),
+                SUM(CASE WHEN status != 'canceled' THEN total_price ELSE 0 END),
+                SUM(CASE WHEN status != 'canceled' THEN guests ELSE 0 END),
+                SUM(status = 'paid'),
+                SUM(CASE WHEN status = 'paid' THEN total_price ELSE 0 END)
+            FROM orders
+            GROUP BY {"1, 2" if group_column else "1"}
+        ''')
+
+    # 分类取当前菜单中的分类，菜品已删除时为空
+    connection.execute('''
+        INSERT INTO daily_dish_stats (order_date, dish_id, name, category, quantity, sales)
+        SELECT
+            orders.order_date,
+            order_items.dish_id,
+            MAX(order_items.name),
+            COALESCE(MAX(menu.category), ''),
+            SUM(order_items.quantity),
+            SUM(order_items.quantity * order_items.unit_price)
+        FROM order_items
+        JOIN orders ON orders.id = order_items.order_id
+        LEFT JOIN menu ON menu.id = order_items.dish_id
+        WHERE orders.status != 'canceled'
+        GROUP BY orders.order_date, order_items.dish_id
+    ''')
+
+    connection.execute('''
+        INSERT INTO daily_category_stats (order_date, category, quantity, sales)
+        SELECT order_date, category, SUM(quantity), SUM(sales)
+        FROM daily_dish_stats
+        GROUP BY order_date, category
+    ''')
+
+    return connection.execute("SELECT COUNT(*) FROM daily_stats").fetchone()[0]
+
+class MigrationError(ValueError):
+    '''
+    旧版数据无法转换（如订单的items_json格式不正确）
+    '''
+    pass
+
+
+def _legacy_items(order_id: int, items_json: str) -> list[tuple]:
+    '''
+    解析旧版订单的items_json，转换为order_items的插入参数
+    可能抛出的异常：
+        MigrationError: items_json不是菜品列表，或菜品缺少id、price
+    Arguments:
+        order_id: 订单ID
+        items_json: 旧版订单中的菜品列表
+    Returns:
+        list[tuple]: (order_id, dish_id, name, quantity, unit_price, options_json, added_time, added_by, is_completed)
+    '''
+    try:
+        items = json.loads(items_json or "[]")
+    except json.JSONDecodeError as e:
+        raise MigrationError(f"Order {order_id}: invalid items_json ({e.msg})")
+    if not isinstance(items, list):
+        raise MigrationError(f"Order {order_id}: items_json is not a list")
+
+    params = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise MigrationError(f"Order {order_id}: item {index} is not an object")
+        missing = [key for key in ("id", "price") if item.get(key) is None]
+        if missing:
+            raise MigrationError(f"Order {order_id}: item {index} has no {', '.join(missing)}")
+
+        # 其余字段可以缺少，多余的字段忽略
+        added = item.get("added") if isinstance(item.get("added"), dict) else {}
+        params.append((
+            order_id, item["id"], item.get("name") or "", item.get("quantity") or 1, item["price"],
+            json.dumps(item["options"], ensure_ascii=False) if item.get("options") else None,
+            added.get("time"), added.get("by"), int(bool(item.get("is_completed")))
+        ))
+    return params
+
+
+def migrate_order_items(connection: sqlite3.Connection, statements: list[str]) -> dict | None:
+    '''
+    将旧版orders表（菜品保存在items_json中）迁移为orders表 + order_items表。
+    旧表改名为orders_legacy后按初始结构重新建表，再逐行转换，最后删除旧表。
+    需要在写事务（BEGIN IMMEDIATE）中调用，不会提交，失败时由调用者回滚。
+    已存在orders_legacy时（之前的迁移未完成）从该表继续转换，已转换的订单跳过。
+    无法转换的订单（见_legacy_items）移到orders_legacy_rejected表，reason列为原因。
+    Arguments:
+        connection: 数据库连接
+        statements: 初始结构（migrations/0001_initial.sql）的各条语句
+    Returns:
+        dict | None: {'orders': 转换的订单数, 'rejected': [(订单ID, 原因)]}，不需要迁移时为None
+    '''
+    tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if "orders_legacy" not in tables:
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(orders)")]
+        if "items_json" not in columns:
+            return None
+
+        # 旧表改名（索引随表改名，先删除与新结构同名的索引），按新结构重新建表
+        connection.execute("DROP INDEX IF EXISTS idx_orders_time")
+        connection.execute("DROP INDEX IF EXISTS idx_orders_status")
+        connection.execute("ALTER TABLE orders RENAME TO orders_legacy")
+
+    # 逐条执行，executescript 会提交当前事务
+    for statement in statements:
+        connection.execute(statement)
+
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(orders_legacy)")]
+    time_column = "time" if "time" in columns else "NULL"
+    rows = connection.execute(f'''
+        SELECT id, order_num, table_num, status, total_price, items_json, {time_column}
+        FROM orders_legacy
+        WHERE id NOT IN (SELECT id FROM orders)
+    ''').fetchall()
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    converted = 0
+    rejected = []
+    for order_id, order_num, table_num, status, total_price, items_json, time in rows:
+        try:
+            items = _legacy_items(order_id, items_json)
+        except MigrationError as e:
+            rejected.append((order_id, str(e)))
+            continue
+
+        time = time or now
+        connection.execute('''
+            INSERT INTO orders (id, order_num, order_date, time, table_num, status, total_price)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (order_id, order_num, time[:10], time, table_num, status, total_price))
+
+        connection.executemany('''
+            INSERT INTO order_items 
+            (order_id, dish_id, name, quantity, unit_price, options_json, added_time, added_by, is_completed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', items)
+        converted += 1
+
+    # 无法转换的订单保留原始数据
+    if rejected:
+        connection.execute('''
+            CREATE TABLE IF NOT EXISTS orders_legacy_rejected AS
+            SELECT *, '' AS reason FROM orders_legacy WHERE 0
+        ''')
+        connection.executemany(
+            "INSERT INTO orders_legacy_rejected SELECT *, ? FROM orders_legacy WHERE id = ?",
+            [(reason, order_id) for order_id, reason in rejected]
+        )
+
+    # 按已有订单重建每日订单号
+    connection.execute('''
+        INSERT OR REPLACE INTO order_counters (order_date, last_num)
+        SELECT order_date, MAX(order_num) FROM orders GROUP BY order_date
+    ''')
+    connection.execute("DROP TABLE orders_legacy")
+
+    return {"orders": converted, "rejected": rejected}
+
 def init_test_data():
     db = get_dbconn()
 
-    db.users.create("admin", "123456", True, True)
-    db.users.create("waiter1", "w123456", False, True)
-    db.users.create("banned1", "c123456", False, False)
+    # 已存在的账户不重复创建（可多次运行以生成更多订单）
+    for username, password, is_admin, enabled in [
+        ("admin", "123456", True, True),
+        ("waiter1", "w123456", False, True),
+        ("banned1", "c123456", False, False),
+    ]:
+        if not db.fetch_one("SELECT id FROM users WHERE username = ?", (username,)):
+            db.users.create(username, password, is_admin, enabled)
 
-
-    db.close()
+def rebuild_stats():
+    '''
+    根据历史订单重新计算营业统计
+    Returns:
+        int: 重新计算的天数
+    '''
+    db = get_dbconn()
+    return db.stats.rebuild()
 
 def reset_db():
     choice = input("Are you sure you want to reset the database? (y/n) ")
@@ -752,10 +1938,19 @@ def reset_db():
         if os.environ.get("ENVIRONMENT") == "production":
             print("You can't reset the database in production environment.")
 
-        db.execute("DELETE FROM menu")
-        db.execute("DELETE FROM users")
-        db.execute("DELETE FROM orders")
-
-        db.commit()
+        with db.transaction():
+            db.execute("DELETE FROM menu")
+            db.execute("DELETE FROM users")
+            db.execute("DELETE FROM order_changes")
+            db.execute("DELETE FROM daily_stats")
+            db.execute("DELETE FROM daily_dish_stats")
+            db.execute("DELETE FROM daily_category_stats")
+            db.execute("DELETE FROM hourly_stats")
+            db.execute("DELETE FROM daily_table_stats")
+            db.execute("DELETE FROM daily_waiter_stats")
+            db.execute("DELETE FROM order_items")
+            db.execute("DELETE FROM orders")
+            db.execute("DELETE FROM order_counters")
+            db.execute("DELETE FROM sessions")
 
     
\ No newline at end of file
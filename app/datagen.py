@@ -0,0 +1,298 @@
+'''
+生成测试数据（flask init-test-data --dishes N --orders N）。
+
+菜单：按分类生成菜品，部分菜品带可选配置（辣度、规格等）。
+订单：分布在 end 之前的 days 个营业日，周末较多；下单时间集中在午市（11-13点）和晚市（17-20点）。
+    每单1-6道菜，热门菜品被点的次数多；约12%的订单有加菜（added_time、added_by），
+    约96%的订单已结账（paid），其余已取消（canceled）。营业统计在生成时汇总，与订单一起写入。
+
+相同的 seed、end 和数量生成的数据完全相同。
+全部数据在一个写事务中用 executemany 分批写入，失败时全部回滚。
+'''
+import json
+import random
+from datetime import date, timedelta
+from itertools import accumulate
+from .database import DatabaseConnection
+
+# 每批写入的订单数
+BATCH_SIZE = 20000
+
+# 分类 -> 菜名
+DISH_NAMES = {
+    "凉菜": ["拍黄瓜", "凉拌木耳", "夫妻肺片", "口水鸡", "皮蛋豆腐", "蒜泥白肉"],
+    "热菜": ["宫保鸡丁", "鱼香肉丝", "麻婆豆腐", "回锅肉", "红烧肉", "糖醋排骨", "干煸四季豆", "水煮牛肉", "小炒黄牛肉", "地三鲜"],
+    "海鲜": ["清蒸鲈鱼", "油焖大虾", "蒜蓉粉丝扇贝", "酸菜鱼", "香辣蟹"],
+    "汤羹": ["番茄蛋汤", "酸辣汤", "玉米排骨汤", "紫菜蛋花汤"],
+    "主食": ["米饭", "蛋炒饭", "扬州炒饭", "牛肉面", "葱油饼", "水饺"],
+    "饮品": ["酸梅汤", "柠檬水", "可乐", "啤酒", "豆浆"],
+}
+
+# 分类 -> 价格范围（元）
+PRICE_RANGES = {
+    "凉菜": (12, 28),
+    "热菜": (22, 68),
+    "海鲜": (48, 128),
+    "汤羹": (12, 32),
+    "主食": (2, 18),
+    "饮品": (4, 12),
+}
+
+# 可选配置，格式同 menu.options_json
+OPTION_SETS = {
+    "辣度": {"name": "辣度", "choice": ["不辣", "微辣", "中辣", "特辣"]},
+    "规格": {"name": "规格", "choice": ["小份", {"name": "大份", "price": 800}]},
+    "温度": {"name": "温度", "choice": ["常温", "加冰"]},
+}
+
+# 分类 -> 可能带有的可选配置
+CATEGORY_OPTIONS = {
+    "凉菜": ["辣度"],
+    "热菜": ["辣度", "规格"],
+    "海鲜": ["辣度"],
+    "汤羹": ["规格"],
+    "主食": [],
+    "饮品": ["温度"],
+}
+
+# 营业时间内每小时的下单权重（午市、晚市高峰）
+HOUR_WEIGHTS = {10: 2, 11: 10, 12: 14, 13: 6, 14: 2, 15: 1, 16: 2, 17: 8, 18: 14, 19: 10, 20: 4, 21: 2}
+
+# 就餐人数、每单菜品数的权重
+GUEST_WEIGHTS = {1: 10, 2: 30, 3: 20, 4: 22, 5: 8, 6: 6, 8: 4}
+LINE_WEIGHTS = {1: 10, 2: 25, 3: 28, 4: 20, 5: 11, 6: 6}
+
+# 加菜、取消的比例
+ADD_ON_RATE = 0.12
+CANCEL_RATE = 0.04
+
+# 一天中每一秒的时间字符串 HH:MM:SS
+_CLOCK = [f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in range(86400)]
+
+
+def generate_menu(rng: random.Random, count: int) -> list[dict]:
+    '''
+    生成菜品
+    Arguments:
+        rng: 随机数生成器
+        count: 菜品数，超过菜名数量时菜名加上编号
+    Returns:
+        list[dict]: 菜品，参数同 DishDAO.create
+    '''
+    names = [(category, name) for category, dishes in DISH_NAMES.items() for name in dishes]
+
+    dishes = []
+    for i in range(count):
+        category, name = names[i % len(names)]
+        if i >= len(names):
+            name = f"{name}{i // len(names) + 1}号"
+
+        low, high = PRICE_RANGES[category]
+        option_names = [option for option in CATEGORY_OPTIONS[category] if rng.random() < 0.5]
+        dishes.append({
+            "name": name,
+            "price": rng.randint(low, high) * 100,
+            "category": category,
+            "description": "招牌" if rng.random() < 0.1 else "",
+            "options_json": [OPTION_SETS[option] for option in option_names] or None,
+        })
+    return dishes
+
+
+def _option_variants(options_json: str | None) -> list[str | None]:
+    '''
+    菜品的可选配置的所有组合，为订单明细中的 options_json
+    Returns:
+        list: JSON字符串，没有可选配置时为 [None]
+    '''
+    options = json.loads(options_json) if options_json else None
+    if not options or not isinstance(options, list):
+        return [None]
+
+    variants = [{}]
+    for option in options:
+        names = [choice["name"] if isinstance(choice, dict) else choice for choice in option["choice"]]
+        variants = [{**variant, option["name"]: name} for variant in variants for name in names]
+    return [json.dumps(variant, ensure_ascii=False) for variant in variants]
+
+
+def _day_counts(rng: random.Random, days: list[date], orders: int) -> list[int]:
+    '''
+    将订单数分配到各个营业日，周末多30%，每天有±15%的波动
+    Returns:
+        list[int]: 每天的订单数，总和为orders
+    '''
+    weights = [(1.3 if day.weekday() >= 5 else 1.0) * rng.uniform(0.85, 1.15) for day in days]
+    total = sum(weights)
+    counts = [int(orders * weight / total) for weight in weights]
+    for i in range(orders - sum(counts)):
+        counts[i % len(counts)] += 1
+    return counts
+
+
+def generate(db: DatabaseConnection,
+             orders: int,
+             dishes: int = 0,
+             days: int = 90,
+             end: date = None, # type: ignore
+             seed: int = 0,
+             tables: int = 20) -> dict:
+    '''
+    生成菜单和历史订单，并累加营业统计
+    可能抛出的异常：
+        ValueError: 没有可用的菜品（dishes为0且菜单为空）
+    Arguments:
+        db: 数据库连接
+        orders: 订单总数
+        dishes: 新建的菜品数，0为使用现有菜单
+        days: 营业日数
+        end: 最后一个营业日，默认为昨天
+        seed: 随机种子
+        tables: 桌数
+    Returns:
+        dict: {'dishes', 'orders', 'items', 'days'} 新建的数量
+    '''
+    rng = random.Random(seed)
+    end = end or date.today() - timedelta(days=1)
+    day_list = [end - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    counts = _day_counts(rng, day_list, orders)
+
+    # 一天中每一秒的下单权重
+    cum_seconds = list(accumulate(HOUR_WEIGHTS.get(second // 3600, 0) for second in range(86400)))
+    guests_values, guests_cum = list(GUEST_WEIGHTS), list(accumulate(GUEST_WEIGHTS.values()))
+    lines_values, lines_cum = list(LINE_WEIGHTS), list(accumulate(LINE_WEIGHTS.values()))
+
+    item_count = 0
+    with db.transaction():
+        if dishes:
+            db.dishes.create_batch(generate_menu(rng, dishes)) # type: ignore
+
+        menu = db.fetch_all("SELECT id, name, price, category, options_json FROM menu WHERE is_available = 1 ORDER BY id")
+        if not menu:
+            raise ValueError("No available dishes, generate a menu with --dishes.")
+        categories = {dish["id"]: dish["category"] for dish in menu}
+
+        # 菜品的热度：随机排序后按排名递减
+        menu = [(dish["id"], dish["name"], dish["price"], _option_variants(dish["options_json"])) for dish in menu]
+        popularity = [1 / (rank + 1) ** 0.8 for rank in range(len(menu))]
+        rng.shuffle(popularity)
+        menu_cum = list(accumulate(popularity))
+
+        # 店员：启用的非管理员账户，没有时为NULL
+        waiters = [row["id"] for row in db.fetch_all("SELECT id FROM users WHERE enabled = 1 AND is_admin = 0")]
+        waiters = waiters or [None]
+        table_nums = range(1, tables + 1)
+
+        # 已有的订单号，新订单从其后开始
+        counters = {
+            row["order_date"]: row["last_num"]
+            for row in db.fetch_all("SELECT order_date, last_num FROM order_counters")
+        }
+        order_id = db.fetch_one("SELECT COALESCE(MAX(id), 0) AS id FROM orders")["id"] # type: ignore
+
+        # 营业统计在生成时汇总，最后一次写入（格式见 StatsDAO.add_totals）
+        order_totals: dict[tuple, list[int]] = {}
+        dish_totals: dict[tuple, list[int]] = {}
+
+        order_rows = []
+        item_rows = []
+        for day, count in zip(day_list, counts):
+            order_date = day.isoformat()
+            first_num = counters.get(order_date, 0)
+            seconds = sorted(rng.choices(range(86400), cum_weights=cum_seconds, k=count))
+            guests_list = rng.choices(guests_values, cum_weights=guests_cum, k=count)
+            lines_list = rng.choices(lines_values, cum_weights=lines_cum, k=count)
+            waiter_list = rng.choices(waiters, k=count)
+            table_list = rng.choices(table_nums, k=count)
+            picks = iter(rng.choices(menu, cum_weights=menu_cum, k=sum(lines_list) + count * 2))
+            day_dishes: dict[tuple, list[int]] = {}
+
+            for num, second, guests, lines, waiter, table_num in zip(
+                range(first_num + 1, first_num + count + 1), seconds, guests_list, lines_list, waiter_list, table_list
+            ):
+                order_id += 1
+                canceled = rng.random() < CANCEL_RATE
+                total_price = 0
+
+                # 加菜：下单后10-45分钟
+                added_lines = rng.randint(1, 2) if rng.random() < ADD_ON_RATE else 0
+                added_time = f"{order_date} {_CLOCK[min(second + rng.randint(600, 2700), 86399)]}" if added_lines else None
+
+                for line in range(lines + added_lines):
+                    dish_id, name, price, variants = next(picks)
+                    added = line >= lines
+                    quantity = 2 if not added and rng.random() < 0.15 else 1
+                    options = variants[0] if len(variants) == 1 else rng.choice(variants)
+                    item_rows.append((
+                        order_id, dish_id, name, quantity, price, options,
+                        added_time if added else None, waiter if added else None
+                    ))
+                    total_price += price * quantity
+
+                    if not canceled:
+                        totals = day_dishes.get((dish_id, name))
+                        if totals is None:
+                            totals = day_dishes[(dish_id, name)] = [0, 0]
+                        totals[0] += quantity
+                        totals[1] += price * quantity
+
+                order_rows.append((
+                    order_id, num, order_date, f"{order_date} {_CLOCK[second]}",
+                    table_num, guests, waiter, "canceled" if canceled else "paid", total_price
+                ))
+
+                # 已结账的订单计入订单数、下单金额、就餐人数、结账订单数和营业额
+                if not canceled:
+                    for key in (
+                        ("daily_stats", order_date),
+                        ("hourly_stats", order_date, second // 3600),
+                        ("daily_table_stats", order_date, table_num),
+                        ("daily_waiter_stats", order_date, waiter or 0),
+                    ):
+                        totals = order_totals.get(key)
+                        if totals is None:
+                            totals = order_totals[key] = [0, 0, 0, 0, 0]
+                        totals[0] += 1
+                        totals[1] += total_price
+                        totals[2] += guests
+                        totals[3] += 1
+                        totals[4] += total_price
+
+            for (dish_id, name), totals in day_dishes.items():
+                dish_totals[(order_date, dish_id, name, categories[dish_id])] = totals
+
+            counters[order_date] = first_num + count
+            if len(order_rows) >= BATCH_SIZE:
+                item_count += _flush(db, order_rows, item_rows)
+
+        item_count += _flush(db, order_rows, item_rows)
+
+        db.executemany(
+            "INSERT OR REPLACE INTO order_counters (order_date, last_num) VALUES (?, ?)",
+            [(day.isoformat(), counters[day.isoformat()]) for day, count in zip(day_list, counts) if count]
+        )
+        db.stats.add_totals(order_totals, dish_totals) # type: ignore
+
+    return {"dishes": dishes, "orders": orders, "items": item_count, "days": days}
+
+
+def _flush(db: DatabaseConnection, order_rows: list[tuple], item_rows: list[tuple]) -> int:
+    '''
+    写入缓存的订单和明细并清空，需要在写事务中调用
+    Returns:
+        int: 写入的明细数
+    '''
+    db.executemany('''
+        INSERT INTO orders (id, order_num, order_date, time, table_num, guests, created_by, status, total_price)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', order_rows)
+    db.executemany('''
+        INSERT INTO order_items
+        (order_id, dish_id, name, quantity, unit_price, options_json, added_time, added_by, is_completed)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)
+    ''', item_rows)
+
+    count = len(item_rows)
+    order_rows.clear()
+    item_rows.clear()
+    return count
@@ -0,0 +1,81 @@
+import threading
+
+
+class EventHub:
+    '''
+    进程内的订单修改通知。
+    DAO的写操作提交后调用notify，唤醒同一进程中等待的订阅者。
+    通知不带数据：后厨大屏的事件推送以order_changes的修改序号为准，这里只用于及时唤醒。
+    '''
+    def __init__(self):
+        self._condition = threading.Condition()
+        # 通知的次数，只在当前进程中有效
+        self.last_id = 0
+        # 服务器关闭时设置，订阅者结束推送
+        self.closed = False
+
+    def notify(self):
+        '''
+        通知有新的修改，并唤醒所有等待中的订阅者
+        Arguments:
+            None
+        Returns:
+            None
+        '''
+        with self._condition:
+            self.last_id += 1
+            self._condition.notify_all()
+
+    def wait(self, last_id: int, timeout: float) -> bool:
+        '''
+        等待last_id之后的下一次通知
+        Arguments:
+            last_id: 订阅者开始等待前读取的last_id
+            timeout: 最长等待时间（秒）
+        Returns:
+            bool: 是否收到了通知（或事件中心已关闭），超时为False
+        '''
+        with self._condition:
+            return self._condition.wait_for(lambda: self.last_id != last_id or self.closed, timeout)
+
+    def close(self):
+        '''
+        关闭事件中心，唤醒所有等待中的订阅者，使长连接尽快结束
+        Arguments:
+            None
+        Returns:
+            None
+        '''
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+# 每个数据库文件对应一个事件中心
+_event_hubs: dict[str, EventHub] = {}
+_event_hubs_lock = threading.Lock()
+
+def get_event_hub(database_file: str) -> EventHub:
+    '''
+    获取数据库文件对应的事件中心
+    Arguments:
+        database_file: 数据库文件路径
+    Returns:
+        EventHub: 事件中心
+    '''
+    with _event_hubs_lock:
+        if database_file not in _event_hubs:
+            _event_hubs[database_file] = EventHub()
+        return _event_hubs[database_file]
+
+def close_event_hubs():
+    '''
+    关闭所有事件中心，在服务器关闭前调用
+    Arguments:
+        None
+    Returns:
+        None
+    '''
+    with _event_hubs_lock:
+        for hub in _event_hubs.values():
+            hub.close()
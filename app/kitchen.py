@@ -0,0 +1,147 @@
+from flask import Blueprint, Flask, current_app, request, jsonify, Response
+from .database import get_dbconn
+from .events import get_event_hub
+import json
+import threading
+import time
+
+bp = Blueprint('kitchen', __name__, url_prefix='/api/kitchen')
+
+# 事件推送的并发数限制（每个应用一个）
+_stream_slots_lock = threading.Lock()
+
+@bp.route('/orders')
+def get_orders():
+    '''
+    获取所有未完成的订单（后厨大屏首次加载或收到reset事件时调用）。
+    返回的last_event_id（修改序号）用于订阅/api/kitchen/events。
+    '''
+    db = get_dbconn()
+
+    # 先记录修改序号再查询，之后的修改都会通过事件推送
+    last_event_id = db.orders.get_last_seq()
+
+    return jsonify(
+        {
+            "type": "success",
+            "last_event_id": last_event_id,
+            "data": db.orders.get_open()
+        }
+    )
+
+def format_event(event_id: int, event_type: str, data: dict) -> str:
+    '''
+    将事件转换为Server-Sent Events格式
+    Arguments:
+        event_id: 事件ID（修改序号）
+        event_type: 事件类型
+        data: 事件数据
+    Returns:
+        str: SSE格式的文本
+    '''
+    data = json.dumps(data, ensure_ascii=False)
+    return f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
+
+def get_stream_slots(app: Flask) -> threading.BoundedSemaphore:
+    '''
+    获取事件推送的并发数限制。
+    每个推送会一直占用一个服务器线程，上限为 events.max_streams，且不超过 server.threads - 1。
+    Arguments:
+        app: Flask应用
+    Returns:
+        threading.BoundedSemaphore: 可用的推送数
+    '''
+    with _stream_slots_lock:
+        slots = app.extensions.get("kitchen_streams")
+        if slots is None:
+            limit = app.config.get("events", {}).get("max_streams", 4)
+            threads = app.config.get("server", {}).get("threads")
+            if threads:
+                limit = min(limit, threads - 1)
+            slots = app.extensions["kitchen_streams"] = threading.BoundedSemaphore(max(limit, 1))
+        return slots
+
+@bp.route('/events')
+def events():
+    '''
+    推送订单修改（Server-Sent Events）。
+    每条order_changes修改记录推送一个事件，事件ID为修改序号，事件类型为修改类型：
+        order_created、total_changed、status_changed：{"order_id", "order": 订单的当前状态（不含明细）}
+        item_added、item_completed：{"order_id", "item": 明细的当前状态}
+    同一批中多次修改的订单或明细，各事件携带的都是推送时的当前状态。
+    修改序号保存在数据库中，多进程部署时也能收到其他进程中的修改，断线重连到其他进程也能从Last-Event-ID继续。
+    同一进程中的修改立即推送，其他进程中的修改在 events.poll_interval 秒内推送。
+    Last-Event-ID比最新的修改序号还大（数据库被重置）时，推送reset事件，大屏需要重新加载/api/kitchen/orders。
+    同时推送的连接数超过上限时返回503，大屏可改用/api/orders/changes轮询。
+    '''
+    app = current_app._get_current_object() # type: ignore
+    config = app.config.get("events", {})
+    heartbeat = config.get("heartbeat", 15)
+    poll_interval = config.get("poll_interval", 1)
+
+    slots = get_stream_slots(app)
+    if not slots.acquire(blocking=False):
+        response = jsonify(
+            {
+                "type": "busy_error",
+                "message": "too many event streams, poll /api/orders/changes instead"
+            }
+        )
+        response.status_code = 503
+        response.headers["Retry-After"] = "10"
+        return response
+
+    # 长连接不占用数据库连接，每次查询时从连接池取出
+    hub = get_event_hub(app.config["database"]["file"])
+    last_seq = get_dbconn().orders.get_last_seq()
+
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    last_id = int(last_id) if last_id and last_id.isdigit() else last_seq
+
+    def get_changes(since: int) -> dict:
+        with app.app_context():
+            return get_dbconn().orders.get_changes(since)
+
+    def stream(last_id: int):
+        # 告诉浏览器断线后的重连间隔
+        yield "retry: 3000\n\n"
+
+        if last_id > last_seq:
+            last_id = last_seq
+            yield format_event(last_id, "reset", {})
+
+        last_sent = time.monotonic()
+        while not hub.closed:
+            # 同一进程中的修改会唤醒等待
+            hint = hub.last_id
+            changes = get_changes(last_id)
+
+            last_id = changes["seq"]
+            if changes["changes"]:
+                orders = {order["id"]: order for order in changes["orders"]}
+                items = {item["id"]: item for item in changes["items"]}
+                for change in changes["changes"]:
+                    if change["item_id"] is None:
+                        data = {"order_id": change["order_id"], "order": orders.get(change["order_id"])}
+                    else:
+                        data = {"order_id": change["order_id"], "item": items.get(change["item_id"])}
+                    yield format_event(change["seq"], change["change_type"], data)
+                last_sent = time.monotonic()
+                if changes["has_more"]:
+                    continue
+
+            if time.monotonic() - last_sent >= heartbeat:
+                # 心跳，防止连接被代理断开
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+
+            hub.wait(hint, poll_interval)
+
+        # 服务器正在关闭，结束推送，浏览器会自动重连
+
+    response = Response(stream(last_id), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    # 连接结束（包括客户端断开）时释放
+    response.call_on_close(slots.release)
+    return response
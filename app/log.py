@@ -1,8 +1,178 @@
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
+import threading
 from flask import Flask
 from .const import *
 from datetime import datetime
-import os
+
+
+class DailyFileHandler(logging.FileHandler):
+    '''
+    按日期写入日志文件（LOG_PATH/YYYY-MM-DD.log），日期变化时自动切换到新文件。
+    只打开、关闭文件，不重命名，因此多个进程可以同时写入同一个文件。
+    '''
+    def __init__(self, directory: str, encoding: str = DEFAULT_ENCODING):
+        self.directory = directory
+        self.date = datetime.now().strftime('%Y-%m-%d')
+        super().__init__(self._get_path(self.date), encoding=encoding, delay=True)
+
+    def _get_path(self, date: str) -> str:
+        return os.path.join(self.directory, f'{date}.log')
+
+    def emit(self, record: logging.LogRecord):
+        date = datetime.fromtimestamp(record.created).strftime('%Y-%m-%d')
+        if date != self.date:
+            # 日期变化，关闭旧文件，下次写入时打开新文件
+            self.close()
+            self.date = date
+            self.baseFilename = os.path.abspath(self._get_path(date))
+        super().emit(record)
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    '''
+    将日志记录放入有界队列，由后台线程（QueueListener）格式化并写入，请求线程不做任何IO。
+    队列已满时：
+        overflow 为 drop：丢弃该条记录并计数，之后由后台线程写入一条警告说明丢弃的数量；
+        overflow 为 block：等待队列有空位。
+    fork出的子进程中没有后台线程，会重新创建队列并启动新的后台线程。
+    '''
+    def __init__(self, handlers: list[logging.Handler], queue_size: int = 10000, overflow: str = "drop"):
+        self.handlers = handlers
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self.listener = None
+        super().__init__(queue.Queue(queue_size))
+        self.start()
+
+    def start(self):
+        '''创建新的队列并启动后台线程'''
+        self.queue = queue.Queue(self.queue_size)
+        self.listener = logging.handlers.QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def before_fork(self):
+        '''fork前取得各处理器的锁，保证后台线程不在写入过程中，否则子进程中的文件对象可能不可用'''
+        for handler in self.handlers:
+            handler.acquire()
+
+    def after_fork_in_parent(self):
+        for handler in reversed(self.handlers):
+            handler.release()
+
+    def after_fork_in_child(self):
+        '''fork出的子进程中没有后台线程，若父进程中正在运行，则重新启动（处理器的锁已由logging模块重新初始化）'''
+        if self.listener is not None:
+            self.start()
+
+    def stop(self):
+        '''写入队列中剩余的记录，停止后台线程'''
+        if self.listener:
+            self.listener.stop()
+            self.listener = None
+        self._report_dropped()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 同一进程内传递，无需像默认实现那样在请求线程中格式化整条记录
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            if self.overflow == "block":
+                self.queue.put(record)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            return
+
+        if self.dropped:
+            self._report_dropped()
+
+    def _report_dropped(self):
+        '''写入一条警告，说明丢弃了多少条记录'''
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        if not dropped:
+            return
+
+        record = logging.LogRecord(
+            "app", logging.WARNING, __file__, 0,
+            f"Log queue full, dropped {dropped} records.", None, None
+        )
+        if self.listener is None:
+            # 后台线程已停止，直接写入
+            for handler in self.handlers:
+                handler.handle(record)
+            return
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += dropped
+
+
+# 当前进程中使用的异步日志处理器。退出和fork时的钩子只注册一次，对列表中的处理器生效
+_queue_handlers: list[AsyncQueueHandler] = []
+_hooks_registered = False
+
+
+def _before_fork():
+    for handler in _queue_handlers:
+        handler.before_fork()
+
+
+def _after_fork_in_parent():
+    for handler in reversed(_queue_handlers):
+        handler.after_fork_in_parent()
+
+
+def _after_fork_in_child():
+    for handler in _queue_handlers:
+        handler.after_fork_in_child()
+
+
+def _stop_all():
+    for handler in _queue_handlers:
+        handler.stop()
+
+
+def _register_hooks():
+    '''注册进程退出和fork时的钩子（每个进程只注册一次，重新加载配置时不会重复注册）'''
+    global _hooks_registered
+    if _hooks_registered:
+        return
+    _hooks_registered = True
+
+    # 进程退出时写完剩余的日志；fork出的子进程重新启动后台线程
+    atexit.register(_stop_all)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(
+            before=_before_fork,
+            after_in_parent=_after_fork_in_parent,
+            after_in_child=_after_fork_in_child,
+        )
+
+
+def stop_logger(app: Flask):
+    '''
+    写入队列中剩余的日志并停止后台线程，在进程退出前调用
+    Arguments:
+        app: Flask 当前的Flask应用实例。
+    Returns:
+        None
+    '''
+    for handler in app.logger.handlers:
+        if isinstance(handler, AsyncQueueHandler):
+            handler.stop()
+
 
 def setup_logger(app: Flask):
     '''
@@ -17,10 +187,14 @@ def setup_logger(app: Flask):
     # 设置日志记录器
 
     logger = app.logger
-    
-    # 清除默认的处理器
+    config = app.config.get("log", {})
+
+    # 清除默认的处理器；重新加载配置时停止之前的应用的后台线程
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
+    for handler in _queue_handlers:
+        handler.stop()
+    _queue_handlers.clear()
 
     # 设置日志级别
     level = logging.DEBUG if app.config["DEBUG"] else logging.INFO
@@ -35,17 +209,26 @@ def setup_logger(app: Flask):
     console_handler = logging.StreamHandler()
     console_handler.setLevel(level)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
 
-    # 设置文件处理器
-    ## 获取当前日期
-    date = datetime.now().strftime('%Y-%m-%d')
-    
-    file_handler = logging.FileHandler(os.path.join(LOG_PATH, f'{date}.log'), encoding=DEFAULT_ENCODING)
+    # 设置文件处理器，按日期切换文件
+    file_handler = DailyFileHandler(LOG_PATH)
     file_handler.setLevel(level)
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
-    app.logger = logger # type: ignore  
+
+    if config.get("mode", "queue") == "queue":
+        # 异步写入：请求线程只放入队列
+        queue_handler = AsyncQueueHandler(
+            [console_handler, file_handler],
+            queue_size=config.get("queue_size", 10000),
+            overflow=config.get("overflow", "drop"),
+        )
+        logger.addHandler(queue_handler)
+        _queue_handlers.append(queue_handler)
+        _register_hooks()
+    else:
+        logger.addHandler(console_handler)
+        logger.addHandler(file_handler)
+
+    app.logger = logger # type: ignore
 
     return logger
@@ -0,0 +1,116 @@
+from flask import Blueprint, current_app, request, Response, jsonify
+from .database import get_dbconn
+from .const import *
+import gzip
+import hashlib
+import json
+import threading
+
+bp = Blueprint('menu', __name__, url_prefix='/api/menu')
+
+class MenuSnapshot:
+    '''
+    预先序列化（及压缩）好的菜单，只在菜单版本号变化时重新生成
+    '''
+    def __init__(self, version: int, menu: dict, compress: bool):
+        self.version = version
+        self.body = json.dumps(
+            {
+                "type": "success",
+                "version": version,
+                "data": menu
+            },
+            ensure_ascii=False
+        ).encode(DEFAULT_ENCODING)
+
+        # 强ETag：版本号 + 内容摘要（数据库重建后版本号可能重复）
+        digest = hashlib.sha1(self.body).hexdigest()[:16]
+        self.etag = f"menu-{version}-{digest}"
+
+        self.gzip_body = gzip.compress(self.body) if compress else None
+        # 压缩后的内容不同，强ETag也必须不同
+        self.gzip_etag = f"{self.etag}-gz"
+
+# 每个数据库文件对应一个菜单快照
+_snapshots: dict[str, MenuSnapshot] = {}
+_snapshots_lock = threading.Lock()
+
+def get_snapshot() -> MenuSnapshot:
+    '''
+    获取当前菜单的快照，菜单版本号变化时重新生成。
+    Arguments:
+        None
+    Returns:
+        MenuSnapshot: 菜单快照
+    '''
+    db = get_dbconn()
+    version = db.dishes.get_menu_version()
+
+    snapshot = _snapshots.get(db.database_file)
+    if snapshot and snapshot.version == version:
+        return snapshot
+
+    snapshot = MenuSnapshot(
+        version,
+        db.dishes.get_menu_by_category(),
+        current_app.config.get("menu", {}).get("gzip", True)
+    )
+    with _snapshots_lock:
+        _snapshots[db.database_file] = snapshot
+    
+    return snapshot
+
+@bp.route('', methods=['GET'])
+def get_menu():
+    snapshot = get_snapshot()
+
+    use_gzip = bool(snapshot.gzip_body) and "gzip" in request.accept_encodings
+    etag = snapshot.gzip_etag if use_gzip else snapshot.etag
+
+    # 菜单未改变，返回304（客户端保存的可能是另一种编码的ETag，菜单内容相同）
+    if (request.if_none_match.contains(snapshot.etag) or request.if_none_match.contains(snapshot.gzip_etag)
+            or request.if_none_match.star_tag):
+        response = Response(status=304)
+    elif use_gzip:
+        response = Response(snapshot.gzip_body, mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(snapshot.body, mimetype="application/json")
+
+    response.set_etag(etag)
+    # 每次使用前都需要重新验证
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+
+    return response
+
+@bp.route('/search', methods=['GET'])
+def search_menu():
+    '''
+    搜索菜品，用于点餐页面的边输入边搜索。
+    参数：
+        q: 关键词，可以是汉字、拼音或拼音首字母
+        limit: 最多返回的数量，默认20
+    '''
+    keyword = request.args.get("q", "")
+    limit = request.args.get("limit", 20, type=int)
+
+    dishes = get_dbconn().dishes.search(keyword, limit)
+
+    return jsonify(
+        {
+            "type": "success",
+            "data": [
+                {
+                    'id': dish['id'],
+                    'name': dish['name'],
+                    'category': dish['category'],
+                    'price': dish['price'] / 100,  # 转成元
+                    'description': dish['description'],
+                    'image': dish['image_url'],
+                    'options': dish['options']
+                }
+                for dish in dishes
+            ]
+        }
+    )
@@ -0,0 +1,236 @@
+'''
+从CSV或JSON文件批量导入菜单（flask import-menu）。
+
+CSV和JSON Lines文件逐行读取、校验并分批写入，每行一个菜品：
+    CSV：第一行为表头，列名同下；options 列为JSON字符串。
+    JSON Lines（.jsonl）：每行一个JSON对象。
+    JSON（.json）：一个对象数组，需要整个读入内存；报错时的行号为数组中的序号（从1开始）。
+
+字段：
+    id: 可选，填写时修改该菜品（如调价，菜品必须存在），否则新建
+    name, category: 新建时必填
+    price: 价格（元），新建时必填，最多两位小数
+    description, image_url: 可选
+    is_available: 可选，1/0、true/false
+    options: 可选，可选配置
+'''
+import csv
+import json
+from decimal import Decimal, DecimalException, InvalidOperation
+from typing import Iterator
+from .const import *
+from .database import DatabaseConnection
+
+# 每批写入的菜品数
+BATCH_SIZE = 500
+
+# 价格上限（分），SQLite整数的最大值
+MAX_PRICE = 2 ** 63 - 1
+
+# 新建菜品时必填的字段
+REQUIRED_FIELDS = ["name", "category", "price"]
+
+
+class MenuRowError(ValueError):
+    '''
+    菜单文件中某一行的数据不正确
+    '''
+    pass
+
+
+def _read_rows(path: str) -> Iterator[tuple[int, dict]]:
+    '''
+    逐行读取菜单文件
+    Arguments:
+        path: 文件路径，按扩展名判断格式
+    Returns:
+        Iterator[tuple[int, dict]]: (行号, 原始数据)；无法解析的行数据为 {"__error__": 错误信息}
+    '''
+    if path.lower().endswith(".csv"):
+        with open(path, encoding=DEFAULT_ENCODING, newline="") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                # 空白单元格视为未填写
+                yield reader.line_num, {key: value for key, value in row.items() if key and value not in ("", None)}
+    elif path.lower().endswith(".jsonl"):
+        with open(path, encoding=DEFAULT_ENCODING) as f:
+            for line_num, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_num, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_num, {"__error__": f"invalid JSON: {e.msg}"}
+    else:
+        with open(path, encoding=DEFAULT_ENCODING) as f:
+            rows = json.load(f)
+        yield from enumerate(rows, 1)
+
+
+def _parse_bool(value) -> bool:
+    '''解析 1/0、true/false、yes/no'''
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("1", "true", "yes"):
+        return True
+    if text in ("0", "false", "no"):
+        return False
+    raise MenuRowError(f"is_available must be 1/0 or true/false, got {value!r}")
+
+
+def parse_row(row: dict) -> dict:
+    '''
+    校验并转换一行数据
+    可能抛出的异常：
+        MenuRowError: 数据不正确
+    Arguments:
+        row: 原始数据
+    Returns:
+        dict: 新建时为create的参数；修改时为update_batch的参数（包含id）
+    '''
+    if not isinstance(row, dict):
+        raise MenuRowError("row must be an object")
+    if "__error__" in row:
+        raise MenuRowError(row["__error__"])
+
+    dish = {}
+    if "id" in row:
+        try:
+            dish["id"] = int(row["id"])
+        except (TypeError, ValueError):
+            raise MenuRowError(f"invalid id: {row['id']!r}")
+    else:
+        missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+        if missing:
+            raise MenuRowError(f"missing {', '.join(missing)}")
+
+    for field in ["name", "category", "description", "image_url"]:
+        if field in row:
+            dish[field] = str(row[field]).strip()
+    if "name" in dish and not dish["name"]:
+        raise MenuRowError("name is empty")
+
+    if "price" in row:
+        try:
+            price = Decimal(str(row["price"]))
+        except InvalidOperation:
+            raise MenuRowError(f"invalid price: {row['price']!r}")
+        try:
+            # nan、inf 不是金额；与数字比较、指数过大时会抛出 InvalidOperation 或 Overflow
+            valid = (
+                price.is_finite() and 0 <= price * 100 <= MAX_PRICE
+                and price == price.quantize(Decimal("0.01"))
+            )
+        except DecimalException:
+            valid = False
+        if not valid:
+            raise MenuRowError(f"price must be a non-negative amount in yuan with at most 2 decimals, got {row['price']!r}")
+        dish["price"] = int(price * 100)
+
+    if "is_available" in row:
+        dish["is_available"] = _parse_bool(row["is_available"])
+
+    if "options" in row:
+        options = row["options"]
+        if isinstance(options, str):
+            try:
+                options = json.loads(options)
+            except json.JSONDecodeError as e:
+                raise MenuRowError(f"invalid options JSON: {e.msg}")
+        dish["options" if "id" in dish else "options_json"] = options
+
+    if "id" in dish and len(dish) == 1:
+        raise MenuRowError("nothing to update")
+
+    return dish
+
+
+def _check_ids(db: DatabaseConnection, updates: list[dict], update_lines: list[int]) -> list[tuple[int, str]]:
+    '''
+    检查要修改的菜品是否存在
+    Arguments:
+        db: 数据库连接
+        updates: 修改的菜品
+        update_lines: 对应的行号
+    Returns:
+        list: [(行号, 错误信息), ...]
+    '''
+    missing = db.dishes.get_missing_ids([dish["id"] for dish in updates]) # type: ignore
+    return [
+        (line_num, f"dish {dish['id']} does not exist")
+        for line_num, dish in zip(update_lines, updates) if dish["id"] in missing
+    ]
+
+
+class _Rollback(Exception):
+    '''导入中发现错误，回滚已写入的批次'''
+    pass
+
+
+def import_menu(db: DatabaseConnection, path: str, dry_run: bool = False) -> dict:
+    '''
+    导入菜单文件。CSV和JSON Lines逐行读取、校验，每满BATCH_SIZE行写入一批，内存占用与文件大小无关；
+    JSON数组文件需要整个读入内存，大文件请使用CSV或JSON Lines。
+    所有批次在同一个写事务中写入（导入期间持有写锁），出现错误后不再写入，继续校验剩余的行，最后回滚，不写入任何数据。
+    Arguments:
+        db: 数据库连接
+        path: 文件路径
+        dry_run: 只校验（包括要修改的菜品是否存在），不写入
+    Returns:
+        dict: {
+            'created': 新建的数量,
+            'updated': 修改的数量,
+            'errors': [(行号, 错误信息), ...]
+        }
+    '''
+    result = {"created": 0, "updated": 0, "errors": []}
+    errors: list[tuple[int, str]] = result["errors"]
+
+    # 当前批次
+    creates: list[dict] = []
+    updates: list[dict] = []
+    # 修改的行号，与updates一一对应
+    update_lines: list[int] = []
+
+    def flush():
+        # 在写事务中检查，检查之后菜品不会被其他连接删除
+        errors.extend(_check_ids(db, updates, update_lines))
+        if not errors and not dry_run:
+            if creates:
+                result["created"] += len(db.dishes.create_batch(creates)) # type: ignore
+            if updates:
+                result["updated"] += db.dishes.update_batch(updates) # type: ignore
+        creates.clear()
+        updates.clear()
+        update_lines.clear()
+
+    def run():
+        for line_num, row in _read_rows(path):
+            try:
+                dish = parse_row(row)
+            except MenuRowError as e:
+                errors.append((line_num, str(e)))
+                continue
+            if "id" in dish:
+                updates.append(dish)
+                update_lines.append(line_num)
+            else:
+                creates.append(dish)
+            if len(creates) + len(updates) >= BATCH_SIZE:
+                flush()
+        flush()
+
+    if dry_run:
+        run()
+        return result
+
+    try:
+        with db.transaction():
+            run()
+            if errors:
+                raise _Rollback()
+    except _Rollback:
+        result["created"] = result["updated"] = 0
+
+    return result
@@ -0,0 +1,298 @@
+'''
+进程内的性能指标：请求耗时、SQL耗时与返回行数、取连接耗时、JSON序列化耗时、模板渲染耗时、密码验证耗时。
+以直方图保存在内存中，管理员可通过 /api/admin/metrics 以 Prometheus 文本格式读取。
+连接池、菜单缓存、session缓存的统计在读取时采集，输出为计数器和仪表。
+prefork 模式下每个工作进程各自统计，读取到的是处理该请求的进程的数据。
+'''
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable
+from flask import Flask, g, request, template_rendered, before_render_template
+from flask.json.provider import DefaultJSONProvider
+from .cache import get_menu_cache
+
+# 默认的直方图分桶（秒）
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# 返回行数的分桶
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class Histogram:
+    '''
+    按标签分组的直方图，每组记录各分桶的次数、总和与次数
+    '''
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # 标签值 -> [各分桶次数..., 总和, 次数]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values):
+        '''
+        记录一次观测值
+        Arguments:
+            value: 观测值
+            label_values: 标签值，顺序与labels相同
+        Returns:
+            None
+        '''
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def reset(self):
+        '''清空所有数据'''
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> list[str]:
+        '''
+        生成 Prometheus 文本格式
+        Returns:
+            list[str]: 文本的各行
+        '''
+        with self._lock:
+            series = {key: list(value) for key, value in self._series.items()}
+
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, values in sorted(series.items()):
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values)]
+            cumulative = 0
+            for bucket, count in zip(self.buckets, values):
+                cumulative += count
+                le = ",".join(labels + [f'le="{bucket}"'])
+                lines.append(f"{self.name}_bucket{{{le}}} {cumulative}")
+            le = ",".join(labels + ['le="+Inf"'])
+            lines.append(f"{self.name}_bucket{{{le}}} {values[-1]}")
+
+            suffix = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {values[-2]}")
+            lines.append(f"{self.name}_count{suffix} {values[-1]}")
+        return lines
+
+
+def _escape(value) -> str:
+    '''转义标签值中的反斜杠、引号和换行'''
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# 规范化SQL：合并空白，IN (?, ?, ?) 合并为 IN (?)
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDERS = re.compile(r"\?(\s*,\s*\?)+")
+
+def normalize_sql(sql: str) -> str:
+    '''
+    规范化SQL文本，使同一条语句（只有参数个数不同）归为一组
+    Arguments:
+        sql: SQL语句
+    Returns:
+        str: 规范化后的SQL
+    '''
+    return _PLACEHOLDERS.sub("?", _WHITESPACE.sub(" ", sql).strip())
+
+
+class Metrics:
+    '''
+    应用的全部指标，保存在 app.extensions["metrics"]
+    '''
+    def __init__(self):
+        self.request_seconds = Histogram(
+            "homeflavor_request_seconds", "Request wall time by blueprint and endpoint.",
+            ("blueprint", "endpoint", "method")
+        )
+        self.sql_seconds = Histogram(
+            "homeflavor_sql_seconds", "SQL statement execution time.", ("statement",)
+        )
+        self.sql_rows = Histogram(
+            "homeflavor_sql_rows", "Rows returned by fetch_one/fetch_all.", ("statement",), ROW_BUCKETS
+        )
+        self.checkout_seconds = Histogram(
+            "homeflavor_db_checkout_seconds", "Time to check out a database connection."
+        )
+        self.json_seconds = Histogram(
+            "homeflavor_json_encode_seconds", "JSON encode time of responses."
+        )
+        self.template_seconds = Histogram(
+            "homeflavor_template_render_seconds", "Template render time.", ("template",)
+        )
+        self.password_seconds = Histogram(
+            "homeflavor_password_verify_seconds", "Password verification time on login."
+        )
+        self._statements: dict[str, str] = {}
+        # 读取时采集的计数器和仪表，每个函数返回 [(名称, 类型, 说明, 值), ...]
+        self._collectors: list[Callable[[], list[tuple]]] = []
+
+    def add_collector(self, collect: Callable[[], list[tuple]]):
+        '''
+        注册读取指标时调用的采集函数（用于连接池、缓存等自己维护统计的组件）
+        Arguments:
+            collect: 无参数函数，返回 [(名称, 'counter'或'gauge', 说明, 值), ...]
+        Returns:
+            None
+        '''
+        self._collectors.append(collect)
+
+    def histograms(self) -> list[Histogram]:
+        return [
+            self.request_seconds,
+            self.sql_seconds,
+            self.sql_rows,
+            self.checkout_seconds,
+            self.json_seconds,
+            self.template_seconds,
+            self.password_seconds,
+        ]
+
+    def statement(self, sql: str) -> str:
+        '''
+        获取SQL语句的标签值（规范化后的SQL），结果按原始文本缓存
+        Arguments:
+            sql: SQL语句
+        Returns:
+            str: 标签值
+        '''
+        label = self._statements.get(sql)
+        if label is None:
+            label = normalize_sql(sql)
+            # 动态拼接的SQL可能很多，缓存数量有限
+            if len(self._statements) < 10000:
+                self._statements[sql] = label
+        return label
+
+    def observe_sql(self, sql: str, seconds: float):
+        '''记录一条SQL的执行耗时'''
+        self.sql_seconds.observe(seconds, self.statement(sql))
+
+    def observe_rows(self, sql: str, rows: int):
+        '''记录一条SQL返回的行数'''
+        self.sql_rows.observe(rows, self.statement(sql))
+
+    def reset(self):
+        '''清空所有直方图（采集的计数器由各组件维护，不清空）'''
+        for histogram in self.histograms():
+            histogram.reset()
+
+    def render(self) -> str:
+        '''
+        生成 Prometheus 文本格式
+        Returns:
+            str: 所有指标的文本
+        '''
+        lines = []
+        for histogram in self.histograms():
+            lines.extend(histogram.render())
+        for collect in self._collectors:
+            for name, metric_type, help, value in collect():
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {metric_type}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    '''记录 jsonify 等序列化耗时的JSON提供者'''
+    def dumps(self, obj, **kwargs) -> str:
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            metrics = self._app.extensions.get("metrics")
+            if metrics:
+                metrics.json_seconds.observe(time.perf_counter() - start)
+
+
+def _collect_components(app: Flask) -> list[tuple]:
+    '''
+    采集连接池、菜单缓存和session缓存的统计（计数器为进程启动以来的累计值）
+    Arguments:
+        app: Flask应用
+    Returns:
+        list: [(名称, 类型, 说明, 值), ...]
+    '''
+    samples = []
+
+    pool = app.extensions.get("db_pool")
+    if pool:
+        stats = pool.stats()
+        samples += [
+            ("homeflavor_db_pool_size", "gauge", "Maximum connections in the pool.", stats["size"]),
+            ("homeflavor_db_pool_connections", "gauge", "Connections currently open (idle or checked out).", stats["created"]),
+            ("homeflavor_db_pool_idle", "gauge", "Idle connections in the pool.", stats["idle"]),
+            ("homeflavor_db_pool_hits_total", "counter", "Checkouts that reused an idle connection.", stats["hits"]),
+            ("homeflavor_db_pool_misses_total", "counter", "Checkouts that opened a new connection.", stats["misses"]),
+            ("homeflavor_db_pool_waits_total", "counter", "Checkouts that waited because the pool was full.", stats["waits"]),
+        ]
+
+    caches = [("homeflavor_menu_cache", "Menu cache", get_menu_cache(app.config["database"]["file"]))]
+    # 未启用服务端session时没有缓存
+    session_cache = getattr(app.session_interface, "cache", None)
+    if session_cache is not None:
+        caches.append(("homeflavor_session_cache", "Session cache", session_cache))
+
+    for prefix, label, cache in caches:
+        stats = cache.stats()
+        lookups = stats["hits"] + stats["misses"]
+        samples += [
+            (f"{prefix}_hits_total", "counter", f"{label} lookups served from memory.", stats["hits"]),
+            (f"{prefix}_misses_total", "counter", f"{label} lookups that went to the database.", stats["misses"]),
+            (f"{prefix}_hit_ratio", "gauge", f"{label} hits / lookups since process start.", round(stats["hits"] / lookups, 4) if lookups else 0),
+        ]
+
+    return samples
+
+def init_metrics(app: Flask) -> Metrics | None:
+    '''
+    根据配置 metrics.enabled 启用指标收集，注册请求计时和模板渲染计时。
+    应在注册其他 before_request 之前调用，使请求耗时包含权限检查等。
+    Arguments:
+        app: Flask应用
+    Returns:
+        Metrics | None: 未启用时返回None
+    '''
+    if not app.config.get("metrics", {}).get("enabled", True):
+        return None
+
+    metrics = Metrics()
+    app.extensions["metrics"] = metrics
+    app.json = TimedJSONProvider(app)
+    # 连接池和session在之后初始化，读取时才获取
+    metrics.add_collector(lambda: _collect_components(app))
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.teardown_request
+    def stop_timer(e=None):
+        start = g.pop("request_start", None)
+        if start is None:
+            return
+        # 未匹配到路由（404等）的请求归为同一组
+        endpoint = request.endpoint or "<unmatched>"
+        metrics.request_seconds.observe(
+            time.perf_counter() - start, request.blueprint or "", endpoint, request.method
+        )
+
+    def start_render(sender, template, context, **extra):
+        g.render_start = time.perf_counter()
+
+    def stop_render(sender, template, context, **extra):
+        start = g.pop("render_start", None)
+        if start is not None:
+            metrics.template_seconds.observe(time.perf_counter() - start, template.name or "")
+
+    # 接收函数是局部函数，需保持强引用
+    before_render_template.connect(start_render, app, weak=False)
+    template_rendered.connect(stop_render, app, weak=False)
+
+    return metrics
@@ -0,0 +1,197 @@
+'''
+数据库结构的版本化迁移。
+
+迁移文件保存在 app/migrations 中，文件名为 "编号_说明.sql"（如 0001_initial.sql），按编号依次执行。
+已执行到的编号保存在 schema_version 表中（只有一行）。
+启动时只需查询版本号（以及是否有未完成的旧版订单转换），没有待执行的迁移时不做任何结构上的操作。
+'''
+import os
+import re
+import sqlite3
+from dataclasses import dataclass
+from .const import *
+from .database import migrate_order_items, rebuild_stats_tables
+
+# 迁移文件目录
+MIGRATIONS_PATH = os.path.join(os.path.dirname(__file__), "migrations")
+
+# 迁移文件名：编号_说明.sql
+MIGRATION_PATTERN = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+@dataclass
+class Migration:
+    '''一个迁移文件'''
+    version: int
+    name: str
+    path: str
+
+    def read(self) -> str:
+        '''读取SQL脚本'''
+        with open(self.path, encoding=DEFAULT_ENCODING) as f:
+            return f.read()
+
+
+def list_migrations(path: str = MIGRATIONS_PATH) -> list[Migration]:
+    '''
+    获取所有迁移文件
+    可能抛出的异常：
+        ValueError: 有重复的编号
+    Arguments:
+        path: 迁移文件目录
+    Returns:
+        list[Migration]: 按编号排序
+    '''
+    migrations = {}
+    for filename in os.listdir(path):
+        match = MIGRATION_PATTERN.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version}: {filename}")
+        migrations[version] = Migration(version, match.group(2), os.path.join(path, filename))
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def get_schema_version(connection: sqlite3.Connection) -> int:
+    '''
+    获取数据库当前的结构版本
+    Arguments:
+        connection: 数据库连接
+    Returns:
+        int: 版本号，未执行过任何迁移时为0
+    '''
+    try:
+        row = connection.execute("SELECT version FROM schema_version WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        # schema_version 表不存在
+        return 0
+    return row[0] if row else 0
+
+
+def has_legacy_orders(connection: sqlite3.Connection) -> bool:
+    '''
+    是否有未完成的旧版订单转换（orders_legacy表存在）
+    Arguments:
+        connection: 数据库连接
+    Returns:
+        bool
+    '''
+    row = connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'orders_legacy'"
+    ).fetchone()
+    return row is not None
+
+
+def split_statements(script: str) -> list[str]:
+    '''
+    将SQL脚本拆分为单条语句（触发器中的分号不会被拆开）。
+    executescript 会先提交当前事务，无法在同一个事务中执行多个脚本，因此逐条执行。
+    Arguments:
+        script: SQL脚本
+    Returns:
+        list[str]: SQL语句
+    '''
+    statements = []
+    buffer = ""
+    for line in script.splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            if buffer.strip():
+                statements.append(buffer.strip())
+            buffer = ""
+    # 剩余的内容只能是注释
+    if any(line.strip() and not line.strip().startswith("--") for line in buffer.splitlines()):
+        raise ValueError(f"Incomplete SQL statement: {buffer.strip()[:80]}")
+    return statements
+
+
+def migrate(connection: sqlite3.Connection, migrations: list[Migration] = None, logger=None) -> list[Migration]: # type: ignore
+    '''
+    执行待执行的迁移。旧版订单表的转换、转换后的营业统计重建和所有待执行的迁移在同一个写事务（BEGIN IMMEDIATE）中完成，失败时全部回滚。
+    多个进程同时启动时，只有先取得写锁的进程执行迁移，其他进程取得写锁后发现版本已是最新，直接返回。
+    Arguments:
+        connection: 数据库连接
+        migrations: 迁移列表，默认为 app/migrations 中的全部
+        logger: 日志记录器，可选
+    Returns:
+        list[Migration]: 本次执行的迁移
+    '''
+    if migrations is None:
+        migrations = list_migrations()
+    if not migrations:
+        return []
+
+    # 热启动：版本已是最新且没有未完成的旧版订单转换时直接返回
+    version = get_schema_version(connection)
+    if version >= migrations[-1].version and not has_legacy_orders(connection):
+        return []
+
+    if connection.in_transaction:
+        connection.commit()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        # 取得写锁后重新读取版本号，其他进程可能已经执行了迁移
+        version = get_schema_version(connection)
+        pending = [migration for migration in migrations if migration.version > version]
+
+        # 旧版订单表（items_json）在初始结构之前转换，与迁移在同一个事务中
+        converted = None
+        if migrations[0].version == 1 and (version == 0 or has_legacy_orders(connection)):
+            converted = migrate_order_items(connection, split_statements(migrations[0].read()))
+            if converted and logger:
+                logger.info(f"Migrated {converted['orders']} orders from orders.items_json to order_items.")
+                for order_id, reason in converted["rejected"]:
+                    logger.warning(f"Legacy order {order_id} moved to orders_legacy_rejected: {reason}")
+
+        for migration in pending:
+            for statement in split_statements(migration.read()):
+                connection.execute(statement)
+            if logger:
+                logger.info(f"Applied migration {migration.version:04d}_{migration.name}.")
+
+        # 转换的订单没有营业统计，在所有迁移完成后（统计表为最新结构）重新计算
+        if converted:
+            days = rebuild_stats_tables(connection)
+            if logger:
+                logger.info(f"Rebuilt statistics for {days} days from the migrated orders.")
+
+        if pending:
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    version INTEGER NOT NULL
+                )
+            ''')
+            connection.execute(
+                "INSERT OR REPLACE INTO schema_version (id, version) VALUES (1, ?)",
+                (pending[-1].version,)
+            )
+    except Exception:
+        connection.rollback()
+        raise
+    else:
+        connection.commit()
+
+    return pending
+
+
+def get_status(connection: sqlite3.Connection, migrations: list[Migration] = None) -> dict: # type: ignore
+    '''
+    获取迁移状态
+    Arguments:
+        connection: 数据库连接
+        migrations: 迁移列表，默认为 app/migrations 中的全部
+    Returns:
+        dict: {'version': 当前版本, 'latest': 最新版本, 'applied': [已执行的迁移], 'pending': [待执行的迁移]}
+    '''
+    if migrations is None:
+        migrations = list_migrations()
+    version = get_schema_version(connection)
+    return {
+        "version": version,
+        "latest": migrations[-1].version if migrations else 0,
+        "applied": [migration for migration in migrations if migration.version <= version],
+        "pending": [migration for migration in migrations if migration.version > version],
+    }
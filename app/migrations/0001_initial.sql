@@ -0,0 +1,175 @@
+-- 初始结构：创建所有需要的表
+
+-- 用户表
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    is_admin INTEGER DEFAULT 0,
+    enabled INTEGER DEFAULT 1
+);
+
+-- 订单表
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_num INTEGER NOT NULL, -- 每日订单号，每天从1开始
+    order_date TEXT NOT NULL DEFAULT (date('now', 'localtime')), -- 营业日，格式：YYYY-MM-DD
+    time TEXT NOT NULL DEFAULT (datetime('now', 'localtime')), -- 下单时间
+    table_num INTEGER NOT NULL,
+    guests INTEGER NOT NULL DEFAULT 0, -- 就餐人数
+    created_by INTEGER, -- 下单的店员ID
+    status TEXT DEFAULT 'pending' CHECK(status IN (
+        'pending', -- 待处理（下单后的状态）
+        'cooking', -- 制作中
+        'done',    -- 已完成（全部的菜出完）
+        'canceled',-- 已取消（用户或管理员取消订单）
+        'paid'     -- 已结账（用户已支付）
+    )),
+    total_price INTEGER NOT NULL, -- 订单总金额，单位：分
+    UNIQUE (order_date, order_num)
+);
+
+CREATE INDEX IF NOT EXISTS idx_orders_time ON orders(time);
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
+
+-- 订单明细表，每行对应订单中的一个菜品
+CREATE TABLE IF NOT EXISTS order_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INTEGER NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+    dish_id INTEGER NOT NULL, -- 菜品ID
+    name TEXT NOT NULL, -- 下单时的菜品名称
+    quantity INTEGER NOT NULL DEFAULT 1, -- 数量
+    unit_price INTEGER NOT NULL, -- 下单时的单价，单位：分
+    options_json TEXT, -- 选择的配置，JSON格式存储
+    added_time TEXT, -- 加菜时间，非后加的菜为NULL
+    added_by INTEGER, -- 加菜的店员ID
+    is_completed INTEGER DEFAULT 0 -- 是否已出菜
+);
+
+CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id);
+CREATE INDEX IF NOT EXISTS idx_order_items_dish_id ON order_items(dish_id);
+CREATE INDEX IF NOT EXISTS idx_order_items_is_completed ON order_items(is_completed);
+
+-- 订单修改记录，用于增量同步。seq即修改序号，按主键范围查询
+CREATE TABLE IF NOT EXISTS order_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    change_type TEXT NOT NULL, -- order_created, total_changed, status_changed, item_added, item_completed
+    order_id INTEGER NOT NULL, -- 订单ID
+    item_id INTEGER -- 明细ID，订单本身的修改为NULL
+);
+
+-- 每日订单号计数表
+CREATE TABLE IF NOT EXISTS order_counters (
+    order_date TEXT PRIMARY KEY, -- 营业日，格式：YYYY-MM-DD
+    last_num INTEGER NOT NULL -- 当日最后分配的订单号
+);
+
+-- 每日营业统计，下单、加菜、结账、取消时在同一个事务中更新
+CREATE TABLE IF NOT EXISTS daily_stats (
+    order_date TEXT PRIMARY KEY, -- 营业日，格式：YYYY-MM-DD
+    order_count INTEGER NOT NULL DEFAULT 0, -- 订单数（不含已取消）
+    total_sales INTEGER NOT NULL DEFAULT 0, -- 下单金额（不含已取消），单位：分
+    covers INTEGER NOT NULL DEFAULT 0, -- 就餐人数（不含已取消）
+    paid_count INTEGER NOT NULL DEFAULT 0, -- 已结账订单数
+    revenue INTEGER NOT NULL DEFAULT 0 -- 已结账金额，单位：分
+);
+
+-- 每小时营业统计，用于报表
+CREATE TABLE IF NOT EXISTS hourly_stats (
+    order_date TEXT NOT NULL, -- 营业日
+    hour INTEGER NOT NULL, -- 下单时间的小时，0-23
+    order_count INTEGER NOT NULL DEFAULT 0,
+    total_sales INTEGER NOT NULL DEFAULT 0,
+    covers INTEGER NOT NULL DEFAULT 0,
+    paid_count INTEGER NOT NULL DEFAULT 0,
+    revenue INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (order_date, hour)
+) WITHOUT ROWID;
+
+-- 每日按桌号的营业统计，用于报表
+CREATE TABLE IF NOT EXISTS daily_table_stats (
+    order_date TEXT NOT NULL,
+    table_num INTEGER NOT NULL,
+    order_count INTEGER NOT NULL DEFAULT 0,
+    total_sales INTEGER NOT NULL DEFAULT 0,
+    covers INTEGER NOT NULL DEFAULT 0,
+    paid_count INTEGER NOT NULL DEFAULT 0,
+    revenue INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (order_date, table_num)
+) WITHOUT ROWID;
+
+-- 每日按店员的营业统计，用于报表
+CREATE TABLE IF NOT EXISTS daily_waiter_stats (
+    order_date TEXT NOT NULL,
+    user_id INTEGER NOT NULL, -- 下单的店员ID，没有时为0
+    order_count INTEGER NOT NULL DEFAULT 0,
+    total_sales INTEGER NOT NULL DEFAULT 0,
+    covers INTEGER NOT NULL DEFAULT 0,
+    paid_count INTEGER NOT NULL DEFAULT 0,
+    revenue INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (order_date, user_id)
+) WITHOUT ROWID;
+
+-- 每日菜品销量
+CREATE TABLE IF NOT EXISTS daily_dish_stats (
+    order_date TEXT NOT NULL,
+    dish_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    sales INTEGER NOT NULL DEFAULT 0, -- 单位：分
+    PRIMARY KEY (order_date, dish_id)
+) WITHOUT ROWID;
+
+-- 每日分类销量
+CREATE TABLE IF NOT EXISTS daily_category_stats (
+    order_date TEXT NOT NULL,
+    category TEXT NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    sales INTEGER NOT NULL DEFAULT 0, -- 单位：分
+    PRIMARY KEY (order_date, category)
+) WITHOUT ROWID;
+
+-- 菜单表
+CREATE TABLE IF NOT EXISTS menu (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL, -- 菜品名称
+    price INTEGER NOT NULL, -- 菜品单价，单位：分
+    category TEXT NOT NULL, -- 菜品分类
+    description TEXT, -- 菜品描述
+    image_url TEXT, -- 菜品图片URL
+    is_available INTEGER DEFAULT 1, -- 是否可用，默认值为1（可用）
+    options_json TEXT -- 菜品可选配置，JSON格式存储
+);
+
+-- 服务端session，cookie中只保存签名后的session ID
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY, -- session ID
+    data TEXT NOT NULL, -- session数据，JSON格式存储
+    expires REAL NOT NULL -- 过期时间（Unix时间戳），每次访问时顺延
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires);
+
+-- 菜单版本号，menu表每次修改都会加1，用于判断菜单缓存是否过期
+CREATE TABLE IF NOT EXISTS menu_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO menu_version (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS menu_version_insert AFTER INSERT ON menu
+BEGIN
+    UPDATE menu_version SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS menu_version_update AFTER UPDATE ON menu
+BEGIN
+    UPDATE menu_version SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS menu_version_delete AFTER DELETE ON menu
+BEGIN
+    UPDATE menu_version SET version = version + 1 WHERE id = 1;
+END;
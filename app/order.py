@@ -0,0 +1,33 @@
+from flask import Blueprint, request, jsonify
+from .database import get_dbconn
+
+bp = Blueprint('order', __name__, url_prefix='/api/orders')
+
+@bp.route('/changes')
+def get_changes():
+    '''
+    增量同步订单：返回修改序号since之后修改过的订单和明细。
+    参数：
+        since: 上次返回的seq，首次同步传0
+        limit: 每次最多读取的修改记录数，默认500，最大5000
+    '''
+    since = request.args.get('since', 0, type=int)
+    limit = request.args.get('limit', 500, type=int)
+
+    if since < 0 or limit <= 0:
+        return jsonify(
+            {
+                "type": "value_error",
+                "message": "since must be >= 0 and limit must be > 0"
+            }
+        )
+    
+    db = get_dbconn()
+    changes = db.orders.get_changes(since, min(limit, 5000))
+
+    return jsonify(
+        {
+            "type": "success",
+            **changes
+        }
+    )
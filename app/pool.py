@@ -0,0 +1,193 @@
+import os
+import queue
+import threading
+from flask import Flask
+from .database import DatabaseConnection
+
+
+class PoolTimeoutError(RuntimeError):
+    '''
+    在等待可用连接超时时抛出
+    '''
+    pass
+
+
+class ConnectionPool:
+    '''
+    进程内的数据库连接池。
+    连接在 create_app 中创建一次，请求通过 get_dbconn 取出，请求结束后自动归还。
+    SQLite连接不能跨fork使用，在子进程中第一次取连接时会丢弃从父进程继承的连接，重新建立。
+    '''
+    def __init__(self, database_file: str, size: int = 8, timeout: float = 5.0):
+        '''
+        初始化连接池
+        Arguments:
+            database_file: 数据库文件路径
+            size: 连接池最大连接数
+            timeout: 取连接的最长等待时间（秒）
+        Returns:
+            None
+        '''
+        self.database_file = database_file
+        self.size = size
+        self.timeout = timeout
+
+        # 空闲连接（后进先出，优先复用最近使用过的连接）
+        self._idle: queue.LifoQueue[DatabaseConnection] = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._pid = os.getpid()
+        # 从父进程继承的连接，不能在子进程中使用或关闭（关闭可能删除父进程仍在使用的WAL文件）
+        self._inherited: list[DatabaseConnection] = []
+
+        # 统计信息
+        self.hits = 0   # 直接复用空闲连接
+        self.misses = 0 # 新建连接
+        self.waits = 0  # 连接池已满，需要等待
+
+    def _check_fork(self):
+        '''若当前进程是fork出的子进程，丢弃继承的连接，重新初始化连接池'''
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            while True:
+                try:
+                    self._inherited.append(self._idle.get_nowait())
+                except queue.Empty:
+                    break
+            self._created = 0
+            self.hits = self.misses = self.waits = 0
+            self._pid = os.getpid()
+
+    def _new_connection(self) -> DatabaseConnection:
+        '''新建一个连接'''
+        conn = DatabaseConnection(self.database_file)
+        conn.connect()
+        return conn
+
+    def acquire(self) -> DatabaseConnection:
+        '''
+        从连接池取出一个连接
+        可能抛出的异常：
+            PoolTimeoutError: 超过timeout仍没有可用连接
+        Arguments:
+            None
+        Returns:
+            DatabaseConnection: 数据库连接
+        '''
+        self._check_fork()
+
+        # 优先复用空闲连接
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self.hits += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        # 未达到上限，则新建连接
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                self.misses += 1
+                create = True
+            else:
+                self.waits += 1
+                create = False
+
+        if create:
+            try:
+                return self._new_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        # 连接池已满，等待其他请求归还连接
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeoutError(f"No database connection available after {self.timeout}s.")
+
+    def release(self, conn: DatabaseConnection):
+        '''
+        归还连接，并重置连接状态
+        Arguments:
+            conn: 数据库连接
+        Returns:
+            None
+        '''
+        # 连接已被关闭，则直接丢弃
+        if not conn.connection:
+            with self._lock:
+                self._created -= 1
+            return
+
+        try:
+            conn.reset()
+        except Exception:
+            # 重置失败的连接不再复用
+            conn.close()
+            with self._lock:
+                self._created -= 1
+            return
+
+        self._idle.put(conn)
+
+    def close_all(self):
+        '''
+        关闭所有空闲连接
+        Arguments:
+            None
+        Returns:
+            None
+        '''
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self) -> dict:
+        '''
+        获取连接池统计信息
+        Returns:
+            dict: {'size', 'created', 'idle', 'hits', 'misses', 'waits'}
+        '''
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "idle": self._idle.qsize(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "waits": self.waits,
+            }
+
+
+def init_pool(app: Flask) -> ConnectionPool:
+    '''
+    根据配置创建连接池，并保存到 app.extensions["db_pool"]。
+    Arguments:
+        app: Flask 当前的Flask应用实例。
+    Returns:
+        ConnectionPool: 连接池
+    '''
+    database_config = app.config["database"]
+    pool_config = database_config.get("pool", {})
+
+    pool = ConnectionPool(
+        database_config["file"],
+        size=pool_config.get("size", 8),
+        timeout=pool_config.get("timeout", 5.0),
+    )
+    app.extensions["db_pool"] = pool
+
+    return pool
@@ -0,0 +1,59 @@
+from flask import Blueprint, request, jsonify
+from .database import get_dbconn
+from .auth import admin_only
+from datetime import datetime
+
+bp = Blueprint('report', __name__, url_prefix="/api/report")
+
+@bp.route("/sales")
+@admin_only
+def get_sales_report():
+    '''
+    营业报表（仅管理员）。
+    参数：
+        start: 开始日期，格式为YYYY-MM-DD，默认为今天
+        end: 结束日期（含），格式为YYYY-MM-DD，默认为今天
+        bucket: 时间粒度，hour, day, week, month，默认为day
+        split: 拆分维度，table, waiter, category，默认不拆分
+    '''
+    today = datetime.now().strftime('%Y-%m-%d')
+    start = request.args.get("start", today)
+    end = request.args.get("end", today)
+    bucket = request.args.get("bucket", "day")
+    split = request.args.get("split") or None
+
+    # 检查日期格式
+    try:
+        datetime.strptime(start, '%Y-%m-%d')
+        datetime.strptime(end, '%Y-%m-%d')
+    except ValueError:
+        return jsonify(
+            {
+                "type": "value_error",
+                "message": "start and end must be YYYY-MM-DD"
+            }
+        )
+    
+    db = get_dbconn()
+    try:
+        rows = db.stats.report(start, end, bucket, split)
+    except ValueError as e:
+        return jsonify(
+            {
+                "type": "value_error",
+                "message": str(e)
+            }
+        )
+    
+    # 按店员拆分时，补充用户名
+    if split == "waiter":
+        usernames = {user["id"]: user["username"] for user in db.users.get_all()}
+        for row in rows:
+            row["username"] = usernames.get(row["user_id"], "")
+
+    return jsonify(
+        {
+            "type": "success",
+            "data": rows
+        }
+    )
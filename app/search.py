@@ -0,0 +1,170 @@
+'''
+菜品搜索索引（内存），随菜单缓存一起按菜单版本号重建，不需要单独同步。
+
+每个菜品的可搜索文本：名称、拼音（gongbaojiding）、拼音首字母（gbjd）、分类、描述。
+以字符为键建立倒排表，搜索时先取关键词各字符的倒排表交集，只对候选菜品计算排名。
+
+索引在第一次搜索时才建立；pypinyin 导入较慢（约数百毫秒），也在第一次需要时才导入，不影响启动时间。
+
+拼音需要 pypinyin（已包含在 requirements.txt 中）；未安装时只能按汉字搜索，建立索引时记录一次警告。
+'''
+import re
+import threading
+from flask import current_app, has_app_context
+
+# pypinyin.lazy_pinyin，第一次使用时导入；None为尚未导入，False为未安装
+_lazy_pinyin = None
+
+# 搜索时忽略的空白
+_WHITESPACE = re.compile(r"\s+")
+
+# 匹配位置的排名，越小越靠前
+RANK_NAME_EXACT = 0       # 名称完全相同
+RANK_NAME_PREFIX = 1      # 名称开头
+RANK_PINYIN_PREFIX = 2    # 拼音或首字母开头
+RANK_NAME = 3             # 名称包含
+RANK_PINYIN = 4           # 拼音或首字母包含
+RANK_CATEGORY = 5         # 分类包含
+RANK_DESCRIPTION = 6      # 描述包含
+
+
+def normalize(text: str) -> str:
+    '''去掉空白并转为小写'''
+    return _WHITESPACE.sub("", text or "").lower()
+
+
+def _get_lazy_pinyin():
+    '''导入pypinyin，未安装时返回False'''
+    global _lazy_pinyin
+    if _lazy_pinyin is None:
+        try:
+            from pypinyin import lazy_pinyin
+            _lazy_pinyin = lazy_pinyin
+        except ImportError: # 未安装时不支持拼音搜索
+            _lazy_pinyin = False
+            # 每个进程只导入一次，只记录一次
+            if has_app_context():
+                current_app.logger.warning("pypinyin is not installed, dish search only matches Chinese characters. Run: pip install pypinyin")
+    return _lazy_pinyin
+
+
+def to_pinyin(text: str) -> tuple[str, str]:
+    '''
+    获取文本的拼音和拼音首字母
+    Arguments:
+        text: 文本
+    Returns:
+        tuple[str, str]: (拼音, 首字母)，如 ('gongbaojiding', 'gbjd')；未安装pypinyin时为空字符串
+    '''
+    lazy_pinyin = _get_lazy_pinyin()
+    if not lazy_pinyin or not text:
+        return "", ""
+    syllables = [normalize(syllable) for syllable in lazy_pinyin(text)]
+    syllables = [syllable for syllable in syllables if syllable]
+    return "".join(syllables), "".join(syllable[0] for syllable in syllables)
+
+
+class DishSearchIndex:
+    '''
+    菜品搜索索引，第一次搜索时建立，之后只读，可在多个线程中同时使用
+    '''
+    def __init__(self, dishes: list[dict]):
+        '''
+        初始化索引（不立即建立）
+        Arguments:
+            dishes: 菜品列表（按顺序作为同一排名时的次序）
+        Returns:
+            None
+        '''
+        self.dishes = dishes
+        # 每个菜品的 (名称, 拼音, 首字母, 分类, 描述)
+        self.keys: list[tuple[str, str, str, str, str]] = []
+        # 字符 -> 包含该字符的菜品下标
+        self.postings: dict[str, set[int]] = {}
+        self._built = False
+        self._lock = threading.Lock()
+
+    def _build(self):
+        '''建立索引'''
+        with self._lock:
+            if self._built:
+                return
+            self._index()
+            self._built = True
+
+    def _index(self):
+        '''计算每个菜品的可搜索文本和倒排表'''
+        for index, dish in enumerate(self.dishes):
+            name = normalize(dish["name"])
+            pinyin, initials = to_pinyin(dish["name"])
+            keys = (name, pinyin, initials, normalize(dish.get("category")), normalize(dish.get("description")))
+            self.keys.append(keys)
+
+            for char in set("".join(keys)):
+                self.postings.setdefault(char, set()).add(index)
+
+    def _rank(self, keys: tuple, keyword: str) -> tuple[int, int] | None:
+        '''
+        计算一个菜品的排名
+        Returns:
+            tuple[int, int] | None: (匹配位置的排名, 匹配在文本中的下标)，不匹配时为None
+        '''
+        name, pinyin, initials, category, description = keys
+        if name == keyword:
+            return RANK_NAME_EXACT, 0
+        if name.startswith(keyword):
+            return RANK_NAME_PREFIX, 0
+        if initials.startswith(keyword) or pinyin.startswith(keyword):
+            return RANK_PINYIN_PREFIX, 0
+
+        position = name.find(keyword)
+        if position >= 0:
+            return RANK_NAME, position
+
+        positions = [p for p in (initials.find(keyword), pinyin.find(keyword)) if p >= 0]
+        if positions:
+            return RANK_PINYIN, min(positions)
+
+        position = category.find(keyword)
+        if position >= 0:
+            return RANK_CATEGORY, position
+
+        position = description.find(keyword)
+        if position >= 0:
+            return RANK_DESCRIPTION, position
+
+        return None
+
+    def search(self, keyword: str, limit: int = None) -> list[dict]: # type: ignore
+        '''
+        搜索菜品
+        Arguments:
+            keyword: 关键词，可以是汉字、拼音或拼音首字母，不区分大小写，忽略空白
+            limit: 最多返回的数量，None为不限制
+        Returns:
+            list[dict]: 按排名排序的菜品（索引中的原始对象，调用者不应修改）
+        '''
+        keyword = normalize(keyword)
+        if not keyword:
+            return []
+        if not self._built:
+            self._build()
+
+        # 取各字符倒排表的交集，先从最短的开始
+        postings = sorted((self.postings.get(char, set()) for char in set(keyword)), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return []
+
+        ranked = []
+        for index in candidates:
+            rank = self._rank(self.keys[index], keyword)
+            if rank is not None:
+                ranked.append((rank, index))
+        ranked.sort()
+
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [self.dishes[index] for _, index in ranked]
@@ -0,0 +1,249 @@
+'''
+登录相关的安全措施：可配置的密码哈希参数、登录尝试限流、登录耗时统计。
+'''
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from flask import Flask, current_app
+from werkzeug.security import generate_password_hash
+
+# 默认的密码哈希参数，与werkzeug的默认值相同（scrypt:32768:8:1）
+DEFAULT_PASSWORD_HASH = "scrypt"
+
+# pbkdf2摘要算法的强度顺序
+PBKDF2_DIGESTS = ["sha1", "sha224", "sha256", "sha384", "sha512"]
+
+@lru_cache(maxsize=8)
+def _normalize_method(method: str) -> str:
+    '''
+    获取哈希参数的完整写法（如 pbkdf2 -> pbkdf2:sha256:1000000），用于和已保存的哈希比较
+    Arguments:
+        method: 配置中的哈希参数
+    Returns:
+        str: 完整的哈希参数
+    '''
+    return generate_password_hash("", method).split("$", 1)[0]
+
+def get_password_method() -> str:
+    '''
+    获取配置中的密码哈希参数
+    Returns:
+        str: 完整的哈希参数，如 scrypt:32768:8:1
+    '''
+    method = current_app.config.get("auth", {}).get("password_hash", DEFAULT_PASSWORD_HASH)
+    return _normalize_method(method)
+
+def hash_password(password: str) -> str:
+    '''
+    按配置的参数生成密码哈希
+    Arguments:
+        password: 密码（未加密）
+    Returns:
+        str: 密码哈希
+    '''
+    return generate_password_hash(password, get_password_method())
+
+def _parse_cost(method: str) -> tuple[str, tuple] | None:
+    '''
+    解析哈希参数中的计算成本
+    Arguments:
+        method: 完整的哈希参数，如 scrypt:32768:8:1、pbkdf2:sha256:1000000
+    Returns:
+        tuple: (算法, 各项成本)，各项越大越强
+        None: 无法识别的格式
+    '''
+    parts = method.split(":")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 4:
+            return "scrypt", (int(parts[1]), int(parts[2]), int(parts[3]))
+        if parts[0] == "pbkdf2" and len(parts) == 3 and parts[1] in PBKDF2_DIGESTS:
+            return "pbkdf2", (PBKDF2_DIGESTS.index(parts[1]), int(parts[2]))
+    except ValueError:
+        pass
+    return None
+
+def needs_rehash(password_hash: str) -> bool:
+    '''
+    判断已保存的密码哈希是否比配置的参数弱。
+    只升级不降级：同一算法时，配置的各项成本都不低于已保存的且至少一项更高才重新生成；
+    pbkdf2升级为scrypt；其他情况（更强的哈希、无法比较的参数）保持不变
+    Arguments:
+        password_hash: 已保存的密码哈希
+    Returns:
+        bool: 是否需要重新生成哈希
+    '''
+    stored = _parse_cost(password_hash.split("$", 1)[0])
+    configured = _parse_cost(get_password_method())
+    if stored is None or configured is None or stored == configured:
+        return False
+    if stored[0] != configured[0]:
+        return stored[0] == "pbkdf2" and configured[0] == "scrypt"
+    return all(old <= new for old, new in zip(stored[1], configured[1]))
+
+
+class TokenBucket:
+    '''
+    按键（用户名、IP等）限流的令牌桶。
+    每个键最多保存capacity个令牌，每分钟恢复per_minute个，每次尝试消耗一个。
+    最近使用的键保存在有序字典中，超过max_keys时淘汰最久未使用的。
+    '''
+    def __init__(self, capacity: int, per_minute: float, max_keys: int = 10000):
+        self.capacity = capacity
+        self.rate = per_minute / 60
+        self.max_keys = max_keys
+        # 键 -> (剩余令牌数, 更新时间)
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def peek(self, key: str, now: float) -> float:
+        '''
+        获取键当前的令牌数（不消耗）
+        Arguments:
+            key: 键
+            now: 当前时间（time.monotonic）
+        Returns:
+            float: 令牌数
+        '''
+        if key not in self._buckets:
+            return self.capacity
+        tokens, updated = self._buckets[key]
+        return min(self.capacity, tokens + (now - updated) * self.rate)
+
+    def retry_after(self, key: str, now: float) -> float:
+        '''
+        获取键恢复一个令牌需要等待的时间
+        Returns:
+            float: 等待时间（秒），有令牌时为0
+        '''
+        tokens = self.peek(key, now)
+        if tokens >= 1:
+            return 0
+        return (1 - tokens) / self.rate if self.rate else float("inf")
+
+    def consume(self, key: str, now: float):
+        '''
+        消耗一个令牌，调用前需用peek确认有令牌
+        Arguments:
+            key: 键
+            now: 当前时间（time.monotonic）
+        Returns:
+            None
+        '''
+        self._buckets[key] = (self.peek(key, now) - 1, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+    def reset(self, key: str):
+        '''恢复键的全部令牌'''
+        self._buckets.pop(key, None)
+
+
+class LoginThrottle:
+    '''
+    登录尝试限流，同时按用户名和IP计数。
+    在验证密码之前检查，被限流的请求不会消耗哈希计算的CPU。
+    '''
+    def __init__(self, config: dict):
+        '''
+        初始化登录限流
+        Arguments:
+            config: auth.throttle 配置，包含 username 和 ip 两项，每项为 {capacity, per_minute}
+        Returns:
+            None
+        '''
+        self._lock = threading.Lock()
+        self.enabled = config.get("enabled", True)
+        self.buckets = {
+            name: TokenBucket(
+                config.get(name, {}).get("capacity", capacity),
+                config.get(name, {}).get("per_minute", per_minute)
+            )
+            for name, capacity, per_minute in [("username", 5, 5), ("ip", 30, 30)]
+        }
+
+    def acquire(self, username: str, ip: str) -> float:
+        '''
+        尝试登录一次
+        Arguments:
+            username: 用户名
+            ip: 客户端IP
+        Returns:
+            float: 0表示允许；否则为需要等待的时间（秒）
+        '''
+        if not self.enabled:
+            return 0
+
+        keys = {"username": username, "ip": ip}
+        now = time.monotonic()
+        with self._lock:
+            wait = max(bucket.retry_after(keys[name], now) for name, bucket in self.buckets.items())
+            if wait > 0:
+                return wait
+            for name, bucket in self.buckets.items():
+                bucket.consume(keys[name], now)
+            return 0
+
+    def succeeded(self, username: str):
+        '''
+        登录成功后恢复该用户名的令牌，之前输错的次数不再计算
+        Arguments:
+            username: 用户名
+        Returns:
+            None
+        '''
+        with self._lock:
+            self.buckets["username"].reset(username)
+
+
+class LoginStats:
+    '''登录次数与密码验证耗时统计'''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"success": 0, "failed": 0, "throttled": 0, "rehashed": 0}
+        self.verify_count = 0
+        self.verify_total = 0.0
+        self.verify_max = 0.0
+
+    def record(self, result: str, seconds: float = 0):
+        '''
+        记录一次登录
+        Arguments:
+            result: success, failed, throttled, rehashed
+            seconds: 验证耗时（秒），被限流时为0
+        Returns:
+            None
+        '''
+        with self._lock:
+            self.counts[result] += 1
+            if seconds:
+                self.verify_count += 1
+                self.verify_total += seconds
+                self.verify_max = max(self.verify_max, seconds)
+
+    def stats(self) -> dict:
+        '''
+        获取统计信息
+        Returns:
+            dict: 各结果的次数，以及验证耗时（毫秒）的平均值与最大值
+        '''
+        with self._lock:
+            return {
+                **self.counts,
+                "verify_count": self.verify_count,
+                "verify_avg_ms": round(self.verify_total / self.verify_count * 1000, 2) if self.verify_count else 0,
+                "verify_max_ms": round(self.verify_max * 1000, 2),
+            }
+
+
+def init_security(app: Flask):
+    '''
+    根据配置创建登录限流与统计，保存在 app.extensions 中
+    Arguments:
+        app: Flask应用
+    Returns:
+        None
+    '''
+    config = app.config.get("auth", {})
+    app.extensions["login_throttle"] = LoginThrottle(config.get("throttle", {}))
+    app.extensions["login_stats"] = LoginStats()
@@ -0,0 +1,278 @@
+'''
+生产环境的WSGI服务器（server.mode 为 threaded 或 prefork 时使用）。
+
+threaded：单进程，固定数量的线程处理请求。
+prefork：主进程监听端口后fork出多个工作进程，每个进程内同样使用线程池；仅支持Linux/macOS。
+
+信号：
+    SIGTERM / SIGINT：停止接受新连接，等待正在处理的请求（包括订单写入）完成后退出。
+    SIGHUP：重新加载配置。threaded 模式下用新的应用实例处理之后的请求；
+            prefork 模式下启动一批新的工作进程，再平滑停止旧的工作进程。
+'''
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import Flask
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from .events import close_event_hubs
+from .log import stop_logger
+
+
+class RequestHandler(WSGIRequestHandler):
+    '''
+    每个连接只处理一个请求（HTTP/1.0）。
+    线程池大小固定，空闲的keep-alive连接不应长期占用线程。
+    '''
+    protocol_version = "HTTP/1.0"
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    '''
+    使用固定大小线程池处理请求的WSGI服务器
+    '''
+    multithread = True
+
+    def __init__(self, host: str, port: int, app: Flask, threads: int, fd: int | None = None):
+        super().__init__(host, port, app, handler=RequestHandler, fd=fd)
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="wsgi")
+        self._futures = set()
+        self._futures_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        future = self.executor.submit(self._process_request, request, client_address)
+        with self._futures_lock:
+            self._futures.add(future)
+        future.add_done_callback(self._discard_future)
+
+    def _discard_future(self, future):
+        with self._futures_lock:
+            self._futures.discard(future)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def drain(self, timeout: float) -> int:
+        '''
+        等待正在处理的请求完成
+        Arguments:
+            timeout: 最长等待时间（秒）
+        Returns:
+            int: 超时后仍未完成的请求数
+        '''
+        with self._futures_lock:
+            pending = set(self._futures)
+        _, not_done = wait(pending, timeout)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        return len(not_done)
+
+
+def _close_app(app: Flask):
+    '''关闭应用的数据库连接池'''
+    pool = app.extensions.get("db_pool")
+    if pool:
+        pool.close_all()
+
+
+def _serve(server: PooledWSGIServer, drain_timeout: float, reload=None):
+    '''
+    在当前进程中运行服务器，直到收到SIGTERM/SIGINT，然后平滑关闭
+    Arguments:
+        server: 服务器
+        drain_timeout: 关闭时等待请求完成的最长时间（秒）
+        reload: 收到SIGHUP时调用，返回新的应用实例；为None时忽略SIGHUP
+    Returns:
+        None
+    '''
+    apps = [server.app]
+
+    def stop(signum, frame):
+        # serve_forever在主线程中运行，需要在其他线程中调用shutdown
+        threading.Thread(target=server.shutdown).start()
+
+    def hup(signum, frame):
+        try:
+            new_app = reload() # type: ignore
+        except Exception:
+            # 配置错误时继续使用当前的应用实例
+            server.app.logger.exception("Reload failed, keeping the current app.")
+            return
+        apps.append(new_app)
+        server.app = new_app
+        new_app.logger.info("Configuration reloaded.")
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    if reload and hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, hup)
+
+    server.serve_forever()
+
+    # 停止接受新连接，结束SSE长连接，等待正在处理的请求完成
+    server.server_close()
+    close_event_hubs()
+    unfinished = server.drain(drain_timeout)
+    if unfinished:
+        server.app.logger.warning(f"{unfinished} requests still running after {drain_timeout}s, exiting anyway.")
+
+    for app in apps:
+        _close_app(app)
+
+
+def run_threaded(create_app, app: Flask):
+    '''
+    单进程多线程模式
+    Arguments:
+        create_app: 应用工厂，重新加载配置时调用
+        app: 应用实例
+    Returns:
+        None
+    '''
+    config = app.config["server"]
+    server = PooledWSGIServer(config["host"], config["port"], app, config.get("threads", 8))
+    app.logger.info(f"Serving on {config['host']}:{server.port} with {config.get('threads', 8)} threads.")
+    _serve(server, config.get("drain_timeout", 10), reload=create_app)
+
+
+def _run_worker(app: Flask, fd: int):
+    '''工作进程的入口，fork之后调用，不会返回'''
+    config = app.config["server"]
+
+    # Ctrl+C 会发给整个进程组，由主进程统一处理
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    server = PooledWSGIServer(config["host"], config["port"], app, config.get("threads", 8), fd=fd)
+    code = 0
+    try:
+        _serve(server, config.get("drain_timeout", 10))
+    except Exception:
+        app.logger.exception("Worker crashed.")
+        code = 1
+    finally:
+        # os._exit不会执行atexit，需要先写完队列中的日志
+        stop_logger(app)
+        os._exit(code)
+
+
+def run_prefork(create_app, app: Flask):
+    '''
+    多进程模式：主进程监听端口并管理工作进程
+    Arguments:
+        create_app: 应用工厂，重新加载配置时调用
+        app: 应用实例
+    Returns:
+        None
+    '''
+    config = app.config["server"]
+    workers = config.get("workers", 2)
+    drain_timeout = config.get("drain_timeout", 10)
+
+    # 所有工作进程共用同一个监听socket
+    listener = socket.create_server((config["host"], config["port"]), reuse_port=False, backlog=128)
+    listener.set_inheritable(True)
+
+    # 工作进程ID -> 所属的应用实例
+    children: dict[int, Flask] = {}
+    state = {"app": app, "stopping": False, "reload": False}
+
+    def spawn(current: Flask):
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(current, listener.fileno())
+        children[pid] = current
+
+    def on_stop(signum, frame):
+        state["stopping"] = True
+
+    def on_hup(signum, frame):
+        state["reload"] = True
+
+    signal.signal(signal.SIGTERM, on_stop)
+    signal.signal(signal.SIGINT, on_stop)
+    signal.signal(signal.SIGHUP, on_hup)
+
+    for _ in range(workers):
+        spawn(app)
+    app.logger.info(f"Serving on {config['host']}:{config['port']} with {workers} workers x {config.get('threads', 8)} threads.")
+
+    while not state["stopping"]:
+        if state["reload"]:
+            state["reload"] = False
+            try:
+                new_app = create_app()
+            except Exception:
+                app.logger.exception("Reload failed, keeping the current workers.")
+            else:
+                old = list(children)
+                state["app"] = new_app
+                for _ in range(new_app.config["server"].get("workers", workers)):
+                    spawn(new_app)
+                # 旧的工作进程处理完正在进行的请求后退出
+                for pid in old:
+                    os.kill(pid, signal.SIGTERM)
+                new_app.logger.info("Configuration reloaded, old workers are draining.")
+
+        # 回收退出的工作进程，意外退出的重新启动
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid and pid in children:
+            owner = children.pop(pid)
+            if owner is state["app"] and not state["stopping"]:
+                state["app"].logger.warning(f"Worker {pid} exited unexpectedly ({status}), restarting.")
+                spawn(state["app"])
+            continue
+
+        time.sleep(0.2)
+
+    # 平滑关闭：通知工作进程，等待它们处理完正在进行的请求
+    for pid in children:
+        os.kill(pid, signal.SIGTERM)
+    deadline = time.monotonic() + drain_timeout + 5
+    while children and time.monotonic() < deadline:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            children.pop(pid, None)
+        else:
+            time.sleep(0.1)
+    for pid in children:
+        os.kill(pid, signal.SIGKILL)
+
+    listener.close()
+
+
+def run_server(create_app, app: Flask):
+    '''
+    按 server.mode 启动服务器
+    Arguments:
+        create_app: 应用工厂
+        app: 应用实例
+    Returns:
+        None
+    '''
+    mode = app.config["server"].get("mode", "dev")
+
+    if mode == "prefork" and not hasattr(os, "fork"):
+        app.logger.warning("prefork mode is not supported on this platform, using threaded mode.")
+        mode = "threaded"
+
+    if mode == "prefork":
+        run_prefork(create_app, app)
+    elif mode == "threaded":
+        run_threaded(create_app, app)
+    else:
+        config = app.config["server"]
+        app.run(host=config["host"], port=config["port"], debug=config["debug"])
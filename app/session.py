@@ -0,0 +1,270 @@
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from flask import Flask
+from flask.sessions import SecureCookieSessionInterface, SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+from .database import DatabaseConnection, get_dbconn
+
+
+def is_static_request(app: Flask, request) -> bool:
+    '''判断是否为静态文件请求，静态文件不需要session'''
+    return bool(app.static_url_path) and request.path.startswith(app.static_url_path + "/")
+
+
+def load_secret_key(path: str) -> bytes:
+    '''
+    读取保存在文件中的secret_key，不存在时生成一个。
+    重启后已签发的cookie仍然有效，多个进程也使用同一个密钥。
+    Arguments:
+        path: 密钥文件路径
+    Returns:
+        bytes: secret_key
+    '''
+    try:
+        # O_EXCL：多个进程同时启动时，只有一个能创建成功
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, "wb") as f:
+            f.write(os.urandom(32))
+
+    # 其他进程可能刚创建文件、还未写入
+    for _ in range(50):
+        with open(path, "rb") as f:
+            key = f.read()
+        if key:
+            return key
+        time.sleep(0.01)
+    raise RuntimeError(f"Secret key file {path} is empty.")
+
+
+class AppSessionInterface(SecureCookieSessionInterface):
+    '''
+    基于签名cookie的session接口（session.type 为 cookie 时使用）。
+    静态文件请求不需要session，直接返回空session，跳过cookie的解码、验签和保存。
+    '''
+    def open_session(self, app, request):
+        if is_static_request(app, request):
+            return self.make_null_session(app)
+        return super().open_session(app, request)
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    '''
+    服务端session，cookie中只保存签名后的session ID
+    '''
+    def __init__(self, initial: dict | None = None, sid: str = "", expires: float = 0, new: bool = False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires = expires
+        self.new = new
+        self.modified = False
+        # 登录、登出时会调用clear()，此时更换session ID，防止会话固定攻击
+        self.regenerate = False
+
+    def clear(self):
+        super().clear()
+        self.regenerate = True
+
+
+class SessionCache:
+    '''
+    session的进程内LRU缓存。
+    其他进程可能修改或删除session（如登出），因此缓存只在ttl秒内有效，之后重新从数据库读取。
+    '''
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # session ID -> (session数据, 过期时间, 缓存时间)
+        self._items: OrderedDict[str, tuple[dict, float, float]] = OrderedDict()
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, sid: str, now: float) -> tuple[dict, float] | None:
+        '''
+        获取缓存的session
+        Returns:
+            tuple: (session数据的副本, 过期时间)
+            None: 未缓存或已失效
+        '''
+        with self._lock:
+            item = self._items.get(sid)
+            if item is None or item[1] <= now or now - item[2] > self.ttl:
+                self.misses += 1
+                return None
+            self._items.move_to_end(sid)
+            self.hits += 1
+            return dict(item[0]), item[1]
+
+    def put(self, sid: str, data: dict, expires: float, now: float):
+        '''缓存session'''
+        with self._lock:
+            self._items[sid] = (dict(data), expires, now)
+            self._items.move_to_end(sid)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def remove(self, sid: str):
+        '''移除缓存的session'''
+        with self._lock:
+            self._items.pop(sid, None)
+
+    def stats(self) -> dict:
+        '''
+        获取缓存统计信息
+        Returns:
+            dict: {'size', 'hits', 'misses'}
+        '''
+        with self._lock:
+            return {"size": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+class ServerSessionInterface(SessionInterface):
+    '''
+    服务端session接口（session.type 为 server 时使用）。
+    session数据保存在sessions表中，前面有一层进程内LRU缓存；多个进程共享同一个数据库，无需粘性路由。
+    每次访问顺延过期时间（滑动过期），为减少写入，距上次顺延超过touch_interval秒才写数据库。
+    后台线程每隔sweep_interval秒删除过期的session。
+    '''
+    def __init__(self, config: dict):
+        '''
+        初始化服务端session接口
+        Arguments:
+            config: session 配置
+        Returns:
+            None
+        '''
+        self.lifetime = config.get("lifetime", 43200)
+        self.touch_interval = config.get("touch_interval", 60)
+        self.sweep_interval = config.get("sweep_interval", 600)
+        self.cache = SessionCache(config.get("cache_size", 1000), config.get("cache_ttl", 5))
+
+        # 清理线程所属的进程ID，fork之后需要在子进程中重新启动
+        self._sweeper_pid = None
+        self._sweeper_lock = threading.Lock()
+
+    def _get_signer(self, app: Flask) -> Signer:
+        return Signer(app.secret_key, salt="server-session") # type: ignore
+
+    def _start_sweeper(self, app: Flask):
+        '''在当前进程中启动清理线程（若尚未启动）'''
+        if self._sweeper_pid == os.getpid():
+            return
+
+        with self._sweeper_lock:
+            if self._sweeper_pid == os.getpid():
+                return
+            self._sweeper_pid = os.getpid()
+
+        thread = threading.Thread(target=self._sweep_loop, args=(app,), name="session-sweeper", daemon=True)
+        thread.start()
+
+    def _sweep_loop(self, app: Flask):
+        '''定期删除过期的session'''
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                with app.app_context():
+                    with DatabaseConnection() as db:
+                        count = db.sessions.delete_expired(time.time())
+                if count:
+                    app.logger.info(f"Removed {count} expired sessions.")
+            except Exception as e:
+                app.logger.error(f"Failed to remove expired sessions: {e}")
+
+    def open_session(self, app, request):
+        # 静态文件请求不读取session
+        if is_static_request(app, request):
+            return self.make_null_session(app)
+
+        self._start_sweeper(app)
+
+        now = time.time()
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._get_signer(app).unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+
+            if sid:
+                cached = self.cache.get(sid, now)
+                if cached is None:
+                    cached = get_dbconn().sessions.get(sid, now)
+                    if cached is not None:
+                        self.cache.put(sid, cached[0], cached[1], now)
+
+                if cached is not None:
+                    data, expires = cached
+                    return ServerSession(data, sid=sid, expires=expires)
+
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        # 清空了session（如登出），删除旧的session ID
+        if session.regenerate and not session.new:
+            get_dbconn().sessions.delete(session.sid)
+            self.cache.remove(session.sid)
+
+        if not session:
+            if not session.new:
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = time.time()
+        expires = now + self.lifetime
+        db = get_dbconn()
+
+        if session.regenerate or session.new:
+            # 新session或登录后，使用新的session ID
+            session.sid = secrets.token_urlsafe(32)
+            db.sessions.save(session.sid, dict(session), expires)
+        elif session.modified:
+            db.sessions.save(session.sid, dict(session), expires)
+        elif expires - session.expires > self.touch_interval:
+            db.sessions.touch(session.sid, expires)
+        else:
+            # 无需写入，cookie也无需更新
+            return
+
+        self.cache.put(session.sid, dict(session), expires, now)
+        response.set_cookie(
+            name,
+            self._get_signer(app).sign(session.sid).decode(),
+            expires=expires,
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def init_session(app: Flask, config: dict):
+    '''
+    根据配置设置session接口
+    Arguments:
+        app: Flask应用
+        config: session 配置，type 为 server（服务端session，默认）或 cookie（签名cookie）
+    Returns:
+        None
+    '''
+    if config.get("type", "server") == "cookie":
+        app.session_interface = AppSessionInterface()
+    else:
+        app.session_interface = ServerSessionInterface(config)
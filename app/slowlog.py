@@ -0,0 +1,157 @@
+'''
+慢查询日志：DatabaseConnection.execute / executemany（整批计时）执行时间超过阈值的SQL写入 user/logs/slow_queries.jsonl。
+同一条SQL（规范化后）在每个进程中只在第一次出现时执行 EXPLAIN QUERY PLAN。
+通过 flask slow-queries 查看汇总。
+'''
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from flask import Flask
+from .const import *
+from .metrics import normalize_sql
+
+# 可以执行 EXPLAIN QUERY PLAN 的语句
+EXPLAIN_PREFIXES = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+
+
+class SlowQueryLog:
+    '''
+    记录慢查询。每条慢查询追加一行JSON：
+        {"time", "sql", "ms", "plan"}
+    plan 为 EXPLAIN QUERY PLAN 的结果（每行为 "id parent detail" 中的 detail，按层级缩进），
+    同一条SQL只在第一次记录时包含，之后为None。
+    '''
+    def __init__(self, path: str, threshold_ms: float = 50, max_statements: int = 1000):
+        '''
+        初始化慢查询日志
+        Arguments:
+            path: 日志文件路径
+            threshold_ms: 阈值（毫秒），执行时间不小于该值时记录
+            max_statements: 记录过执行计划的SQL的最大数量
+        Returns:
+            None
+        '''
+        self.path = path
+        self.threshold = threshold_ms / 1000
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        # 已记录过执行计划的SQL（规范化后）
+        self._explained: OrderedDict[str, None] = OrderedDict()
+
+    def _explain(self, connection: sqlite3.Connection, sql: str, params: tuple) -> list[str] | None:
+        '''
+        获取SQL的执行计划
+        Arguments:
+            connection: 执行该SQL的连接
+            sql: SQL语句
+            params: 参数
+        Returns:
+            list[str] | None: 执行计划，无法获取时为None
+        '''
+        if not sql.lstrip().upper().startswith(EXPLAIN_PREFIXES):
+            return None
+        try:
+            rows = connection.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        except sqlite3.Error:
+            return None
+
+        # 按父节点计算缩进层级
+        depth = {0: -1}
+        plan = []
+        for row in rows:
+            node_id, parent, detail = row[0], row[1], row[3]
+            depth[node_id] = depth.get(parent, -1) + 1
+            plan.append("  " * depth[node_id] + detail)
+        return plan
+
+    def record(self, connection: sqlite3.Connection, sql: str, params: tuple, seconds: float):
+        '''
+        记录一条慢查询
+        Arguments:
+            connection: 执行该SQL的连接
+            sql: SQL语句
+            params: 参数
+            seconds: 执行时间（秒）
+        Returns:
+            None
+        '''
+        statement = normalize_sql(sql)
+
+        with self._lock:
+            explain = statement not in self._explained
+            if explain:
+                self._explained[statement] = None
+                while len(self._explained) > self.max_statements:
+                    self._explained.popitem(last=False)
+
+        line = json.dumps(
+            {
+                "time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                "sql": statement,
+                "ms": round(seconds * 1000, 3),
+                "plan": self._explain(connection, sql, params) if explain else None,
+            },
+            ensure_ascii=False
+        )
+        # 慢查询很少，直接追加写入；单行写入在多进程下不会交错
+        with self._lock:
+            with open(self.path, "a", encoding=DEFAULT_ENCODING) as f:
+                f.write(line + "\n")
+
+
+def read_slow_queries(path: str) -> list[dict]:
+    '''
+    读取慢查询日志并按SQL汇总
+    Arguments:
+        path: 日志文件路径
+    Returns:
+        list[dict]: [{'sql', 'count', 'avg_ms', 'max_ms', 'last_time', 'plan'}, ...]，按总耗时从大到小排序
+    '''
+    summary: dict[str, dict] = {}
+    if not os.path.exists(path):
+        return []
+
+    with open(path, encoding=DEFAULT_ENCODING) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+            item = summary.setdefault(entry["sql"], {
+                "sql": entry["sql"], "count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_time": None, "plan": None
+            })
+            item["count"] += 1
+            item["total_ms"] += entry["ms"]
+            item["max_ms"] = max(item["max_ms"], entry["ms"])
+            item["last_time"] = entry["time"]
+            if entry.get("plan"):
+                item["plan"] = entry["plan"]
+
+    result = sorted(summary.values(), key=lambda item: item["total_ms"], reverse=True)
+    for item in result:
+        item["avg_ms"] = round(item.pop("total_ms") / item["count"], 3)
+    return result
+
+
+def init_slow_query_log(app: Flask) -> SlowQueryLog | None:
+    '''
+    根据配置 database.slow_query 启用慢查询日志，保存到 app.extensions["slow_query_log"]
+    Arguments:
+        app: Flask应用
+    Returns:
+        SlowQueryLog | None: 未启用时返回None
+    '''
+    config = app.config["database"].get("slow_query", {})
+    if not config.get("enabled", False):
+        return None
+
+    slow_log = SlowQueryLog(
+        config.get("file", SLOW_QUERY_LOG_PATH),
+        threshold_ms=config.get("threshold_ms", 50),
+    )
+    app.extensions["slow_query_log"] = slow_log
+    return slow_log
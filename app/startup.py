@@ -0,0 +1,144 @@
+'''
+应用启动：各阶段计时，以及按配置（blueprints）注册蓝图。
+
+蓝图注册表（配置 blueprints）：
+    {"蓝图模块名": {"enabled": true, "lazy": false}, ...}
+    enabled 为 false 时不加载；lazy 为 true 时不在 create_app 中导入，
+    而是在进程处理第一个请求之前导入并注册（Flask 不允许在处理请求之后注册蓝图），
+    prefork 模式下由各工作进程分别加载，不占用启动和重新加载的时间。
+'''
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+from flask import Flask
+from .auth import build_permission_table
+
+# 配置中没有 blueprints 时使用的注册表
+DEFAULT_BLUEPRINTS = {
+    "basic": {},
+    "auth": {},
+    "user": {},
+    "stats": {},
+    "menu": {},
+    "kitchen": {},
+    "order": {},
+    "report": {"lazy": True},
+    "admin": {"lazy": True},
+}
+
+
+class StartupTimer:
+    '''
+    记录启动各阶段的耗时，保存在 app.extensions["startup"]
+    '''
+    def __init__(self):
+        self.start = time.perf_counter()
+        # 阶段名 -> 耗时（毫秒），按执行顺序
+        self.phases: dict[str, float] = {}
+        self.total_ms = 0.0
+
+    @contextmanager
+    def phase(self, name: str):
+        '''
+        记录一个阶段的耗时，同名阶段累加
+        Arguments:
+            name: 阶段名
+        Returns:
+            None
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.phases[name] = self.phases.get(name, 0) + elapsed
+
+    def finish(self) -> float:
+        '''
+        结束计时
+        Returns:
+            float: 总耗时（毫秒）
+        '''
+        self.total_ms = (time.perf_counter() - self.start) * 1000
+        return self.total_ms
+
+    def summary(self) -> str:
+        '''各阶段耗时的文本，用于日志'''
+        phases = ", ".join(f"{name} {ms:.1f}" for name, ms in self.phases.items())
+        return f"{self.total_ms:.1f}ms ({phases})"
+
+    def stats(self) -> dict:
+        '''
+        获取启动耗时
+        Returns:
+            dict: {'total_ms', 'phases': {阶段名: 耗时（毫秒）}}
+        '''
+        return {
+            "total_ms": round(self.total_ms, 2),
+            "phases": {name: round(ms, 2) for name, ms in self.phases.items()},
+        }
+
+
+def _register(app: Flask, name: str, timer: StartupTimer):
+    '''导入蓝图模块并注册，记录导入的耗时'''
+    with timer.phase(f"blueprint:{name}"):
+        module = importlib.import_module(f".{name}", __package__)
+        app.register_blueprint(module.bp)
+    app.logger.info(f"Blueprint {name} registered.")
+
+
+def register_blueprints(app: Flask, timer: StartupTimer) -> list[str]:
+    '''
+    按配置 blueprints 注册蓝图。lazy 的蓝图在处理第一个请求之前注册。
+    调用后需将权限表保存在 app.extensions["permissions"]，延迟注册时会更新该表。
+    Arguments:
+        app: Flask应用
+        timer: 启动计时
+    Returns:
+        list[str]: 延迟注册的蓝图
+    '''
+    registry = app.config.get("blueprints", DEFAULT_BLUEPRINTS)
+
+    lazy = []
+    for name, options in registry.items():
+        if not options.get("enabled", True):
+            continue
+        if options.get("lazy", False):
+            lazy.append(name)
+        else:
+            _register(app, name, timer)
+
+    if lazy:
+        _defer_blueprints(app, lazy, timer)
+    return lazy
+
+
+def _defer_blueprints(app: Flask, names: list[str], timer: StartupTimer):
+    '''
+    包装 app.wsgi_app，在处理第一个请求之前注册延迟加载的蓝图，并更新权限表
+    Arguments:
+        app: Flask应用
+        names: 蓝图模块名
+        timer: 启动计时
+    Returns:
+        None
+    '''
+    wsgi_app = app.wsgi_app
+    lock = threading.Lock()
+
+    def load():
+        with timer.phase("lazy_blueprints"):
+            for name in names:
+                _register(app, name, timer)
+            app.extensions["permissions"].update(build_permission_table(app))
+
+    def lazy_wsgi_app(environ, start_response):
+        with lock:
+            if app.wsgi_app is lazy_wsgi_app:
+                load()
+                app.wsgi_app = wsgi_app
+        return wsgi_app(environ, start_response)
+
+    app.wsgi_app = lazy_wsgi_app # type: ignore
+
@@ -1,10 +1,13 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, jsonify
+from .database import get_dbconn
+from datetime import datetime
 
 bp = Blueprint('stats', __name__, url_prefix="/api/stats")
 
 @bp.route("/today")
 def get_today_stats():
-    return jsonify({
-        "order_count": 0,
-        "total_sales": 0,
-    })
+    # daily_stats 在下单、结账、取消时增量更新，这里只需一次主键查询
+    db = get_dbconn()
+    stats = db.stats.get_day(datetime.now().strftime('%Y-%m-%d'))
+
+    return jsonify(stats)
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, jsonify, session
 
 bp = Blueprint('user', __name__, url_prefix="/api/user")
 
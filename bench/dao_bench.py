@@ -0,0 +1,253 @@
+'''
+数据访问层（app/database.py 中的DAO方法）的微基准测试。
+
+在不同的数据量下分别测量：
+    订单数（--orders，默认 100 10000 1000000）：UsersDAO.auth、OrderDAO.create
+    菜品数（--dishes，默认 50 500 5000）：DishDAO.get_all、get_menu_by_category、search、create_batch
+
+每个方法先计时运行（至少 --min-time 秒），得到每秒次数；再在 tracemalloc 下运行 --alloc-calls 次，
+得到每次调用后新增（未释放）的内存块数 alloc_blocks 和调用期间的内存峰值 alloc_peak_kb。
+结果追加到 user/bench/dao_history.jsonl（每次运行一行），并与上一次运行的结果比较。
+
+用法：
+    python bench/dao_bench.py
+    python bench/dao_bench.py --orders 100 10000 --dishes 50 500 --methods DishDAO.search
+    python bench/dao_bench.py --orders 1000000 --dishes    # 只测量订单相关的方法
+'''
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask
+from app import init_databse
+from app.database import DatabaseConnection
+from app.datagen import generate
+
+# 历史记录
+HISTORY_PATH = os.path.join("user", "bench", "dao_history.jsonl")
+
+PROFILE = {"journal_mode": "WAL", "synchronous": "NORMAL"}
+
+# 搜索时使用的关键词（汉字、拼音首字母、拼音）
+SEARCH_KEYWORDS = ["鸡", "gbjd", "niurou", "汤", "xz"]
+
+# 菜品名称的组成部分
+DISH_PARTS = ["宫保", "鱼香", "红烧", "清蒸", "干煸", "麻婆", "糖醋", "酸辣", "香煎", "小炒"]
+DISH_BASES = ["鸡丁", "肉丝", "牛肉", "豆腐", "排骨", "鲈鱼", "土豆丝", "茄子", "虾仁", "汤"]
+
+
+def make_app(database_file: str) -> Flask:
+    '''创建一个只包含数据库配置的Flask应用'''
+    app = Flask("bench")
+    app.config["database"] = {"file": database_file, "profile": PROFILE}
+    return app
+
+
+def dish_rows(count: int, start: int = 0) -> list[dict]:
+    '''生成菜品，参数同 DishDAO.create'''
+    return [
+        {
+            "name": f"{DISH_PARTS[i % len(DISH_PARTS)]}{DISH_BASES[i // len(DISH_PARTS) % len(DISH_BASES)]}{i}",
+            "price": 1000 + i % 50 * 100,
+            "category": f"分类{i % 12}",
+            "description": "招牌" if i % 7 == 0 else "",
+            "options_json": {"辣度": ["微辣", "中辣", "特辣"]} if i % 3 == 0 else None,
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def measure(func, min_time: float, alloc_calls: int) -> dict:
+    '''
+    测量一个无参数函数
+    Arguments:
+        func: 被测函数
+        min_time: 最少运行时间（秒）
+        alloc_calls: 统计内存分配时调用的次数
+    Returns:
+        dict: {'ops_per_sec', 'us_per_op', 'calls', 'alloc_blocks', 'alloc_peak_kb'}
+    '''
+    # 预热（加载缓存等）
+    func()
+
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - start
+
+    # 内存分配：调用后新增的内存块数，以及调用期间相对调用前的内存峰值
+    blocks = 0
+    peak = 0
+    tracemalloc.start()
+    try:
+        for _ in range(alloc_calls):
+            before = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            func()
+            after = tracemalloc.take_snapshot()
+            _, call_peak = tracemalloc.get_traced_memory()
+            blocks += sum(max(0, stat.count_diff) for stat in after.compare_to(before, "lineno"))
+            peak += call_peak - current
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ops_per_sec": round(calls / elapsed, 1),
+        "us_per_op": round(elapsed / calls * 1e6, 1),
+        "calls": calls,
+        "alloc_blocks": round(blocks / alloc_calls, 1),
+        "alloc_peak_kb": round(peak / alloc_calls / 1024, 1),
+    }
+
+
+def bench_orders(size: int, methods: list[str], args) -> list[dict]:
+    '''在size个订单的数据库上测量订单和账户相关的方法'''
+    workdir = tempfile.mkdtemp(prefix="homeflavor-bench-")
+    app = make_app(os.path.join(workdir, "bench.db"))
+    results = []
+    try:
+        with app.app_context():
+            init_databse()
+            with DatabaseConnection() as db:
+                db.users.create("waiter", "password") # type: ignore
+                # 历史订单：每天约2000单
+                generate(db, size, dishes=50, days=max(1, size // 2000))
+                dish_ids = [dish["id"] for dish in db.dishes.get_all()] # type: ignore
+
+                rng = random.Random(1)
+                cases = {
+                    "UsersDAO.auth": lambda: db.users.auth("waiter", "password"), # type: ignore
+                    "OrderDAO.create": lambda: db.orders.create( # type: ignore
+                        rng.randint(1, 30), [(dish_id, 1) for dish_id in rng.sample(dish_ids, 3)], 2
+                    ),
+                }
+                for name, func in cases.items():
+                    if name in methods:
+                        results.append({"method": name, "size": f"{size} orders", **measure(func, args.min_time, args.alloc_calls)})
+                        print(f"{name:<32} {size:>8} orders  {results[-1]['ops_per_sec']:>10} ops/s", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def bench_dishes(size: int, methods: list[str], args) -> list[dict]:
+    '''在size个菜品的数据库上测量菜品相关的方法'''
+    workdir = tempfile.mkdtemp(prefix="homeflavor-bench-")
+    app = make_app(os.path.join(workdir, "bench.db"))
+    results = []
+    try:
+        with app.app_context():
+            init_databse()
+            with DatabaseConnection() as db:
+                db.dishes.create_batch(dish_rows(size)) # type: ignore
+
+                keywords = iter(SEARCH_KEYWORDS * 1000000)
+                new_dishes = dish_rows(args.batch, size)
+
+                def create_batch():
+                    # 创建后删除，菜品数保持不变（删除也计入耗时）
+                    ids = db.dishes.create_batch(new_dishes) # type: ignore
+                    db.dishes.delete_batch(ids) # type: ignore
+
+                cases = {
+                    "DishDAO.get_all": lambda: db.dishes.get_all(), # type: ignore
+                    "DishDAO.get_menu_by_category": lambda: db.dishes.get_menu_by_category(), # type: ignore
+                    "DishDAO.search": lambda: db.dishes.search(next(keywords), 20), # type: ignore
+                    "DishDAO.create_batch": create_batch,
+                }
+                for name, func in cases.items():
+                    if name in methods:
+                        results.append({"method": name, "size": f"{size} dishes", **measure(func, args.min_time, args.alloc_calls)})
+                        print(f"{name:<32} {size:>8} dishes  {results[-1]['ops_per_sec']:>10} ops/s", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def git_commit() -> str | None:
+    '''当前的git提交，不在git仓库中时为None'''
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_last(path: str) -> dict | None:
+    '''读取历史记录中的最后一次运行'''
+    if not os.path.exists(path):
+        return None
+    last = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                last = json.loads(line)
+    return last
+
+
+def compare(results: list[dict], last: dict | None) -> list[dict]:
+    '''
+    与上一次运行比较
+    Returns:
+        list[dict]: 每个结果增加 'change'（每秒次数的变化比例），上次没有该项时为None
+    '''
+    previous = {(item["method"], item["size"]): item for item in (last or {}).get("results", [])}
+    for item in results:
+        before = previous.get((item["method"], item["size"]))
+        item["change"] = round(item["ops_per_sec"] / before["ops_per_sec"] - 1, 3) if before else None
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, nargs="*", default=[100, 10000, 1000000])
+    parser.add_argument("--dishes", type=int, nargs="*", default=[50, 500, 5000])
+    parser.add_argument("--methods", nargs="+", default=[
+        "UsersDAO.auth", "OrderDAO.create",
+        "DishDAO.get_all", "DishDAO.get_menu_by_category", "DishDAO.search", "DishDAO.create_batch",
+    ])
+    parser.add_argument("--batch", type=int, default=50, help="create_batch 每次创建的菜品数")
+    parser.add_argument("--min-time", type=float, default=1.0, help="每项最少运行时间（秒）")
+    parser.add_argument("--alloc-calls", type=int, default=5, help="统计内存分配时调用的次数")
+    parser.add_argument("--history", default=HISTORY_PATH, help="历史记录文件")
+    parser.add_argument("--no-save", action="store_true", help="不写入历史记录")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.orders:
+        results += bench_orders(size, args.methods, args)
+    for size in args.dishes:
+        results += bench_dishes(size, args.methods, args)
+
+    results = compare(results, load_last(args.history))
+    run = {
+        "time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "commit": git_commit(),
+        "results": results,
+    }
+    print(json.dumps(run, indent=4, ensure_ascii=False))
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.history) or ".", exist_ok=True)
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(run, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+'''
+比较默认存储配置（rollback journal）与 database.profile（WAL等）下的读写吞吐量。
+
+用法：
+    python bench/db_profile.py --readers 4 --writers 2 --seconds 3
+'''
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from app import init_databse
+from app.const import DEFAULT_CONFIG_PATH, DEFAULT_ENCODING
+from app.database import DatabaseConnection
+
+# SQLite 默认的存储配置
+BASELINE_PROFILE = {
+    "journal_mode": "DELETE",
+    "synchronous": "FULL",
+}
+
+
+def load_profile() -> dict:
+    '''读取 config/default.json 中的 database.profile'''
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(root, DEFAULT_CONFIG_PATH), encoding=DEFAULT_ENCODING) as f:
+        return json.load(f)["database"].get("profile", {})
+
+
+def run(profile: dict, readers: int, writers: int, seconds: float) -> dict:
+    '''
+    在临时数据库上运行一次读写压测
+    Arguments:
+        profile: 存储配置
+        readers: 读线程数
+        writers: 写线程数
+        seconds: 运行时间（秒）
+    Returns:
+        dict: {'reads', 'writes', 'errors', 'reads_per_sec', 'writes_per_sec'}
+    '''
+    workdir = tempfile.mkdtemp(prefix="homeflavor-bench-")
+    app = Flask("bench")
+    app.config["database"] = {"file": os.path.join(workdir, "bench.db"), "profile": profile}
+
+    with app.app_context():
+        init_databse()
+        with DatabaseConnection() as db:
+            db.dishes.create_batch([
+                {"name": f"菜品{i}", "price": 1000 + i, "category": f"分类{i % 8}"}
+                for i in range(200)
+            ])
+
+    counters = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def worker(write: bool):
+        with app.app_context():
+            db = DatabaseConnection()
+            db.connect()
+            count = 0
+            errors = 0
+            while not stop.is_set():
+                try:
+                    if write:
+                        db.dishes.create(f"新菜{count}", 1500, "热菜")
+                    else:
+                        db.dishes.get_by_id(count % 200 + 1)
+                    count += 1
+                except sqlite3.OperationalError:
+                    # 例如 database is locked
+                    errors += 1
+            db.close()
+
+        with lock:
+            counters["writes" if write else "reads"] += count
+            counters["errors"] += errors
+
+    threads = [threading.Thread(target=worker, args=(False,)) for _ in range(readers)]
+    threads += [threading.Thread(target=worker, args=(True,)) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    counters["reads_per_sec"] = round(counters["reads"] / seconds, 1)
+    counters["writes_per_sec"] = round(counters["writes"] / seconds, 1)
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    results = {
+        "baseline": run(BASELINE_PROFILE, args.readers, args.writers, args.seconds),
+        "profile": run(load_profile(), args.readers, args.writers, args.seconds),
+    }
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+'''
+并发创建订单，检查每日订单号没有重复、没有跳号。
+多个进程、每个进程多个线程同时调用 OrderDAO.create。
+发现问题时以退出码1结束。
+
+用法：
+    python bench/order_num_concurrency.py --processes 4 --threads 4 --orders 25
+'''
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from app import init_databse
+from app.database import DatabaseConnection
+
+PROFILE = {"journal_mode": "WAL", "busy_timeout": 10000}
+
+
+def make_app(database_file: str) -> Flask:
+    '''创建一个只包含数据库配置的Flask应用'''
+    app = Flask("bench")
+    app.config["database"] = {"file": database_file, "profile": PROFILE}
+    return app
+
+
+def create_orders(database_file: str, threads: int, orders: int):
+    '''在当前进程中用多个线程创建订单'''
+    app = make_app(database_file)
+
+    def worker():
+        with app.app_context():
+            with DatabaseConnection() as db:
+                for i in range(orders):
+                    db.orders.create(i % 20 + 1, [(1, 1), (2, 2)])
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--orders", type=int, default=25, help="每个线程创建的订单数")
+    args = parser.parse_args()
+
+    database_file = os.path.join(tempfile.mkdtemp(prefix="homeflavor-bench-"), "orders.db")
+    app = make_app(database_file)
+    with app.app_context():
+        init_databse()
+        with DatabaseConnection() as db:
+            db.dishes.create("宫保鸡丁", 2800, "热菜")
+            db.dishes.create("米饭", 200, "主食")
+
+    processes = [
+        multiprocessing.Process(target=create_orders, args=(database_file, args.threads, args.orders))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    with app.app_context():
+        with DatabaseConnection() as db:
+            rows = db.fetch_all("SELECT order_date, order_num FROM orders ORDER BY order_date, order_num")
+
+    expected = args.processes * args.threads * args.orders
+    numbers = [row["order_num"] for row in rows]
+
+    # 测试在同一天内完成，订单号应为 1..expected
+    if len(rows) != expected or numbers != list(range(1, expected + 1)):
+        missing = sorted(set(range(1, expected + 1)) - set(numbers))
+        print(f"FAILED: {len(rows)}/{expected} orders, missing numbers: {missing[:20]}")
+        sys.exit(1)
+
+    print(f"OK: {expected} orders, numbers 1..{expected} without duplicates or gaps")
+
+
+if __name__ == "__main__":
+    main()
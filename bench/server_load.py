@@ -0,0 +1,148 @@
+'''
+比较开发服务器（server.mode=dev）与生产模式（threaded、prefork）下登录和订单接口的吞吐量。
+
+每种模式在临时目录中启动一次 run.py，先创建测试账户，
+再由多个客户端线程循环请求：登录 -> /api/orders/changes -> /api/kitchen/orders -> 登出。
+
+用法：
+    python bench/server_load.py --clients 16 --seconds 5 --modes dev threaded prefork
+'''
+import argparse
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(mode: str, port: int, workers: int, threads: int) -> tuple[subprocess.Popen, str]:
+    '''
+    在临时目录中启动服务器
+    Returns:
+        tuple: (进程, 工作目录)
+    '''
+    workdir = tempfile.mkdtemp(prefix="homeflavor-bench-")
+    shutil.copytree(os.path.join(ROOT, "config"), os.path.join(workdir, "config"))
+    os.makedirs(os.path.join(workdir, "user"))
+
+    # 关闭调试模式和登录限流，测量服务器本身的吞吐量
+    with open(os.path.join(workdir, "user", "config.json"), "w") as f:
+        json.dump({
+            "server": {
+                "host": "127.0.0.1", "port": port, "debug": False,
+                "mode": mode, "workers": workers, "threads": threads, "drain_timeout": 5
+            },
+            "auth": {"throttle": {"enabled": False}},
+        }, f)
+
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    subprocess.run(
+        [sys.executable, "-m", "flask", "--app", "app:create_app", "init-test-data"],
+        cwd=workdir, env=env, check=True, capture_output=True
+    )
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "run.py")],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    # 等待端口可用
+    for _ in range(100):
+        try:
+            http.client.HTTPConnection("127.0.0.1", port, timeout=1).request("GET", "/login")
+            break
+        except OSError:
+            time.sleep(0.1)
+    return process, workdir
+
+
+def request(port: int, method: str, path: str, body: dict | None = None, cookie: str = "") -> tuple[int, str]:
+    '''
+    发送一个请求
+    Returns:
+        tuple: (状态码, Set-Cookie中的session)
+    '''
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Cookie": cookie} if cookie else {}
+    if body is not None:
+        headers["Content-Type"] = "application/json"
+        conn.request(method, path, json.dumps(body), headers)
+    else:
+        conn.request(method, path, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    set_cookie = response.getheader("Set-Cookie") or ""
+    conn.close()
+    return response.status, set_cookie.split(";", 1)[0]
+
+
+def run_clients(port: int, clients: int, seconds: float) -> dict:
+    '''
+    运行压测
+    Returns:
+        dict: {'requests', 'errors', 'requests_per_sec', 'logins_per_sec'}
+    '''
+    counters = {"requests": 0, "logins": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client():
+        requests = logins = errors = 0
+        while time.monotonic() < deadline:
+            try:
+                status, cookie = request(port, "POST", "/api/auth/login", {"username": "waiter1", "password": "w123456"})
+                logins += status == 200
+                for path in ["/api/orders/changes?since=0", "/api/kitchen/orders"]:
+                    status, _ = request(port, "GET", path, cookie=cookie)
+                    errors += status != 200
+                request(port, "POST", "/api/auth/logout", {}, cookie=cookie)
+                requests += 4
+            except OSError:
+                errors += 1
+        with lock:
+            counters["requests"] += requests
+            counters["logins"] += logins
+            counters["errors"] += errors
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    counters["requests_per_sec"] = round(counters["requests"] / seconds, 1)
+    counters["logins_per_sec"] = round(counters["logins"] / seconds, 1)
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--modes", nargs="+", default=["dev", "threaded", "prefork"])
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes:
+        process, workdir = start_server(mode, args.port, args.workers, args.threads)
+        try:
+            results[mode] = run_clients(args.port, args.clients, args.seconds)
+        finally:
+            # SIGTERM：平滑关闭
+            process.terminate()
+            process.wait(timeout=30)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+'''
+模拟营业时的负载，测量各接口的吞吐量和延迟。
+
+在临时目录中创建应用和数据库（Flask test client，单进程多线程），同时运行：
+    waiters 个店员：通过 /api/auth/login 登录，循环用 OrderDAO.create 下单，每 relogin 单重新登录一次；
+    kitchens 个后厨大屏：poll 模式循环请求 /api/orders/changes（增量同步）和 /api/kitchen/orders，
+                        stream 模式订阅 /api/kitchen/events；
+    dashboards 个看板：循环请求 /api/stats/today。
+
+输出JSON：每个接口的请求数、错误数、吞吐量（次/秒）和 p50/p95/p99 延迟（毫秒）。
+--save-baseline 保存结果作为基线；--baseline 与基线比较，吞吐量下降或 p95 延迟上升超过 --tolerance 时以状态码1退出。
+
+用法：
+    python bench/service_load.py --waiters 8 --kitchens 2 --dashboards 1 --seconds 10 --output result.json
+    python bench/service_load.py --save-baseline user/bench/service_baseline.json
+    python bench/service_load.py --baseline user/bench/service_baseline.json --tolerance 0.2
+'''
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class Recorder:
+    '''按接口记录每次请求的耗时和错误'''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    def record(self, name: str, seconds: float, ok: bool = True):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def timed(self, name: str, func, *args, **kwargs):
+        '''
+        执行并记录耗时
+        Returns:
+            func的返回值；抛出异常时记录为错误并返回None
+        '''
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record(name, time.perf_counter() - start, False)
+            return None
+        ok = getattr(result, "status_code", 200) < 400
+        self.record(name, time.perf_counter() - start, ok)
+        return result
+
+    def summary(self, seconds: float) -> dict:
+        '''
+        汇总各接口的结果
+        Returns:
+            dict: {接口: {'count', 'errors', 'per_sec', 'p50_ms', 'p95_ms', 'p99_ms'}}
+        '''
+        result = {}
+        for name, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            result[name] = {
+                "count": len(latencies),
+                "errors": self.errors.get(name, 0),
+                "per_sec": round(len(latencies) / seconds, 1),
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "p99_ms": percentile(latencies, 99),
+            }
+        return result
+
+
+def percentile(values: list[float], p: float) -> float:
+    '''已排序数据的百分位数（最近秩），单位毫秒'''
+    if not values:
+        return 0
+    index = max(0, math.ceil(p / 100 * len(values)) - 1)
+    return round(values[index] * 1000, 3)
+
+
+def setup(workdir: str, waiters: int, dishes: int):
+    '''
+    在临时目录中创建应用、店员账户和菜单
+    Returns:
+        Flask: 应用
+    '''
+    shutil.copytree(os.path.join(ROOT, "config"), os.path.join(workdir, "config"))
+    os.makedirs(os.path.join(workdir, "user"))
+
+    # 关闭调试日志和登录限流，事件推送的心跳缩短以便结束时尽快退出
+    with open(os.path.join(workdir, "user", "config.json"), "w") as f:
+        json.dump({
+            "server": {"debug": False},
+            "auth": {"throttle": {"enabled": False}},
+            "events": {"heartbeat": 1},
+        }, f)
+
+    os.chdir(workdir)
+    from app import create_app
+    from app.database import DatabaseConnection
+    app = create_app()
+    app.logger.setLevel("WARNING")
+
+    with app.app_context(), DatabaseConnection() as db:
+        for i in range(waiters):
+            db.users.create(f"waiter{i}", "password") # type: ignore
+        db.dishes.create_batch([ # type: ignore
+            {"name": f"菜品{i}", "price": 1000 + i * 10, "category": f"分类{i % 8}"}
+            for i in range(dishes)
+        ])
+
+    return app
+
+
+def waiter(app, recorder: Recorder, index: int, deadline: float, relogin: int, think: float, dish_ids: list[int]):
+    '''店员：登录，循环下单'''
+    from app.database import get_dbconn
+    client = app.test_client()
+    rng = random.Random(index)
+    login = {"username": f"waiter{index}", "password": "password"}
+
+    orders = 0
+    while time.monotonic() < deadline:
+        if orders % relogin == 0:
+            client.post("/api/auth/logout")
+            recorder.timed("POST /api/auth/login", client.post, "/api/auth/login", json=login)
+
+        items = [(dish_id, rng.randint(1, 3)) for dish_id in rng.sample(dish_ids, rng.randint(1, 5))]
+        with app.app_context():
+            recorder.timed(
+                "OrderDAO.create", lambda: get_dbconn().orders.create(rng.randint(1, 30), items, rng.randint(1, 6))
+            )
+        orders += 1
+        time.sleep(think)
+
+
+def kitchen_poll(app, recorder: Recorder, deadline: float, think: float):
+    '''后厨大屏（轮询）：增量同步订单，定期重新加载全部未完成订单'''
+    client = app.test_client()
+    client.post("/api/auth/login", json={"username": "waiter0", "password": "password"})
+
+    seq = 0
+    polls = 0
+    while time.monotonic() < deadline:
+        response = recorder.timed("GET /api/orders/changes", client.get, f"/api/orders/changes?since={seq}")
+        if response is not None and response.status_code == 200:
+            seq = response.get_json()["seq"]
+        if polls % 10 == 0:
+            recorder.timed("GET /api/kitchen/orders", client.get, "/api/kitchen/orders")
+        polls += 1
+        time.sleep(think)
+
+
+def kitchen_stream(app, recorder: Recorder, deadline: float):
+    '''后厨大屏（事件推送）：订阅 /api/kitchen/events，记录收到的事件数'''
+    client = app.test_client()
+    client.post("/api/auth/login", json={"username": "waiter0", "password": "password"})
+
+    response = client.get("/api/kitchen/events", buffered=False)
+    try:
+        last = time.perf_counter()
+        for chunk in response.response:
+            if time.monotonic() >= deadline:
+                break
+            text = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if text.startswith("id:"):
+                # 记录相邻两个事件之间的间隔
+                now = time.perf_counter()
+                recorder.record("SSE /api/kitchen/events", now - last)
+                last = now
+    finally:
+        response.close()
+
+
+def dashboard(app, recorder: Recorder, deadline: float, think: float):
+    '''看板：循环请求今日统计'''
+    client = app.test_client()
+    client.post("/api/auth/login", json={"username": "waiter0", "password": "password"})
+
+    while time.monotonic() < deadline:
+        recorder.timed("GET /api/stats/today", client.get, "/api/stats/today")
+        time.sleep(think)
+
+
+def run(args) -> dict:
+    '''
+    运行一次负载测试
+    Returns:
+        dict: {'config', 'endpoints'}
+    '''
+    workdir = tempfile.mkdtemp(prefix="homeflavor-bench-")
+    cwd = os.getcwd()
+    try:
+        app = setup(workdir, args.waiters, args.dishes)
+        with app.app_context():
+            from app.database import get_dbconn
+            dish_ids = [dish["id"] for dish in get_dbconn().dishes.get_all()]
+
+        recorder = Recorder()
+        deadline = time.monotonic() + args.seconds
+        think = args.think_ms / 1000
+
+        threads = [
+            threading.Thread(target=waiter, args=(app, recorder, i, deadline, args.relogin, think, dish_ids))
+            for i in range(args.waiters)
+        ]
+        for _ in range(args.kitchens):
+            if args.kitchen_mode == "stream":
+                threads.append(threading.Thread(target=kitchen_stream, args=(app, recorder, deadline)))
+            else:
+                threads.append(threading.Thread(target=kitchen_poll, args=(app, recorder, deadline, think)))
+        for _ in range(args.dashboards):
+            threads.append(threading.Thread(target=dashboard, args=(app, recorder, deadline, think)))
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        return {
+            "config": {
+                "waiters": args.waiters,
+                "kitchens": args.kitchens,
+                "kitchen_mode": args.kitchen_mode,
+                "dashboards": args.dashboards,
+                "seconds": args.seconds,
+                "think_ms": args.think_ms,
+            },
+            "endpoints": recorder.summary(elapsed),
+        }
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    '''
+    与基线比较
+    Arguments:
+        result: 本次结果
+        baseline: 基线
+        tolerance: 允许的变化比例，如0.2表示吞吐量最多下降20%、p95最多上升20%
+    Returns:
+        list[str]: 退化的接口及原因
+    '''
+    regressions = []
+    for name, base in baseline["endpoints"].items():
+        current = result["endpoints"].get(name)
+        if current is None:
+            regressions.append(f"{name}: missing")
+            continue
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} -> {current['errors']}")
+        if current["per_sec"] < base["per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: per_sec {base['per_sec']} -> {current['per_sec']}")
+        if base["p95_ms"] and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95_ms {base['p95_ms']} -> {current['p95_ms']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--waiters", type=int, default=8)
+    parser.add_argument("--kitchens", type=int, default=2)
+    parser.add_argument("--kitchen-mode", choices=["poll", "stream"], default="poll")
+    parser.add_argument("--dashboards", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--dishes", type=int, default=100, help="菜单中的菜品数")
+    parser.add_argument("--relogin", type=int, default=20, help="每下多少单重新登录一次")
+    parser.add_argument("--think-ms", type=float, default=0, help="每次请求之间的间隔（毫秒）")
+    parser.add_argument("--output", help="将结果写入该文件（标准输出中可能混有应用的输出）")
+    parser.add_argument("--baseline", help="与该基线文件比较，退化时以状态码1退出")
+    parser.add_argument("--save-baseline", help="将结果保存为基线文件")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    # 文件路径相对于运行目录（运行时会切换到临时目录）
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    paths = [os.path.abspath(path) for path in (args.output, args.save_baseline) if path]
+
+    result = run(args)
+    print(json.dumps(result, indent=4, ensure_ascii=False))
+
+    for path in paths:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=4, ensure_ascii=False)
+
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["config"] != result["config"]:
+            print("Warning: baseline was recorded with a different configuration.", file=sys.stderr)
+        regressions = compare(result, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
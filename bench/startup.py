@@ -0,0 +1,92 @@
+'''
+测量 create_app 的启动时间。
+
+每次在新的子进程中运行（包括导入 app 包的时间），分别测量：
+    cold：新的数据库，需要执行全部迁移；
+    warm：数据库已是最新版本，只查询一次版本号。
+子进程中另外记录导入和 create_app 本身的耗时，cold 与 warm 的 create_app 之差即为迁移的耗时。
+
+用法：
+    python bench/startup.py --runs 10
+'''
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子进程中运行的代码：导入、创建应用，输出各阶段耗时（毫秒）
+CHILD = '''
+import json, time
+start = time.perf_counter()
+import app
+from app import create_app
+imported = time.perf_counter()
+create_app()
+created = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+}))
+'''
+
+
+def make_workdir() -> str:
+    '''创建临时工作目录，关闭调试日志'''
+    workdir = tempfile.mkdtemp(prefix="homeflavor-bench-")
+    shutil.copytree(os.path.join(ROOT, "config"), os.path.join(workdir, "config"))
+    os.makedirs(os.path.join(workdir, "user"))
+    with open(os.path.join(workdir, "user", "config.json"), "w") as f:
+        json.dump({"server": {"debug": False}}, f)
+    return workdir
+
+
+def run_once(workdir: str) -> dict:
+    '''
+    在子进程中启动一次
+    Returns:
+        dict: {'total_ms', 'import_ms', 'create_app_ms'}
+    '''
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=workdir, env=env, check=True, capture_output=True, text=True
+    )
+    total = (time.perf_counter() - start) * 1000
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["total_ms"] = total
+    return timings
+
+
+def summarize(runs: list[dict]) -> dict:
+    '''各阶段耗时的中位数（毫秒）'''
+    return {key: round(statistics.median(run[key] for run in runs), 2) for key in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    cold, warm = [], []
+    for _ in range(args.runs):
+        workdir = make_workdir()
+        try:
+            # 第一次启动建立数据库，第二次为热启动
+            cold.append(run_once(workdir))
+            warm.append(run_once(workdir))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps({"cold": summarize(cold), "warm": summarize(warm)}, indent=4))
+
+
+if __name__ == "__main__":
+    main()
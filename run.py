@@ -1,5 +1,5 @@
 from app import create_app
-import os
+from app.server import run_server
 import traceback
 
     
@@ -22,7 +22,8 @@ if __name__ == '__main__':
 
     app.logger.info(f"Application started on {host}:{port} in {app.config['env']} environment.")
 
-    app.run(host=host, port=port, debug=debug)
+    # server.mode：dev（Flask开发服务器）、threaded、prefork
+    run_server(create_app, app)
     
     app.logger.info("Application stopped.")
 